@@ -5,6 +5,14 @@ from typing import Dict, Any
 from components.history import render_history_ui
 
 
+# 검색 범위 (서버 WorkflowRequest.rag_mode)
+RAG_MODE_LABELS = {
+    "local": "PDF 문서",
+    "local+external": "PDF 문서 (부족하면 웹 검색)",
+    "parallel": "PDF 문서 + 웹 검색",
+}
+
+
 def render_input_form():
     print(f"[START]sidebar.render_input_form()")
 
@@ -24,9 +32,16 @@ def render_input_form():
         st.checkbox(
             "RAG 활성화",
             value=True,
-            help="외부 지식을 검색하여 상담에 활용합니다.",
+            help="외부 지식을 검색하여 상담에 활용합니다. 끄면 검색 없이 가장 빠르게 응답합니다.",
             key="ui_enable_rag",
         )
+        # 검색 범위 선택 (RAG 활성화 시 사용)
+        st.selectbox(
+            "검색 범위",
+            options=list(RAG_MODE_LABELS),
+            format_func=RAG_MODE_LABELS.get,
+            key="ui_rag_mode",
+        )
 
 
 def render_sidebar() -> Dict[str, Any]:
@@ -25,22 +25,45 @@ class AgentType:
     IPO = "IPO_AGENT"  # KRX 상장심사 담당자 에이전트
     
 
-def process_event_data(event_data):
+def process_event_data(event_data, streams=None):
     """
     서버에서 받은 이벤트 데이터를 처리합니다.
     
     Args:
         event_data (dict): 서버에서 전송된 이벤트 데이터
+        streams (dict): 역할별 스트리밍 중인 메시지 (placeholder, 누적 텍스트)
         
     Returns:
         bool: 이벤트 처리가 완료되었는지 여부
     """
-    print(f"[START]main.process_event_data({event_data.get("type")})")
+    print(f"[START]main.process_event_data({event_data.get('type')})")
+    streams = streams if streams is not None else {}
     
     # 이벤트 종료 처리
     if event_data.get("type") == "end":
         return True
 
+    # 서버 오류 처리 (예: server_busy - 요청이 많아 처리할 수 없음)
+    if event_data.get("type") == "error":
+        data = event_data.get("data", {})
+        st.error(data.get("message", "상담 처리 중 오류가 발생했습니다."))
+        return True
+
+    # LLM 토큰 처리 - 생성되는 대로 이어 붙여 표시
+    if event_data.get("type") == "delta":
+        data = event_data.get("data", {})
+        role = data.get("role")
+
+        if role not in streams:
+            # 에이전트 아바타 설정
+            avatar = "👩🏻‍⚖️"  # KRX 상장심사 담당자
+            with st.chat_message(role, avatar=avatar):
+                streams[role] = [st.empty(), ""]
+
+        streams[role][1] += data.get("delta", "")
+        streams[role][0].markdown(streams[role][1] + "▌")
+        return False
+
     # 새로운 메시지 처리
     if event_data.get("type") == "update":
         # 이벤트 데이터에서 상태 정보 추출
@@ -57,9 +80,18 @@ def process_event_data(event_data):
         # 에이전트 아바타 설정
         avatar = "👩🏻‍⚖️"  # KRX 상장심사 담당자
 
-        # 채팅 메시지로 응답 표시
-        with st.chat_message(role, avatar=avatar):
-            st.markdown(message)
+        # 채팅 메시지로 응답 표시 (스트리밍 중이던 메시지는 최종 응답으로 교체)
+        if role in streams:
+            streams.pop(role)[0].markdown(message)
+        else:
+            with st.chat_message(role, avatar=avatar):
+                st.markdown(message)
+
+        # 응답 시간 제한 때문에 줄어든 단계 표시 (예: external_search(skipped))
+        degraded = data.get("degraded", [])
+        if degraded:
+            stages = ", ".join(f"{item['stage']}({item['reason']})" for item in degraded)
+            st.warning(f"응답 시간 제한으로 일부 단계를 줄였습니다: {stages}")
 
         # 세션 상태 업데이트
         st.session_state.app_mode = "results"  # 결과 모드로 전환
@@ -92,10 +124,10 @@ def process_streaming_response(response):
         response: requests.Response 객체 (stream=True로 설정됨)
     """
     print(f"[START]main.process_streaming_response({response})")
+    streams = {}  # 역할별 스트리밍 중인 메시지
     
     # 응답을 라인 단위로 처리
     for chunk in response.iter_lines():
-        print(f"[START]main.process_streaming_response.chunk=[{chunk}]")
 
         # 빈 청크 무시
         if not chunk:
@@ -103,7 +135,6 @@ def process_streaming_response(response):
 
         # UTF-8로 디코딩
         line = chunk.decode("utf-8")
-        print(f"[START]main.process_streaming_response.line=[{line}]")
 
         # SSE 형식 확인: 'data: {"type": "update", "data": {}}'
         if not line.startswith("data: "):
@@ -111,15 +142,13 @@ def process_streaming_response(response):
 
         # 'data: ' 접두사 제거하여 JSON 문자열 추출
         data_str = line[6:]
-        print(f"[START]main.process_streaming_response.data_str=[{data_str}]")
 
         try:
             # JSON 문자열을 파이썬 객체로 파싱
             event_data = json.loads(data_str)
-            print(f"[START]main.process_streaming_response.event_data=[{event_data}]")
 
             # 이벤트 데이터 처리
-            is_complete = process_event_data(event_data)
+            is_complete = process_event_data(event_data, streams)
             print(f"[START]main.process_streaming_response.is_complete=[{is_complete}]")
 
             # 상담이 완료되면 루프 종료
@@ -144,6 +173,7 @@ def start_advice():
     # 세션에서 사용자 입력 가져오기
     topic = st.session_state.ui_topic  # 상담 주제
     enabled_rag = st.session_state.get("ui_enable_rag", False)  # RAG 기능 활성화 여부
+    rag_mode = st.session_state.get("ui_rag_mode", "local") if enabled_rag else "none"  # 검색 범위
 
     # 로딩 스피너 표시
     with st.spinner("상담이 진행 중입니다... 완료까지 잠시 기다려주세요."):
@@ -151,6 +181,8 @@ def start_advice():
         data = {
             "topic": topic,
             "enable_rag": enabled_rag,
+            "rag_mode": rag_mode,
+            "stream_tokens": True,  # LLM 토큰 단위 스트리밍
         }
 
         # 환경변수에서 API 기본 URL 가져오기
@@ -0,0 +1,60 @@
+"""
+상담 그래프 생성 비용 벤치마크
+
+요청마다 그래프를 생성/컴파일하던 방식(create_advice_graph)과
+컴파일된 그래프를 재사용하는 방식(get_advice_graph)의 요청당 준비 시간을 비교합니다.
+LLM/임베딩 API는 호출하지 않습니다.
+
+실행 (server 경로에서):
+    python benchmarks/graph_compile.py --iterations 200
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+# server 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workflow.graph import create_advice_graph, get_advice_graph
+
+
+def measure(label: str, build, iterations: int) -> None:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        build()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    p95 = timings[min(int(len(timings) * 0.95), len(timings) - 1)]
+    print(
+        f"{label:<28} 평균 {statistics.mean(timings):8.3f}ms  "
+        f"p50 {statistics.median(timings):8.3f}ms  p95 {p95:8.3f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="상담 그래프 생성 비용 벤치마크")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"[START]graph_compile.main({args.iterations})")
+
+    # 요청마다 IPOAgent 생성 + 내부/외부 그래프 컴파일 (기존 방식)
+    measure(
+        "create_advice_graph (요청별)",
+        lambda: create_advice_graph("local", str(uuid.uuid4())),
+        args.iterations,
+    )
+
+    # 최초 1회 컴파일 후 재사용
+    get_advice_graph("local")
+    measure("get_advice_graph (재사용)", lambda: get_advice_graph("local"), args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 
 from db.database import Base
@@ -13,3 +13,21 @@ class AdviceItem(Base):
     messages = Column(Text, nullable=False)  # JSON 문자열로 저장
     docs = Column(Text, nullable=True)  # JSON 문자열로 저장
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# 응답 캐시 모델 (완료된 상담 워크플로우의 SSE 업데이트 이벤트)
+class ResponseCacheItem(Base):
+    __tablename__ = "responsecache"
+
+    key = Column(String(64), primary_key=True)  # 주제/검색 범위/프롬프트/모델/인덱스 버전 해시
+    topic = Column(String(255), nullable=False)  # 정규화된 주제
+    rag_mode = Column(String(32), nullable=False)  # 검색 범위 (none, local, local+external, parallel)
+    prompt_version = Column(String(64), nullable=False)
+    deployment = Column(String(255), nullable=False)
+    index_version = Column(String(64), nullable=True)
+    events = Column(Text, nullable=False)  # JSON 문자열로 저장
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (Index("ix_responsecache_topic_mode", "topic", "rag_mode"),)
@@ -0,0 +1,129 @@
+"""
+응답 캐시 저장소
+
+이 모듈은 완료된 상담 워크플로우의 SSE 업데이트 이벤트를 상담내역(adviceitems)과 같은
+SQLite 데이터베이스에 저장하고, 정확히 같은 요청이면 LLM 호출과 검색 없이 재사용합니다.
+데이터베이스에 저장되므로 서버를 재시작해도 유지되고 모든 uvicorn 워커가 공유합니다.
+
+캐시 키는 다음 값의 해시이며, 하나라도 바뀌면 자동으로 다른 키가 됩니다.
+- 정규화된 상담 주제
+- 검색 범위 (none, local, local+external, parallel)
+- 프롬프트 버전 (시스템 프롬프트와 프롬프트 템플릿 해시)
+- 모델 배포 이름
+- 벡터 인덱스 내용 버전 (매니페스트의 content_version, 같은 내용으로 다시 빌드하면 그대로)
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+
+from db.database import SessionLocal
+from db.models import ResponseCacheItem
+from retrieval.query_cache import normalize_query
+
+
+def response_cache_key(
+    topic: str,
+    rag_mode: str,
+    prompt_version: str,
+    deployment: str,
+    index_version: Optional[str],
+    filters: Optional[Dict[str, Any]] = None,
+) -> str:
+    """응답 캐시 키를 반환합니다. 검색 필터가 있으면 필터별로 다른 키를 사용합니다."""
+    key = [normalize_query(topic), rag_mode, prompt_version, deployment, index_version]
+    if filters:
+        key.append(filters)
+    payload = json.dumps(key, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite 응답 캐시 (적중/미스 횟수는 프로세스별로 집계)"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """키에 해당하는 업데이트 이벤트 목록을 반환합니다. 없으면 None을 반환합니다."""
+        db = SessionLocal()
+        try:
+            item = db.get(ResponseCacheItem, key)
+            if item is None:
+                with self._lock:
+                    self.misses += 1
+                return None
+
+            item.hits += 1
+            item.last_used_at = func.now()
+            db.commit()
+            with self._lock:
+                self.hits += 1
+            return json.loads(item.events)
+        finally:
+            db.close()
+
+    def put(
+        self,
+        key: str,
+        topic: str,
+        rag_mode: str,
+        prompt_version: str,
+        deployment: str,
+        index_version: Optional[str],
+        events: List[Dict[str, Any]],
+    ) -> None:
+        """완료된 워크플로우의 업데이트 이벤트를 저장합니다."""
+        topic = normalize_query(topic)
+        db = SessionLocal()
+        try:
+            # 같은 주제의 이전 키(프롬프트/모델/인덱스 버전이 다른 응답)는 더 이상 적중하지 않으므로 삭제
+            db.query(ResponseCacheItem).filter(
+                ResponseCacheItem.topic == topic,
+                ResponseCacheItem.rag_mode == rag_mode,
+                ResponseCacheItem.key != key,
+            ).delete(synchronize_session=False)
+
+            db.merge(
+                ResponseCacheItem(
+                    key=key,
+                    topic=topic,
+                    rag_mode=rag_mode,
+                    prompt_version=prompt_version,
+                    deployment=deployment,
+                    index_version=index_version,
+                    events=json.dumps(events, ensure_ascii=False),
+                    hits=0,
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """저장된 응답 수와 적중률 통계를 반환합니다."""
+        db = SessionLocal()
+        try:
+            entries = db.query(func.count(ResponseCacheItem.key)).scalar() or 0
+            total_hits = db.query(func.sum(ResponseCacheItem.hits)).scalar() or 0
+        finally:
+            db.close()
+
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": entries,
+                "total_hits": total_hits,  # 모든 워커의 누적 적중 수
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# 프로세스 전역 응답 캐시
+response_cache = ResponseCache()
@@ -0,0 +1,116 @@
+"""
+백그라운드 인덱스 빌드 작업
+
+이 모듈은 서버 시작 시 벡터 인덱스 빌드를 별도 스레드에서 실행하고,
+진행 상황과 상태(building, ready, stale, failed)를 헬스 체크 엔드포인트에 제공합니다.
+빌드 중에도 서버는 요청을 받으며, 검색은 마지막으로 성공한 인덱스를 사용하거나
+인덱스가 없으면 RAG 없이 응답합니다.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class IndexStatus:
+    """인덱스 상태 정의"""
+    IDLE = "idle"  # 빌드 시작 전
+    BUILDING = "building"  # 사용할 인덱스 없이 빌드 중
+    STALE = "stale"  # 이전 인덱스를 서비스하며 재빌드 중
+    READY = "ready"  # 최신 인덱스 서비스 중
+    FAILED = "failed"  # 빌드 실패
+
+
+class IndexBuildTask:
+    """벡터 인덱스 빌드를 백그라운드 스레드에서 실행하고 상태를 추적합니다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.status = IndexStatus.IDLE
+        self.chunk_count = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.build_duration: Optional[float] = None
+        self.error: Optional[str] = None
+        self.progress: Dict[str, Any] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, force_rebuild: bool = None) -> bool:
+        """빌드를 시작합니다. 이미 실행 중이면 False를 반환합니다."""
+        with self._lock:
+            if self.running:
+                return False
+
+            self.status = IndexStatus.BUILDING
+            self.started_at = time.time()
+            self.finished_at = None
+            self.error = None
+            self.progress = {}
+
+            self._thread = threading.Thread(
+                target=self._run, args=(force_rebuild,), name="index-build", daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def _on_progress(self, stage: str, **info) -> None:
+        self.progress = {"stage": stage, **info}
+        print(f"[PROGRESS]build_task({self.progress})")
+
+    def _run(self, force_rebuild: bool = None) -> None:
+        from retrieval.index_holder import get_vectorstore_holder, vector_count
+        from utils.config import save_multiple_pdfs_vectorstore, settings
+
+        print(f"[START]build_task._run({force_rebuild})")
+        try:
+            # 서비스 중인 인덱스가 있으면 재빌드 동안 stale 상태로 계속 사용
+            if get_vectorstore_holder().get() is not None:
+                self.status = IndexStatus.STALE
+
+            vectorstore = save_multiple_pdfs_vectorstore(
+                settings.PDF_DATA_DIR, force_rebuild=force_rebuild, progress=self._on_progress
+            )
+            holder = get_vectorstore_holder()
+            if vectorstore is not None:
+                # 빌드 결과는 빌드용 임베딩을 쓰고 메타데이터/어휘 인덱스가 없으므로,
+                # 포맷과 관계없이 시작 시와 같은 load_vectorstore 경로로 디스크에서 다시 연다
+                holder.reload()
+
+            serving = holder.get()
+            if serving is None:
+                self.status = IndexStatus.FAILED
+                self.error = "벡터 스토어 생성 실패"
+            else:
+                self.status = IndexStatus.READY
+                self.chunk_count = vector_count(serving)
+
+        except Exception as e:
+            print(f"벡터 스토어 생성 실패: {e}")
+            self.error = str(e)
+            self.status = IndexStatus.STALE if get_vectorstore_holder().get() is not None else IndexStatus.FAILED
+
+        finally:
+            self.finished_at = time.time()
+            self.build_duration = self.finished_at - self.started_at
+            print(f"[END]build_task._run({self.status},{self.chunk_count},{self.build_duration:.1f}s)")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """헬스 체크 응답용 상태 정보를 반환합니다."""
+        return {
+            "status": self.status,
+            "running": self.running,
+            "chunk_count": self.chunk_count,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "build_duration": self.build_duration,
+            "error": self.error,
+            "progress": self.progress,
+        }
+
+
+# 프로세스 전역 빌드 작업
+index_build_task = IndexBuildTask()
@@ -0,0 +1,164 @@
+"""
+청크 중복 제거
+
+이 모듈은 청크 텍스트의 SHA-256 기반 고정 ID와, MinHash LSH 기반의 유사 중복 검출기를 제공합니다.
+가이드북마다 반복되는 안내 문구, 겹치는 테이블, 청크 중첩으로 생기는 거의 같은 청크를
+인덱싱 단계에서 제거하여 인덱스 크기, 임베딩 비용, 검색 컨텍스트의 중복을 줄입니다.
+"""
+
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+_MERSENNE_PRIME = np.uint64(4294967311)  # 2^32보다 큰 소수
+_WHITESPACE = re.compile(r"\s+")
+
+
+def content_id(text: str) -> str:
+    """청크 텍스트의 고정 ID를 반환합니다. 실행/프로세스와 무관하게 항상 같습니다."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def normalize_text(text: str) -> str:
+    """공백을 정규화합니다."""
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """(1/b)^(1/r)가 임계값에 가장 가까운 (밴드 수, 밴드당 행 수)를 선택합니다."""
+    candidates = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(candidates, key=lambda br: abs((1.0 / br[0]) ** (1.0 / br[1]) - threshold))
+
+
+class NearDuplicateIndex:
+    """
+    MinHash LSH 유사 중복 인덱스
+
+    문자 n-gram(shingle) 집합의 Jaccard 유사도가 threshold 이상인 청크를 중복으로 판단합니다.
+    한국어는 띄어쓰기가 일정하지 않으므로 단어 대신 문자 단위 shingle을 사용합니다.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 64, shingle_size: int = 5, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _choose_bands(num_perm, threshold)
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 2**32 - 1, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 2**32 - 1, size=num_perm, dtype=np.uint64)
+
+        self._buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(self.bands)]
+        self._signatures: List[np.ndarray] = []
+        self._owners: List[str] = []
+
+    def signature(self, text: str) -> np.ndarray:
+        """텍스트의 MinHash 서명을 계산합니다."""
+        text = normalize_text(text)
+        n = self.shingle_size
+        shingles = {text[i:i + n] for i in range(max(len(text) - n + 1, 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles)
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def query(self, text: str, signature: np.ndarray = None) -> Optional[str]:
+        """threshold 이상 유사한 기존 청크가 있으면 그 소유자(파일명)를 반환합니다."""
+        signature = self.signature(text) if signature is None else signature
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        for position in sorted(candidates):
+            similarity = float(np.mean(self._signatures[position] == signature))
+            if similarity >= self.threshold:
+                return self._owners[position]
+        return None
+
+    def add(self, text: str, owner: str, signature: np.ndarray = None) -> None:
+        """청크를 인덱스에 추가합니다."""
+        signature = self.signature(text) if signature is None else signature
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        self._owners.append(owner)
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band][key].append(position)
+
+    def remove_owner(self, owner: str) -> int:
+        """소유자(파일명)의 청크를 인덱스에서 제거하고 제거한 수를 반환합니다."""
+        positions = [position for position, name in enumerate(self._owners) if name == owner]
+        for position in positions:
+            for band, key in enumerate(self._band_keys(self._signatures[position])):
+                bucket = self._buckets[band].get(key)
+                if bucket is None:
+                    continue
+                bucket.remove(position)
+                if not bucket:
+                    del self._buckets[band][key]
+            self._owners[position] = None  # 위치는 유지하여 다른 청크의 위치가 바뀌지 않도록 한다
+        return len(positions)
+
+
+@dataclass
+class DedupResult:
+    """파일 하나에 대한 중복 제거 결과"""
+    documents: list = field(default_factory=list)  # 남은 청크
+    exact_removed: int = 0  # 동일 텍스트로 제거된 청크 수
+    near_removed: int = 0  # 유사 중복으로 제거된 청크 수
+    sources: List[str] = field(default_factory=list)  # 중복 판단의 기준이 된 다른 파일
+
+
+def deduplicate(
+    documents: list,
+    owner: str,
+    seen_ids: Dict[str, str],
+    near_index: Optional[NearDuplicateIndex] = None,
+) -> DedupResult:
+    """
+    청크에 고정 ID를 부여하고 동일/유사 중복을 제거합니다.
+
+    Args:
+        documents: 분할된 청크 목록
+        owner: 청크를 소유한 파일명
+        seen_ids: 이미 인덱스에 있는 청크 ID -> 소유 파일명 (갱신됨)
+        near_index: 유사 중복 인덱스 (None이면 동일 텍스트만 제거, 갱신됨)
+
+    Returns:
+        DedupResult: 남은 청크와 제거 통계
+    """
+    result = DedupResult()
+    sources = set()
+
+    for doc in documents:
+        doc_id = content_id(doc.page_content)
+        if doc_id in seen_ids:
+            result.exact_removed += 1
+            sources.add(seen_ids[doc_id])
+            continue
+
+        if near_index is not None:
+            signature = near_index.signature(doc.page_content)
+            duplicate_of = near_index.query(doc.page_content, signature)
+            if duplicate_of is not None:
+                result.near_removed += 1
+                sources.add(duplicate_of)
+                continue
+            near_index.add(doc.page_content, owner, signature)
+
+        doc.metadata["id"] = doc_id
+        seen_ids[doc_id] = owner
+        result.documents.append(doc)
+
+    sources.discard(owner)
+    result.sources = sorted(sources)
+    return result
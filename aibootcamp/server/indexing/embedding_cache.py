@@ -0,0 +1,162 @@
+"""
+임베딩 캐시
+
+이 모듈은 청크 텍스트의 임베딩 벡터를 SQLite 파일에 저장하는 디스크 캐시를 제공합니다.
+키는 임베딩 배포 이름과 청크 텍스트의 SHA-256 해시로 구성되므로,
+인덱스를 다시 만들거나 청킹 방식을 바꿔도 이미 임베딩한 텍스트는 API를 호출하지 않습니다.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+def embedding_cache_key(text: str, deployment: str) -> str:
+    """임베딩 배포 이름과 텍스트로 캐시 키를 생성합니다."""
+    return hashlib.sha256(f"{deployment}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    SQLite 기반 임베딩 캐시
+
+    벡터는 float32 바이트로 저장하며, 전체 크기가 max_bytes를 넘으면
+    가장 오래 사용되지 않은 항목부터 제거합니다.
+    """
+
+    def __init__(self, db_path: str, deployment: str, max_bytes: int = 512 * 1024 * 1024):
+        self.db_path = db_path
+        self.deployment = deployment
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """텍스트 목록의 캐시된 벡터를 반환합니다. 없는 항목은 None입니다."""
+        keys = [embedding_cache_key(text, self.deployment) for text in texts]
+        found = {}
+
+        with self._lock:
+            # SQLite 변수 개수 제한을 피하기 위해 나누어 조회
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+
+        vectors = []
+        for key in keys:
+            blob = found.get(key)
+            if blob is None:
+                self.misses += 1
+                vectors.append(None)
+            else:
+                self.hits += 1
+                vectors.append(array("f", blob).tolist())
+        return vectors
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]) -> None:
+        """텍스트와 벡터를 캐시에 저장하고 크기 제한을 적용합니다."""
+        now = time.time()
+        rows = [
+            (embedding_cache_key(text, self.deployment), array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+            self._evict()
+
+    def _evict(self) -> None:
+        """전체 크기가 max_bytes 이하가 될 때까지 오래된 항목을 제거합니다. (lock 보유 상태에서 호출)"""
+        total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # 여유를 두고 90%까지 줄여 매 저장마다 제거가 반복되지 않도록 한다
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        cursor = self._conn.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used")
+        stale_keys = []
+        for key, size in cursor:
+            if total - removed <= target:
+                break
+            stale_keys.append((key,))
+            removed += size
+
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", stale_keys)
+        self._conn.commit()
+        print(f"임베딩 캐시 정리: {len(stale_keys)}개 항목 제거 ({removed} bytes)")
+
+    def stats(self) -> dict:
+        """캐시 적중/미스 통계를 반환합니다."""
+        total = self.hits + self.misses
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """문서 임베딩 시 EmbeddingCache를 먼저 조회하고, 없는 텍스트만 실제로 임베딩합니다."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+        if missing:
+            # 같은 배치 안에서 중복된 텍스트는 한 번만 임베딩
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+            new_vectors = self.embeddings.embed_documents(unique_texts)
+            self.cache.put_many(unique_texts, new_vectors)
+
+            by_text = dict(zip(unique_texts, new_vectors))
+            for i in missing:
+                vectors[i] = by_text[texts[i]]
+
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
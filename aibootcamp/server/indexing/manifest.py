@@ -0,0 +1,135 @@
+"""
+벡터 인덱스 매니페스트 관리
+
+이 모듈은 벡터 인덱스에 포함된 PDF 파일 목록을 내용 해시, 청킹 파라미터와 함께
+manifest.json으로 기록합니다. 서버 재시작 시 매니페스트와 현재 ./data 디렉토리를
+비교하여 추가/변경/삭제된 PDF만 다시 처리할 수 있도록 합니다.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 2
+
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """파일 내용의 SHA-256 해시를 반환합니다."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_params(chunk_size: int, chunk_overlap: int, embedding_deployment: str, **extra) -> Dict[str, Any]:
+    """인덱스 재사용 여부를 결정하는 빌드 파라미터를 구성합니다."""
+    return {
+        "manifest_version": MANIFEST_VERSION,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "embedding_deployment": embedding_deployment,
+        **extra,
+    }
+
+
+def new_manifest(params: Dict[str, Any]) -> Dict[str, Any]:
+    """빈 매니페스트를 생성합니다."""
+    return {"params": params, "files": {}, "ntotal": 0}
+
+
+def content_version(manifest: Dict[str, Any]) -> str:
+    """
+    인덱스 내용 버전을 반환합니다. 빌드 파라미터와 파일별 내용 해시, 청크 ID로 계산하므로
+    같은 PDF를 같은 설정으로 다시 빌드하면 같은 값입니다. (빌드마다 바뀌는 version과 구분)
+    """
+    payload = json.dumps(
+        {
+            "params": manifest.get("params"),
+            "files": {name: [entry.get("sha256"), entry.get("ids")] for name, entry in manifest["files"].items()},
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def load_manifest(index_path: str) -> Optional[Dict[str, Any]]:
+    """인덱스 디렉토리의 매니페스트를 읽습니다. 없거나 손상되었으면 None을 반환합니다."""
+    manifest_path = os.path.join(index_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"매니페스트 로드 실패: {str(e)}")
+        return None
+
+
+def save_manifest(index_path: str, manifest: Dict[str, Any]) -> None:
+    """매니페스트를 임시 파일에 기록한 뒤 교체하여 원자적으로 저장합니다."""
+    os.makedirs(index_path, exist_ok=True)
+    manifest_path = os.path.join(index_path, MANIFEST_FILE)
+    tmp_path = manifest_path + ".tmp"
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+@dataclass
+class ManifestDiff:
+    """매니페스트와 현재 PDF 디렉토리의 차이"""
+    added: List[str] = field(default_factory=list)  # 새로 추가된 파일
+    changed: List[str] = field(default_factory=list)  # 내용이 변경된 파일
+    removed: List[str] = field(default_factory=list)  # 삭제된 파일
+    unchanged: List[str] = field(default_factory=list)  # 그대로인 파일
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+def diff_sources(manifest: Dict[str, Any], current_hashes: Dict[str, str]) -> ManifestDiff:
+    """
+    매니페스트에 기록된 파일과 현재 파일 해시를 비교합니다.
+
+    Args:
+        manifest: 기존 매니페스트
+        current_hashes: 파일명 -> SHA-256 해시
+
+    Returns:
+        ManifestDiff: 파일명 기준 정렬된 비교 결과
+    """
+    indexed = manifest.get("files", {})
+    diff = ManifestDiff()
+
+    for name in sorted(current_hashes):
+        entry = indexed.get(name)
+        if entry is None:
+            diff.added.append(name)
+        elif entry.get("sha256") != current_hashes[name]:
+            diff.changed.append(name)
+        else:
+            diff.unchanged.append(name)
+
+    diff.removed = sorted(name for name in indexed if name not in current_hashes)
+
+    # 유사 중복 제거 시 기준이 된 파일이 바뀌거나 빠지면, 그 때문에 제거됐던 청크를 되살리기 위해 함께 다시 처리
+    while True:
+        kept = set(diff.unchanged)
+        dependents = [
+            name for name in diff.unchanged
+            if any(source not in kept for source in indexed[name].get("dedup_sources", []))
+        ]
+        if not dependents:
+            break
+        diff.unchanged = [name for name in diff.unchanged if name not in dependents]
+        diff.changed = sorted(diff.changed + dependents)
+
+    return diff
@@ -0,0 +1,185 @@
+"""
+메모리 맵 벡터 인덱스 포맷
+
+이 모듈은 FAISS 인덱스를 pickle 없이 읽을 수 있는 파일 포맷으로 내보내고,
+메모리 맵으로 열어 검색하는 MmapVectorStore를 제공합니다.
+
+파일 구성 (벡터 인덱스 디렉토리 내):
+- vectors.npy: float32 (N, dim) 벡터 행렬
+- norms.npy: float32 (N,) 벡터 제곱 노름 (L2 거리 계산용)
+- chunks.bin: 청크 레코드(JSON, UTF-8)를 이어 붙인 파일
+- chunks_offsets.npy: int64 (N+1,) chunks.bin 내 레코드 시작 위치
+- mmap_meta.json: 벡터 수, 차원, 원본 매니페스트 버전, 검색 백엔드
+- (선택) 백엔드별 인덱스 파일 (retrieval.backends 참고)
+
+여러 uvicorn 워커가 같은 파일을 메모리 맵으로 열면 페이지 캐시의 한 사본을 공유하고,
+청크 텍스트는 검색 결과 상위 k개에 대해서만 읽습니다.
+"""
+
+import json
+import mmap
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+from retrieval.backends import build_backend, load_backend
+
+
+VECTORS_FILE = "vectors.npy"
+NORMS_FILE = "norms.npy"
+CHUNKS_FILE = "chunks.bin"
+OFFSETS_FILE = "chunks_offsets.npy"
+META_FILE = "mmap_meta.json"
+
+
+def _replace_npy(path: str, array: np.ndarray) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def export_mmap_store(
+    vectorstore,
+    index_path: str,
+    source_version: Optional[str] = None,
+    backend: str = "flat",
+    backend_options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    LangChain FAISS 벡터 스토어를 메모리 맵 포맷으로 내보냅니다.
+
+    Args:
+        vectorstore: LangChain FAISS 벡터 스토어
+        index_path: 저장 디렉토리
+        source_version: 원본 매니페스트 버전 (재내보내기 필요 여부 판단용)
+        backend: 검색 백엔드 (retrieval.backends.BACKENDS)
+        backend_options: 백엔드 파라미터
+
+    Returns:
+        Dict: 기록된 메타데이터
+    """
+    print(f"[START]mmap_store.export_mmap_store({index_path},{source_version},{backend})")
+    ntotal = vectorstore.index.ntotal
+    dim = vectorstore.index.d
+
+    vectors = vectorstore.index.reconstruct_n(0, ntotal) if ntotal else np.zeros((0, dim))
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+    offsets = np.zeros(ntotal + 1, dtype=np.int64)
+    chunks_path = os.path.join(index_path, CHUNKS_FILE)
+    with open(chunks_path + ".tmp", "wb") as f:
+        for i in range(ntotal):
+            doc_id = vectorstore.index_to_docstore_id[i]
+            doc = vectorstore.docstore.search(doc_id)
+            record = json.dumps(
+                {"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata},
+                ensure_ascii=False,
+            ).encode("utf-8")
+            f.write(record)
+            offsets[i + 1] = offsets[i] + len(record)
+
+    _replace_npy(os.path.join(index_path, VECTORS_FILE), vectors)
+    _replace_npy(os.path.join(index_path, NORMS_FILE), np.einsum("ij,ij->i", vectors, vectors))
+    _replace_npy(os.path.join(index_path, OFFSETS_FILE), offsets)
+    os.replace(chunks_path + ".tmp", chunks_path)
+
+    built_backend = build_backend(backend, vectors, index_path, backend_options)
+
+    meta = {
+        "ntotal": ntotal,
+        "dim": dim,
+        "source_version": source_version,
+        "backend": built_backend,
+        "requested_backend": backend,
+    }
+    meta_path = os.path.join(index_path, META_FILE)
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+    print(f"메모리 맵 인덱스 내보내기 완료: {ntotal}개 벡터, {dim}차원")
+    return meta
+
+
+def load_mmap_meta(index_path: str) -> Optional[Dict[str, Any]]:
+    """메모리 맵 메타데이터를 읽습니다. 없으면 None을 반환합니다."""
+    meta_path = os.path.join(index_path, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class MmapVectorStore:
+    """
+    메모리 맵 포맷 기반 벡터 스토어
+
+    LangChain FAISS의 similarity_search 계열 메서드와 같은 인터페이스를 제공합니다.
+    벡터 검색은 내보낼 때 선택한 백엔드(retrieval.backends)가 담당하며,
+    점수는 FAISS IndexFlatL2와 동일한 제곱 L2 거리입니다.
+    """
+
+    def __init__(self, index_path: str, embedding_function, backend_options: Optional[Dict[str, Any]] = None):
+        self.index_path = index_path
+        self.embedding_function = embedding_function
+        self.meta = load_mmap_meta(index_path) or {}
+
+        self.vectors = np.load(os.path.join(index_path, VECTORS_FILE), mmap_mode="r")
+        self.norms = np.load(os.path.join(index_path, NORMS_FILE), mmap_mode="r")
+        self.offsets = np.load(os.path.join(index_path, OFFSETS_FILE), mmap_mode="r")
+
+        try:
+            self.backend = load_backend(
+                self.meta.get("backend", "flat"), index_path, self.vectors, self.norms, backend_options
+            )
+        except Exception as e:
+            print(f"{self.meta.get('backend')} 백엔드 로드 실패, flat 백엔드 사용: {str(e)}")
+            self.backend = load_backend("flat", index_path, self.vectors, self.norms)
+
+        self._chunks_file = open(os.path.join(index_path, CHUNKS_FILE), "rb")
+        size = os.fstat(self._chunks_file.fileno()).st_size
+        self._chunks = mmap.mmap(self._chunks_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    @property
+    def ntotal(self) -> int:
+        return int(self.vectors.shape[0])
+
+    def stats(self) -> Dict[str, Any]:
+        """검색 백엔드의 메모리 사용량과 지연시간 통계를 반환합니다."""
+        return {**self.backend.stats(), "chunks_bytes": len(self._chunks)}
+
+    def get_document(self, position: int) -> Document:
+        """벡터 위치의 청크만 chunks.bin에서 읽어 Document로 반환합니다."""
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        record = json.loads(self._chunks[start:end].decode("utf-8"))
+        return Document(id=record["id"], page_content=record["page_content"], metadata=record["metadata"])
+
+    def search_positions(self, query_vector, k: int, candidates: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """쿼리 벡터와 가장 가까운 k개 벡터의 (위치, 제곱 L2 거리)를 반환합니다. candidates가 있으면 그 안에서만 검색합니다."""
+        return self.backend.search(np.asarray(query_vector, dtype=np.float32), k, candidates)[0]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, candidates: Optional[np.ndarray] = None, **kwargs) -> List[Tuple[Document, float]]:
+        return [(self.get_document(i), score) for i, score in self.search_positions(embedding, k, candidates)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> List[Tuple[Document, float]]:
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def batch_similarity_search_with_score(self, queries: List[str], k: int = 4, candidates: Optional[np.ndarray] = None, **kwargs) -> List[List[Tuple[Document, float]]]:
+        """여러 질의를 한 번의 임베딩 호출과 한 번의 행렬 검색으로 처리합니다."""
+        if not queries:
+            return []
+        embeddings = np.asarray(self.embedding_function.embed_documents(queries), dtype=np.float32)
+        return [
+            [(self.get_document(i), score) for i, score in hits]
+            for hits in self.backend.search(embeddings, k, candidates)
+        ]
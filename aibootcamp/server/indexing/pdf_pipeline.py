@@ -0,0 +1,192 @@
+"""
+병렬 PDF 수집 파이프라인
+
+이 모듈은 PDF를 페이지 범위 단위 작업으로 나누어 프로세스 풀에서 처리합니다.
+각 페이지는 PyMuPDF로 한 번만 열어 텍스트와 테이블을 함께 추출하고,
+작업 결과는 (파일 순서, 페이지 순서)로 스트리밍하여 실행마다 동일한 순서를 보장합니다.
+동시에 처리 중인 작업 수를 제한하므로 PDF가 늘어나도 메모리 사용량은 일정합니다.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+from langchain.schema import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+
+# 작업 단위: (파일 경로, 시작 페이지, 끝 페이지(미포함))
+PageRange = Tuple[str, int, int]
+
+
+def format_table(rows: List[List]) -> str:
+    """테이블 행 목록을 탭/개행 구분 문자열로 변환합니다."""
+    return "\n".join([
+        "\t".join([
+            str(cell).replace("\n", " ").strip() if cell is not None else ""
+            for cell in row
+        ]) for row in rows
+    ])
+
+
+def _extract_page_range(
+    pdf_path: str, start: int, end: int, chunk_size: int, chunk_overlap: int
+) -> Tuple[List[Document], List[Document]]:
+    """
+    페이지 범위에서 텍스트와 테이블을 한 번에 추출하고 분할합니다.
+
+    프로세스 풀 워커에서 실행되므로 모듈 최상위 함수로 정의합니다.
+
+    Returns:
+        (텍스트 청크 목록, 테이블 청크 목록)
+    """
+    file_name = os.path.basename(pdf_path)
+    text_docs = []
+    table_docs = []
+
+    with fitz.open(pdf_path) as pdf:
+        total_pages = pdf.page_count
+        for page_no in range(start, end):
+            page = pdf[page_no]
+
+            # 텍스트 (PyMuPDFLoader와 동일한 메타데이터 구성)
+            text_docs.append(
+                Document(
+                    page_content=page.get_text(),
+                    metadata={
+                        "source": pdf_path,
+                        "file_path": pdf_path,
+                        "page": page_no,
+                        "total_pages": total_pages,
+                        "file": file_name,
+                    },
+                )
+            )
+
+            # 테이블 (같은 페이지 객체에서 추출)
+            for table in page.find_tables().tables:
+                table_docs.append(
+                    Document(
+                        page_content=format_table(table.extract()),
+                        metadata={"source": "table", "file": file_name, "page": page_no},
+                    )
+                )
+
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return text_splitter.split_documents(text_docs), text_splitter.split_documents(table_docs)
+
+
+def _iter_tasks(pdf_files: List[str], pages_per_task: int) -> Iterator[Tuple[str, int, int, Optional[Exception]]]:
+    """PDF 파일들을 페이지 범위 작업으로 나누어 차례로 반환합니다. 파일마다 최소 한 개의 작업을 만듭니다."""
+    for pdf_path in pdf_files:
+        try:
+            with fitz.open(pdf_path) as pdf:
+                page_count = pdf.page_count
+        except Exception as e:
+            yield pdf_path, 0, 0, e
+            continue
+
+        for start in range(0, max(page_count, 1), pages_per_task):
+            yield pdf_path, start, min(start + pages_per_task, page_count), None
+
+
+def iter_pdf_chunks(
+    pdf_files: List[str],
+    chunk_size: int,
+    chunk_overlap: int,
+    max_workers: Optional[int] = None,
+    pages_per_task: int = 16,
+    max_inflight: Optional[int] = None,
+) -> Iterator[Tuple[str, List[Document], Optional[Exception]]]:
+    """
+    여러 PDF를 프로세스 풀에서 병렬로 파싱/분할하며 페이지 범위 단위로 결과를 스트리밍합니다.
+
+    동시에 제출되는 작업 수를 max_inflight로 제한하므로 코퍼스 크기와 관계없이
+    메모리에 올라가는 페이지 수가 일정하며, 결과는 입력 파일 순서 -> 페이지 순서로 반환됩니다.
+
+    Args:
+        pdf_files: 처리할 PDF 경로 목록
+        chunk_size: 텍스트 분할 크기
+        chunk_overlap: 텍스트 분할 중첩 크기
+        max_workers: 프로세스 수 (None 또는 0이면 CPU 코어 수, 1이면 현재 프로세스에서 처리)
+        pages_per_task: 작업 하나가 처리할 페이지 수
+        max_inflight: 동시에 제출할 최대 작업 수 (None 또는 0이면 max_workers * 2)
+
+    Yields:
+        (파일명, 페이지 범위의 텍스트 청크 + 테이블 청크, 오류 또는 None)
+    """
+    print(f"[START]pdf_pipeline.iter_pdf_chunks({len(pdf_files)} files,{max_workers},{pages_per_task},{max_inflight})")
+    max_workers = max_workers or os.cpu_count() or 1
+    max_inflight = max_inflight or max_workers * 2
+
+    def result_of(pdf_path, start, end, outcome):
+        file_name = os.path.basename(pdf_path)
+        try:
+            text_chunks, table_chunks = outcome()
+            return file_name, text_chunks + table_chunks, None
+        except Exception as e:
+            print(f"  - {file_name} {start}~{end}페이지 처리 실패: {str(e)}")
+            return file_name, [], e
+
+    def planning_error(error):
+        def raise_error():
+            raise error
+        return raise_error
+
+    tasks = _iter_tasks(pdf_files, pages_per_task)
+
+    if max_workers == 1:
+        for pdf_path, start, end, error in tasks:
+            outcome = planning_error(error) if error else (
+                lambda: _extract_page_range(pdf_path, start, end, chunk_size, chunk_overlap)
+            )
+            yield result_of(pdf_path, start, end, outcome)
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for pdf_path, start, end, error in tasks:
+            if error:
+                outcome = planning_error(error)
+            else:
+                outcome = executor.submit(
+                    _extract_page_range, pdf_path, start, end, chunk_size, chunk_overlap
+                ).result
+            pending.append((pdf_path, start, end, outcome))
+
+            # 제출 순서대로 결과를 꺼내 순서를 보장하고, 대기 작업 수를 제한한다
+            if len(pending) >= max_inflight:
+                yield result_of(*pending.popleft())
+
+        while pending:
+            yield result_of(*pending.popleft())
+
+
+def ingest_pdfs(
+    pdf_files: List[str],
+    chunk_size: int,
+    chunk_overlap: int,
+    max_workers: Optional[int] = None,
+    pages_per_task: int = 16,
+) -> Dict[str, List[Document]]:
+    """
+    여러 PDF를 병렬로 파싱/분할하여 파일별로 모아 반환합니다.
+
+    전체 결과를 메모리에 모으므로 소량의 PDF에만 사용하고,
+    인덱스 빌드는 iter_pdf_chunks()로 스트리밍 처리합니다.
+
+    Returns:
+        Dict[str, List[Document]]: 파일명 -> 분할된 문서 목록 (오류가 난 파일은 제외)
+    """
+    documents = {}
+    failed = set()
+    for file_name, chunks, error in iter_pdf_chunks(
+        pdf_files, chunk_size, chunk_overlap, max_workers=max_workers, pages_per_task=pages_per_task
+    ):
+        if error:
+            failed.add(file_name)
+        documents.setdefault(file_name, []).extend(chunks)
+
+    return {name: docs for name, docs in documents.items() if name not in failed}
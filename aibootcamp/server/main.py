@@ -1,10 +1,16 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 
 # 절대 경로 임포트로 수정
+from routers import health
 from routers import history
 from routers import workflow
-from utils.config import save_vectorstore
+from indexing.build_task import index_build_task
+from workflow.graph import get_advice_graph
+from retrieval.search_service import RAG_MODES
+from utils.config import close_clients, settings, warmup_clients
 
 # 데이터베이스 초기화를 위한 임포트 추가
 from db.database import Base, engine
@@ -12,42 +18,40 @@ from db.database import Base, engine
 # 데이터베이스 초기화
 Base.metadata.create_all(bind=engine)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 벡터 스토어 초기화는 백그라운드에서 진행하고 서버는 바로 요청을 받는다
+    # 매니페스트와 비교하여 추가/변경된 PDF만 다시 처리하고, 변경이 없으면 기존 인덱스를 재사용한다
+    # 빌드 중 상담 요청은 이전 인덱스로 검색하거나, 인덱스가 없으면 RAG 없이 응답한다
+    index_build_task.start()
+
+    # 상담 그래프는 검색 범위별로 한 번만 컴파일하여 모든 요청이 재사용한다
+    for rag_mode in RAG_MODES:
+        get_advice_graph(rag_mode)
+
+    # Azure OpenAI 연결 풀을 미리 열어 첫 요청의 연결 설정 지연을 없앤다
+    if settings.AOAI_WARMUP:
+        await warmup_clients()
+
+    yield
+
+    await close_clients()
+
+
 # FastAPI 인스턴스 생성
 app = FastAPI(
     title="IPO Advisory Consultant API",
     description="IPO Advisory Consultant 서비스를 위한 API",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # router 추가
+app.include_router(health.router)
 app.include_router(history.router)
 app.include_router(workflow.router)
 
-# 벡터 스토어 초기화 (여러 PDF 파일 처리)
-import os
-import shutil
-from utils.config import save_multiple_pdfs_vectorstore
-
-vector_index_path = "./vector_index"
-
-# 기존 벡터 인덱스 삭제
-if os.path.exists(vector_index_path):
-    print("기존 벡터 인덱스 삭제 중...")
-    shutil.rmtree(vector_index_path)
-    print("기존 벡터 인덱스 삭제 완료")
-
-print("여러 PDF 파일로 새로운 벡터 스토어 생성 중...")
-try:
-    vectorstore = save_multiple_pdfs_vectorstore("./data")
-    if vectorstore:
-        print("벡터 스토어 생성 완료")
-    else:
-        print("벡터 스토어 생성 실패")
-except Exception as e:
-    print(f"벡터 스토어 생성 실패: {e}")
-    print("서버는 계속 실행되지만 검색 기능이 제한될 수 있습니다.")
-
-
 # 실행은 server 경로에서
 # . venv/bin/activate
 # uvicorn main:app --port=8081
@@ -0,0 +1,277 @@
+"""
+벡터 검색 백엔드
+
+이 모듈은 메모리 맵 인덱스(vectors.npy) 위에서 동작하는 벡터 검색 백엔드를 제공합니다.
+배포 환경의 코퍼스 크기와 질의량에 맞게 Settings.VECTOR_INDEX_BACKEND로 선택합니다.
+
+- flat: float32 행렬 정확 검색 (기본값)
+- fp16: float16 행렬 정확 검색 (pickle 없음, 메모리 절반, 소규모 코퍼스용)
+- hnsw: FAISS HNSW 근사 검색 (낮은 지연시간)
+- ivfpq: FAISS IVF-PQ 근사 검색 (대규모 코퍼스용, 학습 데이터가 부족하면 sq8로 대체)
+- sq8: FAISS 8비트 스칼라 양자화 검색
+
+모든 백엔드는 제곱 L2 거리를 반환하며, 메모리 사용량과 질의 지연시간 통계를 제공합니다.
+메타데이터 필터의 후보 위치(candidates)가 주어지면 후보 벡터만 검색합니다.
+"""
+
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+# 검색 결과: 질의별 (벡터 위치, 제곱 L2 거리) 목록
+SearchResult = List[List[Tuple[int, float]]]
+
+
+class VectorBackend(ABC):
+    """벡터 검색 백엔드 기본 클래스"""
+
+    name = ""
+
+    def __init__(self):
+        self._latencies = deque(maxlen=1000)  # 최근 질의 지연시간 (초)
+        self._queries = 0
+        self._lock = threading.Lock()
+
+    @property
+    @abstractmethod
+    def ntotal(self) -> int:
+        """인덱스의 벡터 수"""
+
+    @abstractmethod
+    def memory_bytes(self) -> int:
+        """인덱스가 차지하는 메모리(또는 메모리 맵) 크기"""
+
+    @abstractmethod
+    def _search(self, queries: np.ndarray, k: int, candidates: Optional[np.ndarray] = None) -> SearchResult:
+        pass
+
+    def search(self, queries: np.ndarray, k: int, candidates: Optional[np.ndarray] = None) -> SearchResult:
+        """
+        질의 벡터 행렬 (n, dim)에 대해 질의별 상위 k개 결과를 반환합니다.
+
+        candidates가 주어지면 해당 벡터 위치(오름차순 배열) 안에서만 검색합니다.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if candidates is not None:
+            candidates = np.asarray(candidates, dtype=np.int64)
+        total = self.ntotal if candidates is None else len(candidates)
+        if total == 0 or k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        started = time.perf_counter()
+        results = self._search(queries, min(k, total), candidates)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self._queries += len(queries)
+            self._latencies.append(elapsed / max(len(queries), 1))
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """메모리 사용량과 질의 지연시간 통계를 반환합니다."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            queries = self._queries
+
+        def percentile(p):
+            return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else None
+
+        return {
+            "backend": self.name,
+            "ntotal": self.ntotal,
+            "memory_bytes": self.memory_bytes(),
+            "queries": queries,
+            "latency_ms_p50": percentile(0.5),
+            "latency_ms_p95": percentile(0.95),
+        }
+
+
+def _top_k(distances: np.ndarray, k: int) -> List[Tuple[int, float]]:
+    """거리 벡터에서 가장 가까운 k개의 (위치, 거리)를 오름차순으로 반환합니다."""
+    top = np.argpartition(distances, k - 1)[:k]
+    top = top[np.argsort(distances[top], kind="stable")]
+    return [(int(i), float(distances[i])) for i in top]
+
+
+def _exact_search(
+    vectors: np.ndarray,
+    norms: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    candidates: Optional[np.ndarray] = None,
+    block_rows: int = 65536,
+) -> SearchResult:
+    """전체 벡터 또는 후보 위치의 벡터에 대해 블록 단위 정확 검색을 수행합니다."""
+    total = len(vectors) if candidates is None else len(candidates)
+    query_norms = np.einsum("ij,ij->i", queries, queries)
+    distances = np.empty((len(queries), total), dtype=np.float32)
+
+    # 블록 단위로 계산하여 fp16 변환 등 임시 메모리를 제한한다
+    for start in range(0, total, block_rows):
+        end = min(start + block_rows, total)
+        rows = slice(start, end) if candidates is None else candidates[start:end]
+        block = np.asarray(vectors[rows], dtype=np.float32)
+        distances[:, start:end] = norms[rows][None, :] - 2.0 * (queries @ block.T) + query_norms[:, None]
+
+    results = [_top_k(row, k) for row in distances]
+    if candidates is not None:
+        results = [[(int(candidates[i]), d) for i, d in hits] for hits in results]
+    return results
+
+
+class FlatBackend(VectorBackend):
+    """float32 메모리 맵 행렬 정확 검색"""
+
+    name = "flat"
+    block_rows = 65536  # 한 번에 계산할 벡터 행 수
+
+    def __init__(self, vectors: np.ndarray, norms: np.ndarray):
+        super().__init__()
+        self.vectors = vectors
+        self.norms = norms
+
+    @property
+    def ntotal(self) -> int:
+        return int(self.vectors.shape[0])
+
+    def memory_bytes(self) -> int:
+        return int(self.vectors.nbytes + self.norms.nbytes)
+
+    def _search(self, queries: np.ndarray, k: int, candidates: Optional[np.ndarray] = None) -> SearchResult:
+        return _exact_search(self.vectors, self.norms, queries, k, candidates, self.block_rows)
+
+
+class Float16Backend(FlatBackend):
+    """float16 메모리 맵 행렬 정확 검색 (블록 단위로 float32 변환 후 계산)"""
+
+    name = "fp16"
+    block_rows = 8192
+
+
+class FaissBackend(VectorBackend):
+    """
+    FAISS 근사 검색 인덱스 (HNSW, IVF-PQ, SQ8)
+
+    필터 후보가 exact_filter_rows 이하이면 float32 벡터 행렬에서 후보만 정확 검색하고,
+    그보다 많으면 IDSelector로 근사 검색 범위를 후보로 제한합니다.
+    """
+
+    exact_filter_rows = 50000
+
+    def __init__(self, name: str, index, file_path: str, vectors: np.ndarray, norms: np.ndarray):
+        super().__init__()
+        self.name = name
+        self.index = index
+        self.vectors = vectors
+        self.norms = norms
+        self._memory_bytes = os.path.getsize(file_path)
+
+    @property
+    def ntotal(self) -> int:
+        return int(self.index.ntotal)
+
+    def memory_bytes(self) -> int:
+        return self._memory_bytes
+
+    def _search(self, queries: np.ndarray, k: int, candidates: Optional[np.ndarray] = None) -> SearchResult:
+        if candidates is None:
+            distances, positions = self.index.search(queries, k)
+        elif len(candidates) <= self.exact_filter_rows:
+            return _exact_search(self.vectors, self.norms, queries, k, candidates)
+        else:
+            import faiss
+
+            selector = faiss.IDSelectorBatch(len(candidates), faiss.swig_ptr(candidates))
+            if self.name == "hnsw":
+                params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.index.hnsw.efSearch)
+            elif self.name == "ivfpq":
+                params = faiss.SearchParametersIVF(sel=selector, nprobe=self.index.nprobe)
+            else:
+                params = faiss.SearchParameters(sel=selector)
+            distances, positions = self.index.search(queries, k, params=params)
+        return [
+            [(int(i), float(d)) for i, d in zip(row_i, row_d) if i >= 0]
+            for row_i, row_d in zip(positions, distances)
+        ]
+
+
+BACKENDS = ("flat", "fp16", "hnsw", "ivfpq", "sq8")
+FP16_FILE = "vectors_fp16.npy"
+FAISS_FILES = {"hnsw": "index_hnsw.faiss", "ivfpq": "index_ivfpq.faiss", "sq8": "index_sq8.faiss"}
+
+
+def build_backend(name: str, vectors: np.ndarray, index_path: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    선택한 백엔드의 인덱스 파일을 vectors.npy로부터 생성합니다.
+
+    Returns:
+        str: 실제로 생성된 백엔드 이름 (ivfpq 학습 데이터가 부족하면 sq8)
+    """
+    options = options or {}
+    if name not in BACKENDS:
+        raise ValueError(f"지원하지 않는 벡터 백엔드: {name} (지원: {', '.join(BACKENDS)})")
+    if name == "flat":
+        return name
+
+    if name == "fp16":
+        path = os.path.join(index_path, FP16_FILE)
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, vectors.astype(np.float16))
+        os.replace(path + ".tmp", path)
+        return name
+
+    import faiss
+
+    ntotal, dim = vectors.shape
+    if name == "ivfpq":
+        nlist = min(options.get("ivf_nlist", 256), max(ntotal // 39, 1))
+        pq_m = options.get("pq_m", 32)
+        # IVF 학습에 필요한 벡터 수가 부족하거나 차원이 PQ 분할 수로 나누어지지 않으면 SQ8로 대체
+        if ntotal < 39 * nlist or ntotal < 256 or dim % pq_m != 0:
+            print(f"IVF-PQ 학습 데이터 부족 ({ntotal}개), sq8 백엔드로 대체")
+            name = "sq8"
+        else:
+            quantizer = faiss.IndexFlatL2(dim)
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, 8)
+            index.train(vectors)
+
+    if name == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, options.get("hnsw_m", 32))
+        index.hnsw.efConstruction = options.get("hnsw_ef_construction", 200)
+    elif name == "sq8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit)
+        index.train(vectors)
+
+    index.add(vectors)
+    path = os.path.join(index_path, FAISS_FILES[name])
+    faiss.write_index(index, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    print(f"{name} 백엔드 인덱스 생성 완료: {ntotal}개 벡터")
+    return name
+
+
+def load_backend(name: str, index_path: str, vectors: np.ndarray, norms: np.ndarray, options: Optional[Dict[str, Any]] = None) -> VectorBackend:
+    """인덱스 디렉토리에서 백엔드를 로드합니다."""
+    options = options or {}
+
+    if name == "fp16":
+        return Float16Backend(np.load(os.path.join(index_path, FP16_FILE), mmap_mode="r"), norms)
+
+    if name in FAISS_FILES:
+        import faiss
+
+        path = os.path.join(index_path, FAISS_FILES[name])
+        index = faiss.read_index(path)
+        if name == "hnsw":
+            index.hnsw.efSearch = options.get("hnsw_ef_search", 64)
+        elif name == "ivfpq":
+            index.nprobe = options.get("ivf_nprobe", 16)
+        return FaissBackend(name, index, path, vectors, norms)
+
+    return FlatBackend(vectors, norms)
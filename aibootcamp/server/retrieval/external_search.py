@@ -0,0 +1,277 @@
+"""
+비동기 외부 검색
+
+이 모듈은 DuckDuckGo와 Wikipedia 검색을 비동기로 동시에 실행합니다.
+질의 사이에 고정 지연(sleep)을 두는 대신, 프로세스 전체 요청이 공유하는 공급자별
+토큰 버킷으로 요청 속도를 제한하고 모든 질의를 한 번에 보냅니다.
+공급자별 타임아웃이 지나면 그때까지 도착한 결과만 반환합니다.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+import httpx
+from duckduckgo_search import DDGS
+from langchain.schema import Document
+
+from utils.config import get_external_search_cache, get_http_clients, settings
+
+
+DDG_TIMELIMIT = "y"  # DuckDuckGo 검색 기간 (최근 1년)
+WIKIPEDIA_REGION = "ko"  # 한국어 Wikipedia
+
+
+class TokenBucket:
+    """
+    스레드/이벤트 루프에 무관한 토큰 버킷 레이트 리미터
+
+    acquire()는 토큰을 예약하고 사용 가능해질 때까지 비동기로 기다리므로,
+    여러 요청이 동시에 호출해도 전체 요청 속도가 rate를 넘지 않습니다.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """토큰 하나를 예약하고 사용할 수 있을 때까지 남은 시간(초)을 반환합니다."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(delay, self._paused_until - now)
+
+    async def acquire(self, timeout: Optional[float] = None) -> bool:
+        """토큰을 얻으면 True, timeout 안에 얻을 수 없으면 예약을 취소하고 False를 반환합니다."""
+        delay = self._reserve()
+        if timeout is not None and delay > timeout:
+            with self._lock:
+                self._tokens += 1
+            return False
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return True
+
+    def pause(self, seconds: float) -> None:
+        """레이트 리밋 응답을 받았을 때 일정 시간 동안 요청을 멈춥니다."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> TokenBucket:
+    """공급자별 프로세스 전역 토큰 버킷을 반환합니다."""
+    bucket = _buckets.get(provider)
+    if bucket is None:
+        with _buckets_lock:
+            bucket = _buckets.get(provider)
+            if bucket is None:
+                if provider == "duckduckgo":
+                    bucket = TokenBucket(settings.DDG_RATE_PER_SECOND, settings.DDG_BURST)
+                else:
+                    bucket = TokenBucket(settings.WIKIPEDIA_RATE_PER_SECOND, settings.WIKIPEDIA_BURST)
+                _buckets[provider] = bucket
+    return bucket
+
+
+async def _collect(provider: str, coroutines: List, timeout: float) -> List[Document]:
+    """공급자의 질의를 동시에 실행하고, 타임아웃까지 완료된 질의의 결과만 질의 순서대로 반환합니다."""
+    if not coroutines:
+        return []
+
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+    finally:
+        # 타임아웃 또는 호출자 취소 시 남은 질의를 정리한다
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+    if pending:
+        print(f"{provider} 검색 타임아웃 ({timeout}초): {len(pending)}개 질의 결과 제외")
+
+    results: List[Document] = []
+    for task in tasks:
+        if task.done() and not task.cancelled() and task.exception() is None:
+            results.extend(task.result())
+    return results
+
+
+async def _duckduckgo_query(query: str, language: str, max_results: int, timeout: float) -> List[Document]:
+    # SQLite 조회/저장은 동시에 실행 중인 다른 질의를 막지 않도록 스레드에서 실행한다
+    cache = get_external_search_cache()
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.get, "duckduckgo", query, language, DDG_TIMELIMIT, max_results)
+        if cached is not None:
+            print(f"DuckDuckGo 캐시 적중 '{query}': {len(cached)}개")
+            return cached
+
+    bucket = get_rate_limiter("duckduckgo")
+    if not await bucket.acquire(timeout):
+        print(f"DuckDuckGo 요청 한도 초과, '{query}' 검색 생략")
+        return []
+
+    try:
+        # duckduckgo_search는 동기 라이브러리이므로 스레드에서 실행
+        results = await asyncio.to_thread(
+            DDGS().text,
+            query,
+            region=language,
+            safesearch="moderate",
+            timelimit=DDG_TIMELIMIT,
+            max_results=max_results,
+        )
+    except Exception as e:
+        print(f"DuckDuckGo 검색 실패 ({query}): {str(e)}")
+        if "202" in str(e) or "ratelimit" in str(e).lower():
+            print("DuckDuckGo Rate Limit 감지, 요청을 잠시 중단합니다")
+            bucket.pause(settings.DDG_RATELIMIT_PAUSE)
+        return []
+
+    documents = []
+    for result in results or []:
+        title = result.get("title", "")
+        body = result.get("body", "")
+        url = result.get("href", "")
+
+        if body and len(body) > 50:  # 의미있는 내용만 포함
+            documents.append(
+                Document(
+                    page_content=body,
+                    metadata={
+                        "source": url,
+                        "section": "duckduckgo",
+                        "topic": title,
+                        "query": query,
+                    },
+                )
+            )
+
+    if cache is not None:
+        await asyncio.to_thread(cache.put, "duckduckgo", query, documents, language, DDG_TIMELIMIT, max_results)
+    print(f"DuckDuckGo에서 '{query}' 검색 완료: {len(documents)}개")
+    return documents
+
+
+async def _wikipedia_query(client: httpx.AsyncClient, query: str, timeout: float) -> List[Document]:
+    cache = get_external_search_cache()
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.get, "wikipedia", query, WIKIPEDIA_REGION)
+        if cached is not None:
+            print(f"Wikipedia 캐시 적중 '{query}': {len(cached)}개")
+            return cached
+
+    if not await get_rate_limiter("wikipedia").acquire(timeout):
+        print(f"Wikipedia 요청 한도 초과, '{query}' 검색 생략")
+        return []
+
+    try:
+        # Wikipedia API 검색 (공유 클라이언트의 기본 타임아웃 대신 요청별 타임아웃 사용)
+        response = await client.get(
+            f"https://{WIKIPEDIA_REGION}.wikipedia.org/api/rest_v1/page/summary/{quote(query)}",
+            timeout=timeout,
+        )
+        if response.status_code == 404:
+            # 문서가 없는 질의는 결과 없음으로 캐시
+            if cache is not None:
+                await asyncio.to_thread(cache.put, "wikipedia", query, [], WIKIPEDIA_REGION)
+            return []
+        if response.status_code != 200:
+            return []
+
+        data = response.json()
+        documents = []
+        if data.get("extract"):
+            documents.append(
+                Document(
+                    page_content=data["extract"],
+                    metadata={
+                        "source": data.get("content_urls", {}).get("desktop", {}).get("page", ""),
+                        "section": "wikipedia",
+                        "topic": data.get("title", query),
+                        "query": query,
+                    },
+                )
+            )
+
+        if cache is not None:
+            await asyncio.to_thread(cache.put, "wikipedia", query, documents, WIKIPEDIA_REGION)
+        print(f"Wikipedia에서 '{query}' 검색 완료: {len(documents)}개")
+        return documents
+    except Exception as e:
+        print(f"Wikipedia 검색 실패 ({query}): {str(e)}")
+        return []
+
+
+async def asearch_duckduckgo(
+    queries: List[str],
+    language: str = "ko",
+    max_results: int = 5,
+    timeout: Optional[float] = None,
+) -> List[Document]:
+    """DuckDuckGo에서 모든 질의를 동시에 검색합니다. 타임아웃까지 도착한 결과만 반환합니다."""
+    print(f"[START]external_search.asearch_duckduckgo({queries},{language},{max_results})")
+    timeout = timeout or settings.EXTERNAL_SEARCH_TIMEOUT
+    return await _collect(
+        "DuckDuckGo",
+        [_duckduckgo_query(query, language, max_results, timeout) for query in queries],
+        timeout,
+    )
+
+
+async def asearch_wikipedia(
+    queries: List[str],
+    max_results: int = 5,
+    timeout: Optional[float] = None,
+) -> List[Document]:
+    """
+    Wikipedia에서 모든 질의를 동시에 검색합니다. 타임아웃까지 도착한 결과만 반환합니다.
+
+    호출마다 클라이언트를 만들지 않고 keep-alive 연결 풀을 가진 프로세스 공유 비동기 클라이언트를 사용합니다.
+    """
+    print(f"[START]external_search.asearch_wikipedia({queries},{max_results})")
+    timeout = timeout or settings.EXTERNAL_SEARCH_TIMEOUT
+    _, client = get_http_clients()
+    documents = await _collect(
+        "Wikipedia",
+        [_wikipedia_query(client, query, timeout) for query in queries],
+        timeout,
+    )
+    return documents[:max_results]
+
+
+async def asearch_external_sources(
+    queries: List[str],
+    language: str = "ko",
+    max_results: int = 5,
+    timeout: Optional[float] = None,
+) -> List[Document]:
+    """
+    DuckDuckGo와 Wikipedia를 동시에 검색합니다.
+
+    공급자별로 timeout이 지나면 그때까지 도착한 결과만 사용하며,
+    DuckDuckGo 결과를 먼저, Wikipedia 결과를 뒤에 붙여 반환합니다.
+    """
+    print(f"[START]external_search.asearch_external_sources({queries},{language},{max_results})")
+    started = time.monotonic()
+    ddg_documents, wiki_documents = await asyncio.gather(
+        asearch_duckduckgo(queries, language, max_results, timeout),
+        asearch_wikipedia(queries, max_results, timeout),
+    )
+    print(
+        f"외부 검색 완료 ({time.monotonic() - started:.1f}초): "
+        f"DuckDuckGo {len(ddg_documents)}개, Wikipedia {len(wiki_documents)}개"
+    )
+    return ddg_documents + wiki_documents
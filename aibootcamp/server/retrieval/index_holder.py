@@ -0,0 +1,220 @@
+"""
+프로세스 전역 벡터 스토어 홀더
+
+이 모듈은 벡터 인덱스를 한 번만 로드하여 모든 요청이 공유하도록 합니다.
+디스크의 인덱스 버전(manifest.json)이 바뀌면 백그라운드 스레드에서 새 인덱스를 로드하고,
+검증이 끝난 뒤에만 참조를 교체하므로 진행 중인 검색은 기존 인덱스로 계속 처리됩니다.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple
+
+from indexing.manifest import MANIFEST_FILE, load_manifest
+from indexing.mmap_store import META_FILE
+from retrieval.lexical_index import VOCAB_FILE
+
+
+def index_version(index_path: str) -> Optional[Tuple]:
+    """
+    디스크 인덱스의 버전 토큰을 반환합니다.
+
+    인덱스 파일을 모두 쓴 뒤 마지막에 교체되는 manifest.json, mmap_meta.json, lexical_vocab.json의
+    상태를 사용하고, 모두 없으면 index.faiss의 상태를 사용합니다.
+    """
+    version = []
+    for file_name in (MANIFEST_FILE, META_FILE, VOCAB_FILE):
+        try:
+            stat = os.stat(os.path.join(index_path, file_name))
+            version.append((file_name, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            continue
+
+    if not version:
+        try:
+            stat = os.stat(os.path.join(index_path, "index.faiss"))
+            version.append(("index.faiss", stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            return None
+    return tuple(version)
+
+
+def index_content_version(manifest: Optional[dict], version: Optional[Tuple]) -> Optional[str]:
+    """
+    인덱스 내용 버전 토큰을 반환합니다. (응답 캐시 키에 사용)
+
+    매니페스트의 content_version은 PDF 내용 해시와 청크 ID로 계산하므로, 같은 내용으로 다시 빌드하거나
+    파일 시각만 바뀌어도 같은 값입니다. 매니페스트가 없으면 파일 상태 버전으로 대신합니다.
+    """
+    if manifest is not None and manifest.get("content_version"):
+        return manifest["content_version"]
+    if version is None:
+        return None
+    return hashlib.sha256(json.dumps(version).encode("utf-8")).hexdigest()[:16]
+
+
+def vector_count(vectorstore) -> int:
+    """FAISS 또는 메모리 맵 벡터 스토어의 벡터 수를 반환합니다."""
+    if hasattr(vectorstore, "ntotal"):
+        return vectorstore.ntotal
+    return vectorstore.index.ntotal
+
+
+class VectorStoreHolder:
+    """
+    스레드 안전한 벡터 스토어 보관소
+
+    get()은 항상 완전히 로드/검증된 인덱스만 반환하며, 재로드는 요청 스레드를 막지 않습니다.
+    """
+
+    def __init__(
+        self,
+        index_path: str,
+        loader: Callable[[str], Any],
+        check_interval: float = 5.0,
+    ):
+        self.index_path = index_path
+        self.loader = loader
+        self.check_interval = check_interval
+        self._vectorstore = None
+        self._version = None
+        self._content_version = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()  # 최초 로드 및 교체 보호
+        self._reloading = False
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def content_version(self) -> Optional[str]:
+        """서비스 중인 인덱스의 내용 버전 (재빌드해도 내용이 같으면 그대로)"""
+        return self._content_version
+
+    @property
+    def current(self):
+        """로드를 시도하지 않고 현재 서비스 중인 벡터 스토어를 반환합니다."""
+        return self._vectorstore
+
+    def get(self):
+        """현재 벡터 스토어를 반환합니다. 아직 로드되지 않았으면 동기적으로 로드합니다."""
+        vectorstore = self._vectorstore
+        if vectorstore is None:
+            with self._lock:
+                if self._vectorstore is None:
+                    self._vectorstore, self._version, self._content_version = self._load_validated()
+                    self._last_check = time.monotonic()
+                return self._vectorstore
+
+        self._maybe_schedule_reload()
+        return vectorstore
+
+    def swap(self, vectorstore, version=None, content_version: Optional[str] = None) -> None:
+        """새로 빌드한 벡터 스토어로 즉시 교체합니다."""
+        if version is None:
+            version = index_version(self.index_path)
+            content_version = index_content_version(load_manifest(self.index_path), version)
+        with self._lock:
+            self._vectorstore = vectorstore
+            self._version = version
+            self._content_version = content_version
+            self._last_check = time.monotonic()
+        print(f"[START]index_holder.swap({self._version})")
+
+    def reload(self) -> bool:
+        """
+        디스크 인덱스를 지금 로드하여 교체합니다. (시작 시와 같은 loader 경로)
+
+        로드/검증에 실패하면 기존 인덱스를 유지하고 False를 반환합니다.
+        """
+        vectorstore, version, content_version = self._load_validated()
+        if vectorstore is None:
+            return False
+        self.swap(vectorstore, version, content_version)
+        return True
+
+    def invalidate(self) -> None:
+        """다음 get() 호출 시 디스크 버전을 즉시 확인하도록 합니다."""
+        self._last_check = 0.0
+
+    def _maybe_schedule_reload(self) -> None:
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval or self._reloading:
+            return
+        self._last_check = now
+
+        if index_version(self.index_path) == self._version:
+            return
+
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+
+        threading.Thread(target=self._reload, name="vectorstore-reload", daemon=True).start()
+
+    def _reload(self) -> None:
+        try:
+            self.reload()
+        except Exception as e:
+            print(f"벡터 스토어 재로드 실패, 기존 인덱스 유지: {str(e)}")
+        finally:
+            self._reloading = False
+
+    def _load_validated(self):
+        """
+        인덱스를 로드하고, 로드 전후 버전이 같고 벡터 수가 매니페스트와 일치할 때만 반환합니다.
+
+        빌드가 파일을 쓰는 도중에 로드한 경우 버전이나 벡터 수가 어긋나므로 폐기합니다.
+        """
+        version = index_version(self.index_path)
+        if version is None:
+            print(f"벡터 인덱스가 없습니다: {self.index_path}")
+            return None, None, None
+
+        # 빌드 중 저장된 체크포인트는 서비스하지 않는다
+        manifest = load_manifest(self.index_path)
+        if manifest is not None and manifest.get("complete") is False:
+            return None, None, None
+
+        vectorstore = self.loader(self.index_path)
+
+        if index_version(self.index_path) != version:
+            print("벡터 인덱스가 로드 중 변경되어 폐기합니다")
+            return None, None, None
+
+        manifest = load_manifest(self.index_path)
+        if manifest is not None and manifest.get("ntotal") != vector_count(vectorstore):
+            print("벡터 인덱스가 매니페스트와 일치하지 않아 폐기합니다")
+            return None, None, None
+
+        return vectorstore, version, index_content_version(manifest, version)
+
+
+_holder = None
+_holder_lock = threading.Lock()
+
+
+def get_vectorstore_holder() -> VectorStoreHolder:
+    """프로세스 전역 VectorStoreHolder를 반환합니다."""
+    global _holder
+    if _holder is None:
+        with _holder_lock:
+            if _holder is None:
+                from utils.config import load_vectorstore, settings
+
+                _holder = VectorStoreHolder(
+                    settings.VECTOR_INDEX_PATH,
+                    loader=load_vectorstore,
+                    check_interval=settings.VECTOR_INDEX_RELOAD_INTERVAL,
+                )
+    return _holder
+
+
+def get_vectorstore():
+    """요청 경로에서 사용하는 공유 벡터 스토어를 반환합니다."""
+    return get_vectorstore_holder().get()
@@ -0,0 +1,183 @@
+"""
+어휘(BM25) 검색 인덱스
+
+이 모듈은 벡터 인덱스와 같은 청크로 BM25 역색인을 만들어 ./vector_index 옆에 저장하고,
+임베딩 API 호출 없이 수 밀리초 안에 검색합니다.
+"코넥스", "상장예비심사", 조항 번호처럼 정확한 용어 일치가 중요한 질의에 유리하며,
+임베딩 엔드포인트가 느리거나 제한될 때 어휘 검색만으로 응답할 수 있습니다.
+
+한국어는 조사/어미가 붙어 형태가 달라지므로, 단어 전체 토큰과 함께
+한글 문자 바이그램(2-gram)을 색인합니다. (예: "상장예비심사를" -> 상장, 장예, 예비, 비심, 심사, 사를)
+
+파일 구성:
+- lexical_vocab.json: 용어 목록과 메타데이터
+- lexical_postings.npz: CSR 형식 역색인 (용어별 문서 위치, 빈도)과 문서 길이
+"""
+
+import json
+import os
+import re
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+VOCAB_FILE = "lexical_vocab.json"
+POSTINGS_FILE = "lexical_postings.npz"
+
+_WORD = re.compile(r"\w+")
+_HANGUL = re.compile(r"[가-힣]")
+
+
+def tokenize(text: str) -> List[str]:
+    """텍스트를 단어 토큰과 한글 문자 바이그램으로 분리합니다."""
+    tokens = []
+    for word in _WORD.findall(unicodedata.normalize("NFKC", text).lower()):
+        if len(word) <= 20:
+            tokens.append(word)
+        if len(word) > 2 and _HANGUL.search(word):
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def build_lexical_index(texts: Iterable[str], index_path: str, source_version: Optional[str] = None) -> Dict:
+    """
+    청크 텍스트로 BM25 역색인을 만들어 저장합니다. 텍스트 순서가 곧 문서 위치입니다.
+
+    Returns:
+        Dict: 기록된 메타데이터
+    """
+    print(f"[START]lexical_index.build_lexical_index({index_path},{source_version})")
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    doc_lengths = []
+
+    for position, text in enumerate(texts):
+        counts = Counter(tokenize(text))
+        doc_lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((position, tf))
+
+    vocab = sorted(postings)
+    term_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    for i, term in enumerate(vocab):
+        term_offsets[i + 1] = term_offsets[i] + len(postings[term])
+
+    post_docs = np.empty(term_offsets[-1], dtype=np.int32)
+    post_tfs = np.empty(term_offsets[-1], dtype=np.float32)
+    for i, term in enumerate(vocab):
+        entries = postings[term]
+        post_docs[term_offsets[i]:term_offsets[i + 1]] = [position for position, _ in entries]
+        post_tfs[term_offsets[i]:term_offsets[i + 1]] = [tf for _, tf in entries]
+
+    postings_path = os.path.join(index_path, POSTINGS_FILE)
+    with open(postings_path + ".tmp", "wb") as f:
+        np.savez(
+            f,
+            term_offsets=term_offsets,
+            post_docs=post_docs,
+            post_tfs=post_tfs,
+            doc_lengths=np.asarray(doc_lengths, dtype=np.float32),
+        )
+    os.replace(postings_path + ".tmp", postings_path)
+
+    meta = {"ntotal": len(doc_lengths), "terms": len(vocab), "source_version": source_version}
+    vocab_path = os.path.join(index_path, VOCAB_FILE)
+    with open(vocab_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "vocab": vocab}, f, ensure_ascii=False)
+    os.replace(vocab_path + ".tmp", vocab_path)
+
+    print(f"어휘 인덱스 생성 완료: {len(doc_lengths)}개 문서, {len(vocab)}개 용어")
+    return meta
+
+
+def load_lexical_meta(index_path: str) -> Optional[Dict]:
+    """어휘 인덱스 메타데이터를 읽습니다. 없으면 None을 반환합니다."""
+    vocab_path = os.path.join(index_path, VOCAB_FILE)
+    if not os.path.exists(vocab_path):
+        return None
+    with open(vocab_path, "r", encoding="utf-8") as f:
+        return json.load(f)["meta"]
+
+
+class LexicalIndex:
+    """BM25 어휘 검색 인덱스"""
+
+    def __init__(self, index_path: str, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+        with open(os.path.join(index_path, VOCAB_FILE), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.meta = data["meta"]
+        self.term_ids = {term: i for i, term in enumerate(data["vocab"])}
+
+        with np.load(os.path.join(index_path, POSTINGS_FILE)) as arrays:
+            self.term_offsets = arrays["term_offsets"]
+            self.post_docs = arrays["post_docs"]
+            self.post_tfs = arrays["post_tfs"]
+            self.doc_lengths = arrays["doc_lengths"]
+
+        self.ntotal = len(self.doc_lengths)
+        avg_length = float(self.doc_lengths.mean()) if self.ntotal else 1.0
+        self._length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / max(avg_length, 1e-6))
+        self.queries = 0
+        self.total_seconds = 0.0
+
+    def search(self, query: str, k: int = 5, candidates: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        질의와 BM25 점수가 높은 순으로 (문서 위치, 점수) 상위 k개를 반환합니다.
+        candidates가 주어지면 해당 문서 위치만 점수를 매깁니다.
+        """
+        started = time.perf_counter()
+        scores = np.zeros(self.ntotal, dtype=np.float32)
+        allowed = None
+        if candidates is not None:
+            allowed = np.zeros(self.ntotal, dtype=bool)
+            allowed[candidates] = True
+
+        for term, query_tf in Counter(tokenize(query)).items():
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.post_docs[start:end]
+            tfs = self.post_tfs[start:end]
+            df = end - start
+            idf = np.log(1 + (self.ntotal - df + 0.5) / (df + 0.5))
+            if allowed is not None:
+                keep = allowed[docs]
+                docs, tfs = docs[keep], tfs[keep]
+            # 한 용어의 문서 위치는 중복되지 않으므로 그대로 누적할 수 있다
+            scores[docs] += query_tf * idf * tfs * (self.k1 + 1) / (tfs + self._length_norm[docs])
+
+        hits = []
+        matched = int(np.count_nonzero(scores))
+        if matched and k > 0:
+            k = min(k, matched)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            hits = [(int(i), float(scores[i])) for i in top]
+
+        self.queries += 1
+        self.total_seconds += time.perf_counter() - started
+        return hits
+
+    def stats(self) -> Dict:
+        return {
+            "ntotal": self.ntotal,
+            "terms": len(self.term_ids),
+            "queries": self.queries,
+            "latency_ms_avg": self.total_seconds / self.queries * 1000 if self.queries else None,
+        }
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """여러 순위 목록을 RRF(Reciprocal Rank Fusion)로 합쳐 키 순위를 반환합니다."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda key: -scores[key])
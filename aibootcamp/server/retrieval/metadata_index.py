@@ -0,0 +1,132 @@
+"""
+메타데이터 인덱스
+
+이 모듈은 청크 메타데이터(파일명, 테이블/텍스트 구분, 페이지)를 벡터 위치 순서의
+열(column) 배열로 저장하고, 검색 필터를 후보 벡터 위치 집합으로 변환합니다.
+후보 집합은 벡터/어휘 검색 전에 적용되므로, 다른 문서의 결과가 상위 k개를 차지하지 않고
+검색 대상 벡터 수만큼 계산량도 줄어듭니다.
+
+지원하는 필터 (모든 조건을 AND로 결합):
+- file: 파일명 일부 문자열 또는 목록 (대소문자 무시, 예: "코넥스", ["KONEX", "코스닥"])
+- source: "table" 또는 "text"
+- page: 페이지 번호 또는 (시작, 끝) 범위 (PyMuPDF 기준 0부터 시작, 끝 포함)
+
+파일 구성:
+- metadata_index.npz: 파일명 목록, 청크별 파일 코드, 테이블 여부, 페이지 번호
+"""
+
+import os
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+METADATA_FILE = "metadata_index.npz"
+FILTER_KEYS = ("file", "source", "page")
+
+SearchFilters = Optional[Dict[str, Any]]
+
+
+def _normalize(name: str) -> str:
+    # macOS에서 복사한 한글 파일명(NFD)도 같은 문자열로 비교한다
+    return unicodedata.normalize("NFC", str(name)).lower()
+
+
+def build_metadata_index(metadatas: Iterable[Dict[str, Any]], index_path: str, source_version: Optional[str] = None) -> Dict:
+    """
+    청크 메타데이터로 메타데이터 인덱스를 만들어 저장합니다. 순서가 곧 벡터 위치입니다.
+
+    Returns:
+        Dict: 기록된 메타데이터
+    """
+    print(f"[START]metadata_index.build_metadata_index({index_path},{source_version})")
+    file_codes = {}
+    codes, is_table, pages = [], [], []
+
+    for metadata in metadatas:
+        file_name = metadata.get("file") or os.path.basename(str(metadata.get("source", "")))
+        codes.append(file_codes.setdefault(file_name, len(file_codes)))
+        is_table.append(metadata.get("source") == "table")
+        page = metadata.get("page")
+        pages.append(page if isinstance(page, int) else -1)
+
+    path = os.path.join(index_path, METADATA_FILE)
+    with open(path + ".tmp", "wb") as f:
+        np.savez(
+            f,
+            files=np.asarray(list(file_codes), dtype=str),
+            file_codes=np.asarray(codes, dtype=np.int32),
+            is_table=np.asarray(is_table, dtype=bool),
+            pages=np.asarray(pages, dtype=np.int32),
+            source_version=np.asarray(source_version or ""),
+        )
+    os.replace(path + ".tmp", path)
+
+    print(f"메타데이터 인덱스 생성 완료: {len(codes)}개 청크, {len(file_codes)}개 파일")
+    return {"ntotal": len(codes), "files": len(file_codes), "source_version": source_version}
+
+
+def load_metadata_meta(index_path: str) -> Optional[Dict]:
+    """메타데이터 인덱스의 원본 버전을 읽습니다. 없으면 None을 반환합니다."""
+    path = os.path.join(index_path, METADATA_FILE)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as arrays:
+        return {"ntotal": len(arrays["file_codes"]), "source_version": str(arrays["source_version"]) or None}
+
+
+class MetadataIndex:
+    """청크 메타데이터 열 배열 기반 필터 인덱스"""
+
+    def __init__(self, index_path: str):
+        with np.load(os.path.join(index_path, METADATA_FILE)) as arrays:
+            self.files: List[str] = [str(name) for name in arrays["files"]]
+            self.file_codes = arrays["file_codes"]
+            self.is_table = arrays["is_table"]
+            self.pages = arrays["pages"]
+        self.ntotal = len(self.file_codes)
+        self._normalized_files = [_normalize(name) for name in self.files]
+
+    def candidates(self, filters: SearchFilters) -> Optional[np.ndarray]:
+        """
+        필터에 맞는 벡터 위치를 오름차순 배열로 반환합니다. 필터가 없으면 None(전체)을 반환합니다.
+        """
+        if not filters:
+            return None
+
+        unknown = set(filters) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"지원하지 않는 검색 필터: {', '.join(sorted(unknown))} (지원: {', '.join(FILTER_KEYS)})")
+
+        mask = np.ones(self.ntotal, dtype=bool)
+
+        if filters.get("file"):
+            names = filters["file"]
+            names = [names] if isinstance(names, str) else names
+            needles = [_normalize(name) for name in names]
+            codes = [
+                code for code, file_name in enumerate(self._normalized_files)
+                if any(needle in file_name for needle in needles)
+            ]
+            mask &= np.isin(self.file_codes, codes)
+
+        if filters.get("source"):
+            source = filters["source"]
+            if source not in ("table", "text"):
+                raise ValueError(f"지원하지 않는 source 필터: {source} (지원: table, text)")
+            mask &= self.is_table if source == "table" else ~self.is_table
+
+        page = filters.get("page")
+        if page is not None:
+            start, end = (page, page) if isinstance(page, int) else page
+            mask &= (self.pages >= start) & (self.pages <= end)
+
+        return np.flatnonzero(mask)
+
+    def stats(self) -> Dict:
+        return {
+            "ntotal": self.ntotal,
+            "files": len(self.files),
+            "tables": int(np.count_nonzero(self.is_table)),
+        }
@@ -0,0 +1,145 @@
+"""
+질의 임베딩 캐시
+
+이 모듈은 검색 질의 텍스트의 임베딩 벡터를 프로세스 메모리에 LRU/TTL 방식으로 캐시합니다.
+상담 주제는 자주 반복되고(사이드바 기본 주제, 고정 접미사 "객관적 사실"),
+같은 질의는 임베딩 API 왕복 없이 바로 검색할 수 있습니다.
+선택적으로 SQLite 디스크 캐시(indexing.embedding_cache.EmbeddingCache)를 2차 캐시로 사용합니다.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from indexing.embedding_cache import EmbeddingCache
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """유니코드 정규화(NFKC)와 공백 정리를 거친 질의 텍스트를 반환합니다."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class QueryEmbeddingCache:
+    """
+    LRU + TTL 질의 임베딩 캐시
+
+    메모리에서 찾지 못하면 디스크 캐시를 조회하고, 디스크에서 찾은 항목은 메모리로 올립니다.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 86400, disk_cache: Optional[EmbeddingCache] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_cache = disk_cache
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # 질의 -> (만료 시각, 벡터)
+        self._lock = threading.Lock()
+
+    def get(self, query: str) -> Optional[List[float]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(query)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(query)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[query]
+
+        if self.disk_cache is not None:
+            vector = self.disk_cache.get_many([query])[0]
+            if vector is not None:
+                self._put_memory(query, vector)
+                with self._lock:
+                    self.disk_hits += 1
+                return vector
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, query: str, vector: List[float]) -> None:
+        self._put_memory(query, vector)
+        if self.disk_cache is not None:
+            self.disk_cache.put_many([query], [vector])
+
+    def _put_memory(self, query: str, vector: List[float]) -> None:
+        with self._lock:
+            self._entries[query] = (time.monotonic() + self.ttl_seconds, vector)
+            self._entries.move_to_end(query)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """캐시 적중률 통계를 반환합니다."""
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / total if total else 0.0,
+            }
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """질의 임베딩 시 QueryEmbeddingCache를 먼저 조회하는 Embeddings 래퍼"""
+
+    def __init__(self, embeddings: Embeddings, cache: QueryEmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def embed_query(self, text: str) -> List[float]:
+        query = normalize_query(text)
+        vector = self.cache.get(query)
+        if vector is None:
+            vector = self.embeddings.embed_query(query)
+            self.cache.put(query, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """여러 질의를 임베딩합니다. 캐시에 없는 질의만 한 번의 호출로 임베딩합니다."""
+        queries = [normalize_query(text) for text in texts]
+        vectors = [self.cache.get(query) for query in queries]
+
+        missing = list(dict.fromkeys(query for query, vector in zip(queries, vectors) if vector is None))
+        if missing:
+            new_vectors = dict(zip(missing, self.embeddings.embed_documents(missing)))
+            for query, vector in new_vectors.items():
+                self.cache.put(query, vector)
+            vectors = [vector if vector is not None else new_vectors[query] for query, vector in zip(queries, vectors)]
+
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """비동기 임베딩 클라이언트로 질의를 임베딩합니다."""
+        query = normalize_query(text)
+        vector = self.cache.get(query)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(query)
+            self.cache.put(query, vector)
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """여러 질의를 비동기로 임베딩합니다. 캐시에 없는 질의만 한 번의 호출로 임베딩합니다."""
+        queries = [normalize_query(text) for text in texts]
+        vectors = [self.cache.get(query) for query in queries]
+
+        missing = list(dict.fromkeys(query for query, vector in zip(queries, vectors) if vector is None))
+        if missing:
+            new_vectors = dict(zip(missing, await self.embeddings.aembed_documents(missing)))
+            for query, vector in new_vectors.items():
+                self.cache.put(query, vector)
+            vectors = [vector if vector is not None else new_vectors[query] for query, vector in zip(queries, vectors)]
+
+        return vectors
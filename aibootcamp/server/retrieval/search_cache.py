@@ -0,0 +1,200 @@
+"""
+외부 검색 결과 캐시
+
+이 모듈은 DuckDuckGo와 Wikipedia 검색 결과를 SQLite 파일에 저장하는 디스크 캐시를 제공합니다.
+여러 사용자가 같은 상장 주제를 물으면 같은 외부 검색이 반복되므로,
+캐시된 결과는 네트워크 호출과 레이트 리밋 예산 없이 바로 Document로 돌려줍니다.
+
+- 키: 공급자, 정규화된 질의, 지역(region), 기간(timelimit)
+- 요청한 결과 수(max_results)를 함께 저장하여, 더 많은 결과를 요청하면 다시 검색
+- 공급자별 TTL (DuckDuckGo 결과는 자주, Wikipedia 요약은 드물게 바뀜)
+- 결과가 없었던 질의도 짧은 TTL로 저장 (negative caching)
+- 파일로 저장되므로 서버를 재시작해도 유지되고 모든 uvicorn 워커가 공유
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from langchain.schema import Document
+
+from retrieval.query_cache import normalize_query
+
+
+def _cache_query(query: str) -> str:
+    return normalize_query(query).lower()
+
+
+def search_cache_key(provider: str, query: str, region: str, timelimit: str) -> str:
+    """공급자, 정규화된 질의, 지역, 기간으로 캐시 키를 생성합니다."""
+    payload = "\0".join([provider, _cache_query(query), region or "", timelimit or ""])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExternalSearchCache:
+    """SQLite 기반 외부 검색 결과 캐시 (적중/미스 횟수는 프로세스별로 집계)"""
+
+    def __init__(
+        self,
+        db_path: str,
+        ttl_seconds: Dict[str, float],
+        negative_ttl_seconds: float = 1800,
+        max_entries: int = 50000,
+    ):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")  # 여러 워커가 동시에 읽고 쓸 수 있도록
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS search_results (
+                key TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                query TEXT NOT NULL,
+                region TEXT NOT NULL,
+                timelimit TEXT NOT NULL,
+                documents TEXT NOT NULL,
+                max_results INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_search_results_expires_at ON search_results(expires_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_search_results_provider ON search_results(provider)")
+        self._conn.commit()
+
+    def get(
+        self,
+        provider: str,
+        query: str,
+        region: str = "",
+        timelimit: str = "",
+        max_results: int = 0,
+    ) -> Optional[List[Document]]:
+        """
+        캐시된 검색 결과를 최대 max_results개(0이면 모두) 반환합니다.
+
+        캐시에 없거나 만료되었거나, 저장된 결과가 더 적은 max_results로 검색한 것이면 None,
+        결과 없음이 캐시되어 있으면 빈 목록을 반환합니다.
+        """
+        key = search_cache_key(provider, query, region, timelimit)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT documents, expires_at, max_results FROM search_results WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or row[1] <= time.time() or (max_results and row[2] and row[2] < max_results):
+                self.misses += 1
+                return None
+
+            items = json.loads(row[0])
+            if items:
+                self.hits += 1
+            else:
+                self.negative_hits += 1
+
+        if max_results:
+            items = items[:max_results]
+        return [Document(page_content=item["page_content"], metadata=item["metadata"]) for item in items]
+
+    def put(
+        self,
+        provider: str,
+        query: str,
+        documents: List[Document],
+        region: str = "",
+        timelimit: str = "",
+        max_results: int = 0,
+    ) -> None:
+        """
+        검색 결과를 저장합니다. 결과가 없으면 negative TTL로 저장합니다.
+
+        max_results는 검색할 때 요청한 결과 수(0이면 제한 없음)이며, 이보다 많이 요청하면 캐시 미스가 됩니다.
+        """
+        now = time.time()
+        ttl = self.ttl_seconds.get(provider, self.negative_ttl_seconds) if documents else self.negative_ttl_seconds
+        items = [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents]
+
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO search_results
+                    (key, provider, query, region, timelimit, documents, max_results, created_at, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    search_cache_key(provider, query, region, timelimit),
+                    provider,
+                    _cache_query(query),
+                    region or "",
+                    timelimit or "",
+                    json.dumps(items, ensure_ascii=False),
+                    max_results,
+                    now,
+                    now + ttl,
+                ),
+            )
+            self._conn.commit()
+            self._evict()
+
+    def _evict(self) -> None:
+        """만료된 항목을 지우고, 항목 수가 max_entries를 넘으면 오래된 항목부터 제거합니다. (lock 보유 상태에서 호출)"""
+        self._conn.execute("DELETE FROM search_results WHERE expires_at <= ?", (time.time(),))
+        count = self._conn.execute("SELECT COUNT(*) FROM search_results").fetchone()[0]
+        if count > self.max_entries:
+            # 여유를 두고 90%까지 줄여 매 저장마다 제거가 반복되지 않도록 한다
+            self._conn.execute(
+                "DELETE FROM search_results WHERE key IN (SELECT key FROM search_results ORDER BY created_at LIMIT ?)",
+                (count - int(self.max_entries * 0.9),),
+            )
+        self._conn.commit()
+
+    def evict(self, provider: Optional[str] = None, query: Optional[str] = None) -> int:
+        """
+        항목을 삭제하고 삭제한 수를 반환합니다.
+
+        인자가 없으면 전체, provider만 주면 해당 공급자, query를 주면 해당 질의(모든 지역/기간)를 삭제합니다.
+        """
+        conditions, params = [], []
+        if provider:
+            conditions.append("provider = ?")
+            params.append(provider)
+        if query:
+            conditions.append("query = ?")
+            params.append(_cache_query(query))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._lock:
+            removed = self._conn.execute(f"DELETE FROM search_results{where}", params).rowcount
+            self._conn.commit()
+        print(f"외부 검색 캐시 삭제: {removed}개 항목 (provider={provider}, query={query})")
+        return removed
+
+    def stats(self) -> dict:
+        """공급자별 항목 수와 캐시 적중/미스 통계를 반환합니다."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT provider, COUNT(*), SUM(documents = '[]') FROM search_results "
+                "WHERE expires_at > ? GROUP BY provider",
+                (time.time(),),
+            ).fetchall()
+            hits, negative_hits, misses = self.hits, self.negative_hits, self.misses
+
+        total = hits + negative_hits + misses
+        return {
+            "providers": {provider: {"entries": entries, "negative": negative or 0} for provider, entries, negative in rows},
+            "hits": hits,
+            "negative_hits": negative_hits,
+            "misses": misses,
+            "hit_rate": (hits + negative_hits) / total if total else 0.0,
+        }
@@ -1,12 +1,136 @@
 from langchain.schema import Document
-from typing import List, Literal
+from typing import List, Literal, Optional
 from langchain.schema import HumanMessage, SystemMessage
-from utils.config import get_llm
-import requests
-import json
-import time
-import random
-from duckduckgo_search import DDGS
+from utils.config import get_llm, get_llm_governor, settings
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from retrieval.external_search import asearch_external_sources
+from retrieval.metadata_index import SearchFilters
+from retrieval.vector_store import batch_search, fuse_documents
+from utils.deadline import Deadline
+
+
+# 상담 자료 검색 범위 (에이전트 내부 그래프의 검색 분기 구성)
+# - none: 검색 없음 (임베딩/FAISS 호출 없이 바로 응답 생성, 가장 빠름)
+# - local: 로컬 검색 분기 (RETRIEVAL_MODE에 따라 벡터, 어휘 또는 둘 다)
+# - local+external: 로컬 분기 결과가 부족할 때만 외부 검색 (단계적 검색)
+# - parallel: 벡터/어휘 검색, 검색어 재작성, 외부 검색 분기를 모두 동시에 실행
+RAG_MODES = ("none", "local", "local+external", "parallel")
+
+# local+external 모드에서 외부 검색을 생략할 최소 로컬 결과 수
+MIN_LOCAL_RESULTS = 2
+
+
+def resolve_rag_mode(rag_mode: Optional[str] = None, enable_rag: bool = True) -> str:
+    """요청의 검색 범위를 결정합니다. enable_rag가 False면 none, 지정이 없으면 settings.RAG_MODE"""
+    if not enable_rag:
+        return "none"
+    rag_mode = rag_mode or settings.RAG_MODE
+    if rag_mode not in RAG_MODES:
+        raise ValueError(f"지원하지 않는 검색 범위: {rag_mode} (지원: {', '.join(RAG_MODES)})")
+    return rag_mode
+
+
+async def asearch_local_branch(
+    query: str,
+    k: int,
+    mode: str,
+    budget: Optional[float] = None,
+    deadline: Optional[Deadline] = None,
+    filters: SearchFilters = None,
+) -> List[Document]:
+    """
+    로컬 인덱스 검색 분기 (mode: vector, lexical). 벡터 검색은 CPU 작업이므로 스레드에서 실행합니다.
+
+    budget(초) 안에 끝나지 않으면 결과 없이 진행합니다. deadline이 있으면 줄어든 단계를 기록합니다.
+    filters 예: {"file": "코넥스"}, {"source": "table"}, {"page": (10, 20)} (검색 전에 후보를 좁힘)
+    """
+    print(f"[START]search_service.asearch_local_branch({query},{k},{mode},{budget},{filters})")
+    try:
+        results = await asyncio.wait_for(asyncio.to_thread(_search_local, [query], k, mode, filters), budget)
+    except asyncio.TimeoutError:
+        if deadline is not None:
+            deadline.degrade(f"{mode}_search", "timeout")
+        return []
+    return results[0]
+
+
+async def arewrite_search_branch(
+    topic: str,
+    k: int,
+    budget: Optional[float] = None,
+    deadline: Optional[Deadline] = None,
+    filters: SearchFilters = None,
+    mode: Optional[str] = None,
+) -> List[Document]:
+    """
+    검색어 재작성 분기: LLM으로 검색어를 다시 만든 뒤 로컬 인덱스에서 검색하여 RRF로 결합합니다.
+
+    예산이 QUERY_REWRITE_MIN_SECONDS보다 적으면 생략하고, 실패해도 다른 분기 결과로 진행합니다.
+    """
+    print(f"[START]search_service.arewrite_search_branch({topic},{k},{budget},{filters})")
+    if budget is not None and budget < settings.QUERY_REWRITE_MIN_SECONDS:
+        if deadline is not None:
+            deadline.degrade("query_rewrite", "skipped")
+        return []
+
+    def rewrite_and_search():
+        queries = improve_search_query(topic)
+        results = _search_local(queries, k, mode or settings.RETRIEVAL_MODE, filters)
+        return fuse_documents(results, k, settings.HYBRID_RRF_K)
+
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(rewrite_and_search), budget)
+    except asyncio.TimeoutError:
+        if deadline is not None:
+            deadline.degrade("query_rewrite", "timeout")
+        return []
+    except Exception as e:
+        print(f"검색어 재작성 실패: {str(e)}")
+        return []
+
+
+async def aexternal_search_branch(
+    topic: str,
+    k: int,
+    budget: Optional[float] = None,
+    deadline: Optional[Deadline] = None,
+) -> List[Document]:
+    """외부 검색 분기. 예산이 EXTERNAL_SEARCH_MIN_SECONDS보다 적으면 생략합니다."""
+    print(f"[START]search_service.aexternal_search_branch({topic},{k},{budget})")
+    timeout = settings.EXTERNAL_SEARCH_TIMEOUT
+    if budget is not None:
+        if budget < settings.EXTERNAL_SEARCH_MIN_SECONDS:
+            if deadline is not None:
+                deadline.degrade("external_search", "skipped")
+            return []
+        timeout = min(timeout, budget)
+    documents = await asearch_external_sources([topic], max_results=k, timeout=timeout)
+    return documents[:k]
+
+
+def _search_local(queries: List[str], k: int, mode: str, filters: SearchFilters = None) -> List[List[Document]]:
+    """
+    프로세스 전역 벡터 스토어에서 질의별 문서 목록을 검색합니다. 실패하면 빈 목록을 반환합니다.
+
+    모든 로컬 검색 분기가 사용하는 단일 경로이며, filters는 메타데이터 인덱스로 검색 전에 적용합니다.
+    """
+    from retrieval.index_holder import get_vectorstore
+
+    vectorstore = get_vectorstore()
+    if not vectorstore:
+        print("로컬 벡터 스토어 로드 실패")
+        return [[] for _ in queries]
+
+    # 어휘 인덱스가 없어도 벡터 검색으로 대체하지 않는다 (lexical 방식은 임베딩 호출 없음, hybrid는 벡터 분기와 중복)
+    if mode == "lexical" and getattr(vectorstore, "lexical_index", None) is None:
+        return [[] for _ in queries]
+
+    try:
+        return batch_search(vectorstore, queries, k=k, mode=mode, filters=filters)
+    except Exception as e:
+        print(f"{mode} 검색 실패 ({queries}): {str(e)}")
+        return [[] for _ in queries]
 
 
 def improve_search_query(
@@ -31,7 +155,8 @@ def improve_search_query(
     ]
 
     # 스트리밍 응답 받기
-    response = get_llm().invoke(messages)
+    with get_llm_governor().slot():
+        response = get_llm().invoke(messages)
 
     # ,로 구분된 검색어 추출
     suggested_queries = [q.strip() for q in response.content.split(",")]
@@ -39,98 +164,6 @@ def improve_search_query(
     return suggested_queries[:3]
 
 
-
-
-def get_search_content(
-    improved_queries: str,
-    language: str = "ko",
-    max_results: int = 5,
-) -> List[Document]:
-    print(f"[START]search_service.get_search_content({improved_queries},{language},{max_results})")
-
-    # 1단계: 로컬 PDF 문서에서 검색
-    local_documents = search_local_documents(improved_queries, max_results)
-    
-    # 로컬에서 충분한 결과를 찾았으면 반환
-    if len(local_documents) >= 2:
-        print(f"로컬 PDF에서 {len(local_documents)}개 문서 발견, 외부 검색 생략")
-        return local_documents
-    
-    # 2단계: 로컬 결과가 부족하면 외부 검색 시도
-    print(f"로컬 PDF에서 {len(local_documents)}개 문서 발견, 외부 검색 시도...")
-    external_documents = search_external_sources(improved_queries, language, max_results)
-    
-    # 로컬과 외부 결과 합치기
-    all_documents = local_documents + external_documents
-    
-    if not all_documents:
-        print("모든 검색에서 결과 없음, 기본 정보 제공")
-        return get_default_documents()
-    
-    print(f"총 {len(all_documents)}개 문서 검색 완료 (로컬: {len(local_documents)}, 외부: {len(external_documents)})")
-    return all_documents
-
-
-def search_local_documents(
-    queries: List[str],
-    max_results: int = 5,
-) -> List[Document]:
-    """로컬 PDF 문서에서 검색"""
-    print(f"[START]search_service.search_local_documents({queries},{max_results})")
-    
-    try:
-        from utils.config import load_vectorstore
-        
-        # 로컬 벡터 스토어 로드
-        vectorstore = load_vectorstore()
-        
-        documents = []
-        
-        # 각 쿼리에 대해 벡터 검색 수행
-        for query in queries:
-            try:
-                # 벡터 스토어에서 유사도 검색
-                results = vectorstore.similarity_search(query, k=max_results)
-                if results:
-                    # 중복 제거 및 품질 필터링
-                    filtered_results = []
-                    seen_content = set()
-                    
-                    for result in results:
-                        content_hash = hash(result.page_content[:100])  # 첫 100자로 중복 체크
-                        if content_hash not in seen_content and len(result.page_content) > 30:
-                            filtered_results.append(result)
-                            seen_content.add(content_hash)
-                    
-                    documents.extend(filtered_results)
-                    
-                    # 문서 출처 정보 출력
-                    file_sources = {}
-                    for doc in filtered_results:
-                        file_name = doc.metadata.get("file", "Unknown")
-                        if file_name not in file_sources:
-                            file_sources[file_name] = 0
-                        file_sources[file_name] += 1
-                    
-                    print(f"쿼리 '{query}'에서 {len(filtered_results)}개 문서 발견:")
-                    for file_name, count in file_sources.items():
-                        print(f"  - {file_name}: {count}개")
-                else:
-                    print(f"쿼리 '{query}'에서 검색 결과 없음")
-                
-            except Exception as e:
-                print(f"벡터 검색 실패 ({query}): {str(e)}")
-                continue
-        
-        print(f"로컬 PDF에서 총 {len(documents)}개 문서 검색 완료")
-        return documents
-        
-    except Exception as e:
-        print(f"로컬 벡터 스토어 로드 실패: {str(e)}")
-        print("외부 검색으로 전환합니다...")
-        return []
-
-
 def get_default_documents() -> List[Document]:
     """검색 결과가 없을 때 제공할 기본 문서"""
     default_content = """
@@ -169,125 +202,22 @@ def search_external_sources(
     queries: List[str],
     language: str = "ko",
     max_results: int = 5,
+    timeout: float = None,
 ) -> List[Document]:
-    """외부 소스에서 검색 (DuckDuckGo + Wikipedia)"""
-    print(f"[START]search_service.search_external_sources({queries},{language},{max_results})")
-    
-    documents = []
-    
-    # 1단계: DuckDuckGo 검색 시도 (Rate Limit 방지 로직 포함)
-    ddg_documents = search_duckduckgo(queries, language, max_results)
-    documents.extend(ddg_documents)
-    
-    # 2단계: DuckDuckGo 결과가 부족하면 Wikipedia 검색
-    if len(documents) < 2:
-        wiki_documents = search_wikipedia(queries, max_results)
-        documents.extend(wiki_documents)
-    
-    return documents
+    """
+    외부 소스에서 검색 (DuckDuckGo + Wikipedia 동시 검색)
 
+    동기 호출자용 래퍼입니다. 비동기 코드에서는 asearch_external_sources를 await 하세요.
+    이벤트 루프가 실행 중인 스레드에서 호출되면 asyncio.run을 쓸 수 없으므로 워커 스레드에서 실행합니다.
+    """
+    print(f"[START]search_service.search_external_sources({queries},{language},{max_results})")
+    def search():
+        return asyncio.run(asearch_external_sources(queries, language, max_results, timeout))
 
-def search_duckduckgo(
-    queries: List[str],
-    language: str = "ko",
-    max_results: int = 5,
-) -> List[Document]:
-    """DuckDuckGo 검색 (Rate Limit 방지 포함)"""
-    print(f"[START]search_service.search_duckduckgo({queries},{language},{max_results})")
-    
-    documents = []
-    
     try:
-        ddgs = DDGS()
-        
-        for i, query in enumerate(queries):
-            try:
-                # Rate Limit 방지를 위한 지연
-                if i > 0:
-                    delay = random.uniform(3, 6)  # 3-6초 지연
-                    print(f"DuckDuckGo Rate Limit 방지를 위해 {delay:.1f}초 대기...")
-                    time.sleep(delay)
-                
-                # 검색 수행
-                results = ddgs.text(
-                    query,
-                    region=language,
-                    safesearch="moderate",
-                    timelimit="y",
-                    max_results=max_results,
-                )
-                
-                if results:
-                    for result in results:
-                        title = result.get("title", "")
-                        body = result.get("body", "")
-                        url = result.get("href", "")
-                        
-                        if body and len(body) > 50:  # 의미있는 내용만 포함
-                            documents.append(
-                                Document(
-                                    page_content=body,
-                                    metadata={
-                                        "source": url,
-                                        "section": "duckduckgo",
-                                        "topic": title,
-                                        "query": query,
-                                    },
-                                )
-                            )
-                    
-                    print(f"DuckDuckGo에서 '{query}' 검색 완료: {len([d for d in documents if d.metadata.get('query') == query])}개")
-                
-            except Exception as e:
-                print(f"DuckDuckGo 검색 실패 ({query}): {str(e)}")
-                if "202" in str(e) or "ratelimit" in str(e).lower():
-                    print("DuckDuckGo Rate Limit 감지, Wikipedia 검색으로 전환")
-                    break  # Rate Limit 발생 시 중단
-                continue
-                
-    except Exception as e:
-        print(f"DuckDuckGo 검색 서비스 오류: {str(e)}")
-    
-    return documents
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return search()
 
-
-def search_wikipedia(
-    queries: List[str],
-    max_results: int = 5,
-) -> List[Document]:
-    """Wikipedia API 검색"""
-    print(f"[START]search_service.search_wikipedia({queries},{max_results})")
-    
-    documents = []
-    
-    try:
-        for query in queries:
-            try:
-                # Wikipedia API 검색
-                search_url = f"https://ko.wikipedia.org/api/rest_v1/page/summary/{query}"
-                response = requests.get(search_url, timeout=10)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if 'extract' in data and data['extract']:
-                        documents.append(
-                            Document(
-                                page_content=data['extract'],
-                                metadata={
-                                    "source": data.get('content_urls', {}).get('desktop', {}).get('page', ''),
-                                    "section": "wikipedia",
-                                    "topic": data.get('title', query),
-                                    "query": query,
-                                },
-                            )
-                        )
-                        print(f"Wikipedia에서 '{query}' 검색 완료")
-                
-            except Exception as e:
-                print(f"Wikipedia 검색 실패 ({query}): {str(e)}")
-                continue
-                
-    except Exception as e:
-        print(f"Wikipedia 검색 서비스 오류: {str(e)}")
-    
-    return documents
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(search).result()
@@ -1,23 +1,158 @@
 #import streamlit as st
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
+from langchain.schema import Document
 
+from retrieval.lexical_index import reciprocal_rank_fusion
+from retrieval.metadata_index import SearchFilters
+
+
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+
+
+def batch_search(
+    vectorstore,
+    queries: List[str],
+    k: int = 5,
+    mode: Optional[str] = None,
+    filters: SearchFilters = None,
+) -> List[List[Document]]:
+    """
+    검색 모드에 따라 여러 질의를 검색하여 질의별 문서 목록을 반환합니다.
+
+    - vector: 임베딩 유사도 검색
+    - lexical: BM25 어휘 검색 (임베딩 API 호출 없음)
+    - hybrid: 두 결과를 RRF로 결합. 임베딩 검색이 실패하면 어휘 검색 결과만 반환
+
+    filters(file, source, page)는 메타데이터 인덱스로 후보 위치를 구한 뒤 검색 전에 적용합니다.
+    """
+    from utils.config import settings
+
+    mode = mode or settings.RETRIEVAL_MODE
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"지원하지 않는 검색 모드: {mode} (지원: {', '.join(RETRIEVAL_MODES)})")
+
+    candidates = filter_candidates(vectorstore, filters)
+    if candidates is not None and len(candidates) == 0:
+        print(f"필터와 일치하는 문서 없음: {filters}")
+        return [[] for _ in queries]
+
+    lexical_index = getattr(vectorstore, "lexical_index", None)
+    if mode != "vector" and lexical_index is None:
+        print("어휘 인덱스가 없어 벡터 검색으로 대체합니다")
+        mode = "vector"
+
+    lexical_results = None
+    if mode in ("lexical", "hybrid"):
+        lexical_results = [lexical_search(vectorstore, query, k, candidates) for query in queries]
+        if mode == "lexical":
+            return lexical_results
 
-def search_topic(topic: str, role: str, query: str, k: int = 5) -> List[Dict[str, Any]]:
-    print(f"[START]vector_store.search_topic({topic},{role},{query},{k})")
-    
     try:
-        # 기존 로컬 벡터 스토어 사용 (새로 생성하지 않음)
-        from utils.config import load_vectorstore
-        
-        vector_store = load_vectorstore()
-        if not vector_store:
-            print("로컬 벡터 스토어 로드 실패")
-            return []
-        
-        # 벡터 스토어에서 Similarity Search 수행
-        return vector_store.similarity_search(query, k=k)
-        
+        vector_results = [
+            [doc for doc, _ in hits] for hits in batch_similarity_search(vectorstore, queries, k=k, candidates=candidates)
+        ]
     except Exception as e:
-        print(f"검색 중 오류 발생: {str(e)}")
+        if lexical_results is None:
+            raise
+        # 임베딩 엔드포인트가 느리거나 제한된 경우 어휘 검색 결과로 응답
+        print(f"벡터 검색 실패, 어휘 검색 결과만 사용: {str(e)}")
+        return lexical_results
+
+    if lexical_results is None:
+        return vector_results
+
+    return [
+        fuse_documents([vector_docs, lexical_docs], k, settings.HYBRID_RRF_K)
+        for vector_docs, lexical_docs in zip(vector_results, lexical_results)
+    ]
+
+
+def filter_candidates(vectorstore, filters: SearchFilters) -> Optional[np.ndarray]:
+    """검색 필터를 후보 벡터 위치 배열로 변환합니다. 필터가 없으면 None(전체)을 반환합니다."""
+    if not filters:
+        return None
+
+    metadata_index = getattr(vectorstore, "metadata_index", None)
+    if metadata_index is None:
+        print(f"메타데이터 인덱스가 없어 필터를 적용하지 않습니다: {filters}")
+        return None
+    return metadata_index.candidates(filters)
+
+
+def document_at(vectorstore, position: int) -> Optional[Document]:
+    """벡터 위치의 문서를 반환합니다."""
+    if hasattr(vectorstore, "get_document"):
+        return vectorstore.get_document(position)
+
+    doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[position])
+    return doc if isinstance(doc, Document) else None
+
+
+def lexical_search(vectorstore, query: str, k: int = 5, candidates: Optional[np.ndarray] = None) -> List[Document]:
+    """벡터 스토어에 함께 로드된 BM25 어휘 인덱스로 검색합니다."""
+    hits = vectorstore.lexical_index.search(query, k, candidates)
+    documents = [document_at(vectorstore, position) for position, _ in hits]
+    return [doc for doc in documents if doc is not None]
+
+
+def fuse_documents(rankings: List[List[Document]], k: int, rrf_k: int = 60) -> List[Document]:
+    """여러 검색 결과를 청크 ID 기준 RRF로 결합하여 상위 k개를 반환합니다."""
+    by_key = {}
+    keys = []
+    for docs in rankings:
+        ranking = []
+        for doc in docs:
+            key = doc.metadata.get("id") or doc.page_content
+            by_key.setdefault(key, doc)
+            ranking.append(key)
+        keys.append(ranking)
+    return [by_key[key] for key in reciprocal_rank_fusion(keys, rrf_k)[:k]]
+
+
+def batch_similarity_search(
+    vectorstore,
+    queries: List[str],
+    k: int = 5,
+    candidates: Optional[np.ndarray] = None,
+) -> List[List[Tuple[Document, float]]]:
+    """
+    여러 질의를 한 번에 검색합니다.
+
+    모든 질의를 한 번의 embed_documents 호출로 임베딩하고, 질의 행렬 전체에 대해
+    벡터 검색을 한 번만 수행하여 질의별 (문서, 거리) 목록을 반환합니다.
+    candidates가 주어지면 해당 벡터 위치 안에서만 검색합니다.
+    """
+    print(f"[START]vector_store.batch_similarity_search({queries},{k})")
+    if not queries:
         return []
+
+    # 메모리 맵 벡터 스토어
+    if hasattr(vectorstore, "batch_similarity_search_with_score"):
+        return vectorstore.batch_similarity_search_with_score(queries, k=k, candidates=candidates)
+
+    # LangChain FAISS 벡터 스토어
+    embeddings = np.asarray(vectorstore.embedding_function.embed_documents(queries), dtype=np.float32)
+    if candidates is None:
+        distances, positions = vectorstore.index.search(embeddings, k)
+    else:
+        import faiss
+
+        candidates = np.asarray(candidates, dtype=np.int64)
+        selector = faiss.IDSelectorBatch(len(candidates), faiss.swig_ptr(candidates))
+        distances, positions = vectorstore.index.search(
+            embeddings, min(k, len(candidates)), params=faiss.SearchParameters(sel=selector)
+        )
+
+    results = []
+    for row_positions, row_distances in zip(positions, distances):
+        hits = []
+        for position, distance in zip(row_positions, row_distances):
+            if position < 0:
+                continue
+            doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[position])
+            if isinstance(doc, Document):
+                hits.append((doc, float(distance)))
+        results.append(hits)
+    return results
@@ -0,0 +1,75 @@
+"""
+헬스 체크 API 라우터
+
+이 모듈은 서버 생존 여부(liveness)와 벡터 인덱스 준비 상태(readiness)를 확인하는
+엔드포인트를 제공합니다. 인덱스 빌드와 무관하게 서버 시작 직후부터 응답합니다.
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from indexing.build_task import IndexStatus, index_build_task
+from retrieval.index_holder import get_vectorstore_holder
+from db.response_cache import response_cache
+from workflow.latency import mode_latency
+from utils.config import (
+    get_answer_cache,
+    get_embedding_governor,
+    get_external_search_cache,
+    get_llm_governor,
+    get_query_embedding_cache,
+)
+
+
+router = APIRouter(prefix="/api/v1/health", tags=["health"])
+
+
+# 서버 생존 확인
+@router.get("/live")
+def liveness():
+    return {"status": "ok"}
+
+
+# 인덱스 준비 상태 확인 (인덱스를 서비스할 수 없으면 503)
+@router.get("/ready")
+def readiness():
+    index = index_build_task.snapshot()
+    ready = index["status"] in (IndexStatus.READY, IndexStatus.STALE)
+
+    # 검색 백엔드의 메모리 사용량과 질의 지연시간
+    vectorstore = get_vectorstore_holder().current
+    if vectorstore is not None and hasattr(vectorstore, "stats"):
+        index["backend"] = vectorstore.stats()
+    lexical_index = getattr(vectorstore, "lexical_index", None)
+    if lexical_index is not None:
+        index["lexical"] = lexical_index.stats()
+    metadata_index = getattr(vectorstore, "metadata_index", None)
+    if metadata_index is not None:
+        index["metadata"] = metadata_index.stats()
+    index["query_cache"] = get_query_embedding_cache().stats()
+    index["answer_cache"] = get_answer_cache().stats()
+    external_search_cache = get_external_search_cache()
+    if external_search_cache is not None:
+        index["external_search_cache"] = external_search_cache.stats()
+    # 동시 실행 제한기의 대기열 길이와 대기 시간 (배포 규모 산정용)
+    index["governors"] = {
+        "llm": get_llm_governor().stats(),
+        "embedding": get_embedding_governor().stats(),
+    }
+    # 검색 범위별 자료 검색/첫 토큰/전체 응답 시간
+    index["rag_modes"] = mode_latency.stats()
+    try:
+        index["response_cache"] = response_cache.stats()
+    except Exception as e:
+        index["response_cache"] = {"error": str(e)}
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "index": index},
+    )
+
+
+# 인덱스 재빌드 요청
+@router.post("/index/rebuild")
+def rebuild_index(force: bool = False):
+    started = index_build_task.start(force_rebuild=force)
+    return {"started": started, "index": index_build_task.snapshot()}
@@ -5,23 +5,36 @@
 실시간 스트리밍 응답을 통해 사용자와 AI 에이전트 간의 상담을 지원합니다.
 
 주요 기능:
-- 스트리밍 상담 API
+- 스트리밍 상담 API (LLM 토큰 delta 이벤트, 에이전트 완료 update 이벤트)
 - LangGraph 워크플로우 실행
 - Langfuse 모니터링 연동
+- 응답 캐시 (같은 요청은 SQLite 캐시, 유사한 주제는 의미 기반 캐시에서 저장된 응답 전송)
+- 요청 시간 예산 (예산이 부족한 단계는 줄여서 진행하고 update 이벤트의 degraded로 보고)
+- 로컬 검색 메타데이터 필터 (파일명, 테이블/텍스트, 페이지)
 """
 
-from typing import Any
+from typing import Any, Dict, Literal, Optional
 import uuid
 import json
+import time
 import asyncio
 from fastapi import APIRouter
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from langfuse.callback import CallbackHandler
 
 
 from workflow.state import AgentType, AdviceState
-from workflow.graph import create_advice_graph
+from workflow.graph import get_advice_graph, prompt_version
+from workflow.latency import mode_latency
+from db.response_cache import response_cache, response_cache_key
+from indexing.build_task import IndexStatus, index_build_task
+from retrieval.index_holder import get_vectorstore_holder
+from retrieval.metadata_index import FILTER_KEYS
+from retrieval.search_service import resolve_rag_mode
+from utils.config import get_answer_cache, get_llm_governor, get_query_embeddings, settings
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.governor import ServerBusyError, current_session_id
 
 
 # API 경로를 /api/v1로 변경
@@ -35,7 +48,19 @@ router = APIRouter(
 class WorkflowRequest(BaseModel):
     """워크플로우 요청 데이터 모델"""
     topic: str  # 상담 주제
-    enable_rag: bool = True  # RAG(Retrieval-Augmented Generation) 활성화 여부
+    enable_rag: bool = True  # RAG(Retrieval-Augmented Generation) 활성화 여부 (False면 rag_mode와 관계없이 none)
+    rag_mode: Optional[Literal["none", "local", "local+external", "parallel"]] = None  # 검색 범위 (없으면 서버 설정)
+    stream_tokens: bool = True  # LLM 토큰을 delta 이벤트로 스트리밍할지 여부
+    deadline_seconds: Optional[float] = Field(None, gt=0, le=600)  # 요청 시간 예산 (없으면 서버 설정)
+    filters: Optional[Dict[str, Any]] = None  # 로컬 검색 필터 (예: {"file": "코넥스", "source": "table", "page": [10, 20]})
+
+    @field_validator("filters")
+    @classmethod
+    def check_filters(cls, filters):
+        unknown = set(filters or {}) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"지원하지 않는 검색 필터: {', '.join(sorted(unknown))} (지원: {', '.join(FILTER_KEYS)})")
+        return filters or None
 
 
 class WorkflowResponse(BaseModel):
@@ -44,27 +69,225 @@ class WorkflowResponse(BaseModel):
     result: Any = None  # 처리 결과
 
 
-async def advice_generator(advice_graph, initial_state, langfuse_handler):
+def answer_cache_scope(rag_mode: str, filters: Optional[Dict[str, Any]] = None) -> tuple:
+    """응답 캐시 범위: 검색 범위, 검색 필터, 프롬프트 버전이 같은 응답끼리만 재사용한다"""
+    if filters:
+        return (rag_mode, json.dumps(filters, ensure_ascii=False, sort_keys=True), prompt_version())
+    return (rag_mode, prompt_version())
+
+
+def lookup_cached_response(cache_key: str):
+    """SQLite 응답 캐시를 조회합니다. 조회에 실패하면 None을 반환합니다."""
+    print(f"[START]workflow.lookup_cached_response({cache_key})")
+    try:
+        return response_cache.get(cache_key)
+    except Exception as e:
+        print(f"응답 캐시 조회 실패, 워크플로우를 실행합니다: {str(e)}")
+        return None
+
+
+async def lookup_cached_answer(topic: str, rag_mode: str, filters: Optional[Dict[str, Any]] = None):
+    """
+    상담 주제를 임베딩하여 응답 캐시를 조회합니다.
+    검색 범위가 none이거나 로컬 검색 방식이 lexical이면 임베딩 호출 없이 응답하도록 조회하지 않습니다.
+
+    Returns:
+        (주제 임베딩, 캐시 항목): 캐시를 사용할 수 없으면 임베딩은 None, 캐시 미스면 항목은 None
+    """
+    print(f"[START]workflow.lookup_cached_answer({topic},{rag_mode},{filters})")
+    if not settings.ANSWER_CACHE_ENABLED or rag_mode == "none" or settings.RETRIEVAL_MODE == "lexical":
+        return None, None
+
+    try:
+        vector = await get_query_embeddings().aembed_query(topic)
+    except Exception as e:
+        print(f"응답 캐시 조회 실패, 워크플로우를 실행합니다: {str(e)}")
+        return None, None
+
+    cached = get_answer_cache().get(vector, answer_cache_scope(rag_mode, filters), get_vectorstore_holder().version)
+    return vector, cached
+
+
+async def cached_advice_generator(cached, topic: str):
+    """
+    응답 캐시에 저장된 업데이트 이벤트를 워크플로우와 같은 SSE 형식으로 전송하는 제너레이터
+    """
+    print(f"[START]workflow.cached_advice_generator({cached['topic']},{topic},{cached['similarity']:.3f})")
+
+    for state in cached["events"]:
+        state = {
+            **state,
+            "topic": topic,
+            "index_status": index_build_task.status,
+            "cached": True,  # 캐시된 응답 표시
+        }
+        event_data = {"type": "update", "data": state}
+        yield f"data: {json.dumps(event_data, ensure_ascii=False)}\n\n"
+        await asyncio.sleep(0.01)
+
+    yield f"data: {json.dumps({'type': 'end', 'data': {}}, ensure_ascii=False)}\n\n"
+
+
+# 시간 예산이 지난 뒤 단계가 스스로 끝나기를 기다리는 최대 시간 (초)
+DEADLINE_GRACE_SECONDS = 2.0
+
+
+def error_event(code: str, message: str) -> str:
+    """SSE 오류 이벤트 문자열을 반환합니다."""
+    event_data = {"type": "error", "data": {"code": code, "message": message}}
+    return f"data: {json.dumps(event_data, ensure_ascii=False)}\n\n"
+
+
+async def busy_generator(message: str):
+    """서버가 혼잡할 때 워크플로우를 실행하지 않고 바로 server_busy 오류를 전송하는 제너레이터"""
+    yield error_event("server_busy", message)
+    yield f"data: {json.dumps({'type': 'end', 'data': {}}, ensure_ascii=False)}\n\n"
+
+
+async def advice_generator(
+    advice_graph,
+    initial_state,
+    langfuse_handler,
+    on_complete=None,
+    stream_tokens: bool = True,
+    session_id: str = None,
+    rag_mode: str = None,
+    deadline: Deadline = None,
+    filters: Optional[Dict[str, Any]] = None,
+):
     """
     LangGraph 워크플로우에서 스트리밍 응답을 생성하는 제너레이터
+
+    워크플로우는 이벤트 루프에서 비동기(astream)로 실행하고, LLM이 생성하는 토큰은 delta 이벤트로,
+    에이전트 완료 시점의 전체 상태는 update 이벤트로 전송합니다.
     
     Args:
         advice_graph: LangGraph 컴파일된 워크플로우
         initial_state: 초기 상태
         langfuse_handler: Langfuse 콜백 핸들러
+        on_complete: 워크플로우 완료 시 전송한 업데이트 이벤트 목록을 받는 콜백 (응답 캐시 저장)
+        stream_tokens: True면 LLM 토큰을 delta 이벤트로 전송
+        session_id: Langfuse 세션 ID (공유 그래프에 실행 설정으로 전달)
+        rag_mode: 검색 범위 (범위별 첫 토큰/전체 응답 시간 집계)
+        deadline: 요청 시간 예산 (각 단계에 실행 설정으로 전달, 예산이 지나면 스트림 종료)
+        filters: 로컬 검색 메타데이터 필터 (실행 설정으로 검색 분기에 전달)
         
     Yields:
         str: Server-Sent Events 형식의 JSON 데이터
     """
     print(f"[START]workflow.advice_generator({advice_graph},{initial_state},{langfuse_handler})")
-    
-    # LangGraph 워크플로우에서 스트리밍 청크 처리
-    for chunk in advice_graph.stream(
-        initial_state,
-        config={"callbacks": [langfuse_handler]},
-        subgraphs=True,  # 서브그래프 정보 포함
-        stream_mode="updates",  # 업데이트 모드로 스트리밍
-    ):
+    events = []
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    started = time.perf_counter()
+    first_token = []
+
+    def on_token(role: str, delta: str):
+        if not first_token:
+            first_token.append(time.perf_counter() - started)
+        # 동기 노드가 워커 스레드에서 호출해도 안전하도록 이벤트 루프에 위임
+        loop.call_soon_threadsafe(queue.put_nowait, ("delta", (role, delta)))
+
+    async def run_graph():
+        try:
+            # LangGraph 워크플로우에서 스트리밍 청크 처리
+            async for chunk in advice_graph.astream(
+                initial_state,
+                config={
+                    "callbacks": [langfuse_handler],
+                    "configurable": {
+                        "session_id": session_id,
+                        "on_token": on_token if stream_tokens else None,
+                        "deadline": deadline,
+                        "filters": filters,
+                    },
+                },
+                subgraphs=True,  # 서브그래프 정보 포함
+                stream_mode="updates",  # 업데이트 모드로 스트리밍
+            ):
+                queue.put_nowait(("chunk", chunk))
+        except Exception as e:
+            queue.put_nowait(("error", e))
+        finally:
+            queue.put_nowait(("done", None))
+
+    # 동시 실행 제한기가 세션별로 공정하게 슬롯을 배정하도록 세션 ID를 컨텍스트에 기록
+    current_session_id.set(session_id)
+    runner = asyncio.create_task(run_graph())
+    try:
+        async for event in _advice_events(queue, events, deadline):
+            yield event
+    finally:
+        # 클라이언트 연결이 끊기면 워크플로우 실행도 취소한다
+        if not runner.done():
+            runner.cancel()
+
+    # 검색 범위별 지연시간은 update 이벤트 전송 여부와 관계없이 기록한다 (토큰만 스트리밍된 응답 포함)
+    if rag_mode is not None:
+        mode_latency.record(rag_mode, "total", time.perf_counter() - started)
+        if first_token:
+            mode_latency.record(rag_mode, "first_token", first_token[0])
+
+    # 워크플로우가 끝까지 완료된 요청만 캐시에 저장하고, 시간 예산 때문에 줄어든 응답은 다음 요청에 재사용하지 않는다
+    if on_complete is not None and events and not (deadline is not None and deadline.degraded):
+        await asyncio.to_thread(on_complete, events)
+
+    # 상담 종료 메시지 전송
+    yield f"data: {json.dumps({'type': 'end', 'data': {}}, ensure_ascii=False)}\n\n"
+
+
+def deadline_error_event(deadline: Deadline) -> str:
+    """시간 예산 초과 오류 이벤트 (줄어든 단계 목록 포함)"""
+    event_data = {
+        "type": "error",
+        "data": {
+            "code": "deadline_exceeded",
+            "message": "응답 시간 제한을 초과했습니다. 검색 범위를 줄이거나 잠시 후 다시 시도해주세요.",
+            "degraded": deadline.degraded if deadline is not None else [],
+        },
+    }
+    return f"data: {json.dumps(event_data, ensure_ascii=False)}\n\n"
+
+
+async def _advice_events(queue: asyncio.Queue, events: list, deadline: Deadline = None):
+    """
+    워크플로우 큐의 토큰과 청크를 SSE 이벤트로 변환합니다. 전송한 update 상태는 events에 모읍니다.
+
+    단계들은 예산 안에서 스스로 줄여 끝나야 하므로, 예산이 지나고도 DEADLINE_GRACE_SECONDS 동안
+    응답이 없으면 멈춘 의존성으로 보고 스트림을 종료합니다.
+    """
+    while True:
+        try:
+            timeout = deadline.remaining() + DEADLINE_GRACE_SECONDS if deadline is not None else None
+            kind, payload = await asyncio.wait_for(queue.get(), timeout)
+        except asyncio.TimeoutError:
+            print(f"시간 예산 초과: {deadline.seconds}초")
+            yield deadline_error_event(deadline)
+            break
+        if kind == "done":
+            break
+        if kind == "error":
+            # LLM 호출 대기열이 가득 찼거나 대기 시간이 초과되면 server_busy 오류 전송
+            if isinstance(payload, ServerBusyError):
+                print(f"서버 혼잡: {str(payload)}")
+                yield error_event("server_busy", "상담 요청이 많아 잠시 후 다시 시도해주세요.")
+                break
+            # 응답을 생성하기 전에 시간 예산을 모두 사용하면 deadline_exceeded 오류 전송
+            if isinstance(payload, DeadlineExceeded):
+                print(f"시간 예산 초과: {str(payload)}")
+                yield deadline_error_event(deadline)
+                break
+            raise payload
+
+        # LLM 토큰 전송
+        if kind == "delta":
+            role, delta = payload
+            event_data = {"type": "delta", "data": {"role": role, "delta": delta}}
+            yield f"data: {json.dumps(event_data, ensure_ascii=False)}\n\n"
+            continue
+
+        chunk = payload
+
         # 빈 청크 무시
         if not chunk:
             continue
@@ -97,19 +320,16 @@ async def advice_generator(advice_graph, initial_state, langfuse_handler):
                 "topic": topic,
                 "messages": messages,
                 "docs": docs,
+                "index_status": index_build_task.status,  # 검색에 사용된 인덱스 상태
+                "degraded": deadline.degraded if deadline is not None else [],  # 시간 예산 때문에 줄어든 단계
             }
 
             # Server-Sent Events 형식으로 데이터 전송
+            events.append(state)
             event_data = {"type": "update", "data": state}
             yield f"data: {json.dumps(event_data, ensure_ascii=False)}\n\n"
             print(event_data)
 
-            # 스트리밍 간격 조절 (10ms)
-            await asyncio.sleep(0.01)
-
-    # 상담 종료 메시지 전송
-    yield f"data: {json.dumps({'type': 'end', 'data': {}}, ensure_ascii=False)}\n\n"
-
 
 # 엔드포인트 경로 수정 (/advice/stream -> 유지)
 @router.post("/advice/stream")
@@ -117,10 +337,63 @@ async def stream_advice_workflow(request: WorkflowRequest):
     print(f"[START]workflow.stream_advice_workflow({request})")
 
     topic = request.topic
-    enable_rag = request.enable_rag
+    rag_mode = resolve_rag_mode(request.rag_mode, request.enable_rag)  # 검색 범위 (none이면 검색 없이 응답)
+    filters = request.filters if rag_mode != "none" else None  # 검색하지 않으면 필터도 캐시 키에서 제외
+
+    # 인덱스 빌드 중이면 이전 인덱스로, 인덱스가 없으면 RAG 없이(degraded) 응답한다
+    if index_build_task.status not in (IndexStatus.READY, IndexStatus.STALE):
+        print(f"벡터 인덱스 상태 {index_build_task.status}: RAG 없이 응답합니다")
+
+    holder = get_vectorstore_holder()
+    index_version = holder.version
+    content_version = holder.content_version  # 응답 캐시 키 (파일 시각이 아닌 인덱스 내용 버전)
+
+    # 같은 요청(주제, 검색 범위, 검색 필터, 프롬프트, 모델, 인덱스 버전)의 저장된 응답이 있으면 워크플로우 없이 전송
+    cache_key = None
+    if settings.RESPONSE_CACHE_ENABLED:
+        cache_key = response_cache_key(
+            topic, rag_mode, prompt_version(), settings.AOAI_DEPLOY_GPT4O, content_version, filters
+        )
+        events = await asyncio.to_thread(lookup_cached_response, cache_key)
+        if events is not None:
+            print(f"응답 캐시 적중: '{topic}' (SQLite)")
+            return StreamingResponse(
+                cached_advice_generator({"topic": topic, "events": events, "similarity": 1.0}, topic),
+                media_type="text/event-stream",
+            )
+
+    # 유사한 주제의 이전 응답이 있으면 워크플로우 없이 전송
+    vector, cached = await lookup_cached_answer(topic, rag_mode, filters)
+    if cached is not None:
+        print(f"응답 캐시 적중: '{cached['topic']}' (유사도 {cached['similarity']:.3f})")
+        return StreamingResponse(
+            cached_advice_generator(cached, topic),
+            media_type="text/event-stream",
+        )
+
+    # LLM 호출 대기열이 이미 가득 찼으면 워크플로우를 시작하지 않고 바로 거절
+    if get_llm_governor().saturated():
+        print("서버 혼잡: LLM 호출 대기열이 가득 찼습니다")
+        return StreamingResponse(
+            busy_generator("상담 요청이 많아 잠시 후 다시 시도해주세요."),
+            media_type="text/event-stream",
+        )
+
+    def on_complete(events):
+        if vector is not None:
+            get_answer_cache().put(topic, vector, answer_cache_scope(rag_mode, filters), events, index_version)
+        if cache_key is not None:
+            try:
+                response_cache.put(
+                    cache_key, topic, rag_mode, prompt_version(), settings.AOAI_DEPLOY_GPT4O,
+                    content_version, events,
+                )
+            except Exception as e:
+                print(f"응답 캐시 저장 실패: {str(e)}")
 
     session_id = str(uuid.uuid4())
-    advice_graph = create_advice_graph(enable_rag, session_id)
+    deadline = Deadline(request.deadline_seconds or settings.REQUEST_DEADLINE_SECONDS)
+    advice_graph = get_advice_graph(rag_mode)  # 검색 범위별로 컴파일된 그래프 재사용
 
     initial_state: AdviceState = {
         "topic": topic,
@@ -133,6 +406,9 @@ async def stream_advice_workflow(request: WorkflowRequest):
 
     # 스트리밍 응답 반환
     return StreamingResponse(
-        advice_generator(advice_graph, initial_state, langfuse_handler),
+        advice_generator(
+            advice_graph, initial_state, langfuse_handler, on_complete, request.stream_tokens, session_id, rag_mode,
+            deadline, filters,
+        ),
         media_type="text/event-stream",
     )
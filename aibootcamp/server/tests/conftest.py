@@ -0,0 +1,98 @@
+"""
+테스트 공통 설정
+
+Azure OpenAI, Langfuse, 벡터 인덱스 없이 서버 모듈을 임포트할 수 있도록
+환경 변수를 임시 경로로 설정하고, LLM과 질의 임베딩을 가짜 구현으로 바꿉니다.
+실행은 server 경로에서: python -m pytest -q tests
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+_tmp_dir = tempfile.mkdtemp(prefix="aibootcamp-test-")
+
+# 설정(Settings)은 임포트 시점에 만들어지므로 서버 모듈보다 먼저 설정한다
+for name, value in {
+    "AOAI_API_KEY": "test",
+    "AOAI_ENDPOINT": "http://127.0.0.1:9",
+    "AOAI_DEPLOY_GPT4O": "gpt-4o",
+    "AOAI_EMBEDDING_DEPLOYMENT": "text-embedding",
+    "AOAI_API_VERSION": "2024-10-21",
+    "LANGFUSE_PUBLIC_KEY": "test",
+    "LANGFUSE_SECRET_KEY": "test",
+    "LANGFUSE_HOST": "http://127.0.0.1:9",
+    "API_BASE_URL": "http://127.0.0.1:9/api/v1",
+    "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(_tmp_dir, 'history.db')}",
+    "VECTOR_INDEX_PATH": os.path.join(_tmp_dir, "vector_index"),
+    "EMBEDDING_CACHE_PATH": os.path.join(_tmp_dir, "embedding_cache.db"),
+    "EXTERNAL_SEARCH_CACHE_PATH": os.path.join(_tmp_dir, "external_search_cache.db"),
+    "AOAI_WARMUP": "false",
+}.items():
+    os.environ[name] = value
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel  # noqa: E402
+
+from db.database import Base, engine  # noqa: E402
+import db.models  # noqa: E402,F401
+
+Base.metadata.create_all(bind=engine)
+
+
+ANSWER = "상장 예비심사 신청 후 심사를 거쳐 상장됩니다."
+
+
+class FakeQueryEmbeddings:
+    """공백과 물음표를 무시한 주제 텍스트로 고정 벡터를 만드는 질의 임베딩"""
+
+    def __init__(self):
+        self.calls = 0
+
+    @staticmethod
+    def _vector(text: str):
+        key = text.replace(" ", "").rstrip("?")
+        return [float(ord(char) % 7 + 1) for char in key[:8].ljust(8)]
+
+    def embed_query(self, text: str):
+        self.calls += 1
+        return self._vector(text)
+
+    async def aembed_query(self, text: str):
+        return self.embed_query(text)
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """에이전트의 LLM을 고정 응답을 돌려주는 가짜 모델로 바꿉니다."""
+    import workflow.agents.agent as agent_module
+
+    llm = FakeListChatModel(responses=[ANSWER])
+    monkeypatch.setattr(agent_module, "get_llm", lambda: llm)
+    return llm
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    """응답 캐시 조회에 사용하는 질의 임베딩을 가짜 구현으로 바꿉니다."""
+    import routers.workflow as workflow_router
+
+    embeddings = FakeQueryEmbeddings()
+    monkeypatch.setattr(workflow_router, "get_query_embeddings", lambda: embeddings)
+    return embeddings
+
+
+@pytest.fixture
+def offline_search(monkeypatch):
+    """검색어 재작성과 외부 검색을 네트워크 없이 빈 결과로 바꿉니다."""
+    import retrieval.search_service as search_service
+
+    async def no_external(queries, *args, **kwargs):
+        return []
+
+    monkeypatch.setattr(search_service, "improve_search_query", lambda topic, *args: [topic])
+    monkeypatch.setattr(search_service, "asearch_external_sources", no_external)
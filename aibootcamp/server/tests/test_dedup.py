@@ -0,0 +1,27 @@
+"""
+청크 중복 제거 테스트
+"""
+
+from langchain.schema import Document
+
+from indexing.dedup import NearDuplicateIndex, deduplicate
+
+
+TEXT = "코스닥시장 상장을 위해서는 상장예비심사 신청서를 거래소에 제출하고 심사를 받아야 합니다. " * 3
+
+
+def test_removed_owner_no_longer_marks_near_duplicates():
+    near_index = NearDuplicateIndex(threshold=0.8)
+    seen_ids = {}
+
+    first = deduplicate([Document(page_content=TEXT)], "failed.pdf", seen_ids, near_index)
+    assert len(first.documents) == 1
+
+    # 처리에 실패한 파일의 청크는 인덱스에 없으므로 이후 파일의 유사 청크를 제거하면 안 된다
+    assert near_index.remove_owner("failed.pdf") == 1
+    del seen_ids[first.documents[0].metadata["id"]]
+
+    second = deduplicate([Document(page_content=TEXT + "!")], "next.pdf", seen_ids, near_index)
+    assert len(second.documents) == 1
+    assert second.near_removed == 0
+    assert near_index.query(TEXT) == "next.pdf"
@@ -0,0 +1,74 @@
+"""
+외부 검색 테스트 (네트워크 없이 공급자 호출을 가짜 구현으로 바꿔 실행)
+"""
+
+import asyncio
+
+from langchain.schema import Document
+
+import retrieval.search_service as search_service
+
+
+def test_sync_wrapper_works_inside_running_event_loop(monkeypatch):
+    async def fake_search(queries, language="ko", max_results=5, timeout=None):
+        return [Document(page_content=query) for query in queries]
+
+    monkeypatch.setattr(search_service, "asearch_external_sources", fake_search)
+
+    async def caller():
+        # 이벤트 루프가 실행 중인 스레드에서 동기 래퍼를 호출해도 RuntimeError가 나지 않아야 한다
+        return search_service.search_external_sources(["코스닥 상장"])
+
+    documents = asyncio.run(caller())
+    assert [doc.page_content for doc in documents] == ["코스닥 상장"]
+    assert [doc.page_content for doc in search_service.search_external_sources(["코넥스"])] == ["코넥스"]
+
+
+def test_search_cache_refetches_when_more_results_are_requested(tmp_path):
+    from retrieval.search_cache import ExternalSearchCache
+
+    cache = ExternalSearchCache(str(tmp_path / "search.db"), ttl_seconds={"duckduckgo": 60})
+    documents = [Document(page_content=f"결과 {i}", metadata={"rank": i}) for i in range(3)]
+    cache.put("duckduckgo", "코스닥 상장", documents, "ko", "y", max_results=3)
+
+    assert [doc.metadata["rank"] for doc in cache.get("duckduckgo", "코스닥 상장", "ko", "y", max_results=2)] == [0, 1]
+    assert len(cache.get("duckduckgo", "코스닥  상장", "ko", "y", max_results=3)) == 3
+    # 처음 검색보다 많은 결과를 요청하면 적은 결과를 돌려주지 않고 다시 검색하도록 미스로 처리한다
+    assert cache.get("duckduckgo", "코스닥 상장", "ko", "y", max_results=5) is None
+
+
+def test_branches_skip_without_deadline_when_budget_is_small(monkeypatch):
+    monkeypatch.setattr(search_service, "improve_search_query", lambda topic, *args: [topic])
+
+    # budget만 주고 deadline 없이 호출해도 줄어든 단계를 기록하지 않고 건너뛴다
+    assert asyncio.run(search_service.aexternal_search_branch("코스닥", 2, budget=0.1)) == []
+    assert asyncio.run(search_service.arewrite_search_branch("코스닥", 2, budget=0.1)) == []
+
+
+def test_wikipedia_uses_shared_client_with_request_timeout(monkeypatch):
+    import retrieval.external_search as external_search
+    from utils.config import settings
+
+    class FakeResponse:
+        status_code = 200
+
+        def json(self):
+            return {"title": "코스닥", "extract": "코스닥 시장 요약"}
+
+    class FakeClient:
+        def __init__(self):
+            self.timeouts = []
+
+        async def get(self, url, timeout=None):
+            self.timeouts.append(timeout)
+            return FakeResponse()
+
+    client = FakeClient()
+    monkeypatch.setattr(settings, "EXTERNAL_SEARCH_CACHE_ENABLED", False)
+    monkeypatch.setattr(external_search, "get_http_clients", lambda: (None, client))
+
+    # 호출마다 새 클라이언트를 만들지 않고 공유 연결 풀에 요청별 타임아웃만 넘긴다
+    for _ in range(2):
+        documents = asyncio.run(external_search.asearch_wikipedia(["코스닥"], timeout=3.0))
+        assert [doc.page_content for doc in documents] == ["코스닥 시장 요약"]
+    assert client.timeouts == [3.0, 3.0]
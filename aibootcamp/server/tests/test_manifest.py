@@ -0,0 +1,30 @@
+"""
+인덱스 매니페스트 테스트
+"""
+
+from indexing.manifest import build_params, content_version, new_manifest
+from retrieval.index_holder import index_content_version
+
+
+def _manifest(ids):
+    manifest = new_manifest(build_params(500, 100, "text-embedding"))
+    manifest["files"]["guide.pdf"] = {"sha256": "abc", "ids": ids}
+    return manifest
+
+
+def test_content_version_ignores_rebuild_time():
+    rebuilt = _manifest(["a", "b"])
+    rebuilt["version"] = "2"
+
+    assert content_version(_manifest(["a", "b"])) == content_version(rebuilt)
+    assert content_version(_manifest(["a", "b"])) != content_version(_manifest(["a", "c"]))
+
+
+def test_index_content_version_prefers_manifest_over_file_state():
+    manifest = _manifest(["a"])
+    manifest["content_version"] = content_version(manifest)
+
+    # 파일 시각(mtime)이 바뀌어도 매니페스트 내용 버전은 그대로다
+    assert index_content_version(manifest, (("manifest.json", 1, 10),)) == manifest["content_version"]
+    assert index_content_version(manifest, (("manifest.json", 2, 10),)) == manifest["content_version"]
+    assert index_content_version(None, (("index.faiss", 1, 10),)) != index_content_version(None, (("index.faiss", 2, 10),))
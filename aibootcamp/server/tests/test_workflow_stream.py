@@ -0,0 +1,208 @@
+"""
+상담 스트리밍 API 테스트
+
+/advice/stream이 검색 범위와 토큰 스트리밍 여부에 관계없이 에이전트 완료 시점의
+update 이벤트를 보내는지 확인합니다.
+"""
+
+import asyncio
+import json
+
+import numpy as np
+import pytest
+from langchain.schema import Document
+
+from routers.workflow import WorkflowRequest, stream_advice_workflow
+from utils.config import settings
+
+from conftest import ANSWER
+
+
+def collect_events(response) -> list:
+    """StreamingResponse의 SSE 이벤트를 모두 읽어 JSON 목록으로 반환합니다."""
+
+    async def read():
+        return [chunk async for chunk in response.body_iterator]
+
+    return [json.loads(chunk[len("data: "):]) for chunk in asyncio.run(read())]
+
+
+def stream(**request) -> list:
+    return collect_events(asyncio.run(stream_advice_workflow(WorkflowRequest(**request))))
+
+
+@pytest.fixture
+def no_response_cache(monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "ANSWER_CACHE_ENABLED", False)
+
+
+@pytest.mark.parametrize("rag_mode", ["none", "local", "local+external", "parallel"])
+@pytest.mark.parametrize("stream_tokens", [True, False])
+def test_stream_sends_update_event(fake_llm, offline_search, no_response_cache, rag_mode, stream_tokens):
+    events = stream(topic="코스닥 상장 절차", rag_mode=rag_mode, stream_tokens=stream_tokens)
+    types = [event["type"] for event in events]
+
+    # 내부 에이전트 그래프의 update_state 청크가 외부 그래프 스트림까지 전달되어야 한다
+    assert types.count("update") == 1
+    assert types[-1] == "end"
+    assert ("delta" in types) == stream_tokens
+
+    update = next(event["data"] for event in events if event["type"] == "update")
+    assert update["role"] == "IPO_AGENT"
+    assert update["response"] == ANSWER
+
+
+def test_near_identical_topic_served_from_answer_cache(fake_llm, fake_embeddings, offline_search, monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", False)
+
+    first = stream(topic="채권 상장 절차", rag_mode="local")
+    assert not any(event["data"].get("cached") for event in first if event["type"] == "update")
+
+    # 표현만 다른 같은 질문은 워크플로우(LLM 호출) 없이 저장된 update 이벤트로 응답한다
+    fake_llm.responses = ["다시 생성하면 안 되는 응답"]
+    fake_llm.i = 0
+    second = stream(topic="채권상장 절차?", rag_mode="local")
+
+    assert [event["type"] for event in second] == ["update", "end"]
+    update = second[0]["data"]
+    assert update["cached"] is True
+    assert update["topic"] == "채권상장 절차?"
+    assert update["response"] == ANSWER
+
+
+def test_identical_request_served_from_response_cache(fake_llm, monkeypatch):
+    monkeypatch.setattr(settings, "ANSWER_CACHE_ENABLED", False)
+
+    first = stream(topic="코넥스 상장 요건", rag_mode="none", stream_tokens=False)
+    assert [event["type"] for event in first] == ["update", "end"]
+    assert not first[0]["data"].get("cached")
+
+    # 같은 요청은 완료된 워크플로우가 SQLite에 저장한 update 이벤트로 응답한다
+    fake_llm.responses = ["다시 생성하면 안 되는 응답"]
+    fake_llm.i = 0
+    second = stream(topic="코넥스  상장 요건", rag_mode="none", stream_tokens=False)
+
+    assert [event["type"] for event in second] == ["update", "end"]
+    assert second[0]["data"]["cached"] is True
+    assert second[0]["data"]["response"] == ANSWER
+
+
+def test_stream_records_per_mode_latency(fake_llm, no_response_cache):
+    from workflow.latency import mode_latency
+
+    before = mode_latency.stats().get("none", {})
+    stream(topic="유가증권시장 상장 절차", rag_mode="none")
+    after = mode_latency.stats()["none"]
+
+    for stage in ("total", "first_token"):
+        assert after[stage]["count"] == before.get(stage, {}).get("count", 0) + 1
+
+
+def test_tight_deadline_reports_degraded_stages(fake_llm, offline_search, no_response_cache):
+    events = stream(topic="채권 상장 심사 기간", rag_mode="parallel", deadline_seconds=5)
+
+    # 시간 예산 때문에 줄어든 단계는 update 이벤트의 degraded로 클라이언트에 전달된다
+    update = next(event["data"] for event in events if event["type"] == "update")
+    stages = {item["stage"]: item["reason"] for item in update["degraded"]}
+    assert stages["retrieval"] == "k 2->1"
+    assert stages["query_rewrite"] == "skipped"
+    assert stages["external_search"] == "skipped"
+    assert stages["generate_response"] == "short_answer"
+
+
+def test_external_fallback_leaves_generation_its_share(fake_llm, no_response_cache, monkeypatch):
+    import time
+
+    import retrieval.search_service as search_service
+    from workflow.agents.agent import Agent
+
+    def slow_local_search(queries, *args):
+        time.sleep(2.0)
+        return [[] for _ in queries]
+
+    timeouts = []
+
+    async def slow_external(queries, *args, timeout=None, **kwargs):
+        timeouts.append(timeout)
+        await asyncio.sleep(timeout)
+        return []
+
+    remaining = []
+    budget_messages = Agent._budget_messages
+
+    def record_remaining(self, messages, deadline=None):
+        remaining.append(deadline.remaining())
+        return budget_messages(self, messages, deadline)
+
+    monkeypatch.setattr(search_service, "_search_local", slow_local_search)
+    monkeypatch.setattr(search_service, "asearch_external_sources", slow_external)
+    monkeypatch.setattr(settings, "EXTERNAL_SEARCH_MIN_SECONDS", 0.1)
+    monkeypatch.setattr(Agent, "_budget_messages", record_remaining)
+
+    deadline_seconds = 10.0
+    stream(topic="채권 상장 수수료", rag_mode="local+external", deadline_seconds=deadline_seconds)
+
+    # 로컬 검색에 쓴 시간만큼 외부 검색 예산이 줄어 검색 전체가 RETRIEVAL_BUDGET_SHARE를 넘지 않는다
+    share = settings.RETRIEVAL_BUDGET_SHARE
+    assert len(timeouts) == 1
+    assert timeouts[0] <= deadline_seconds * share - 2.0 + 0.1
+    assert remaining[0] >= deadline_seconds * (1 - share) - 0.6
+
+
+class LexicalOnlyStore:
+    """어휘 인덱스와 메타데이터 인덱스만 사용하는 가짜 벡터 스토어 (벡터 검색 호출 횟수 기록)"""
+
+    def __init__(self):
+        self.vector_calls = 0
+        self.filters = []
+        store = self
+
+        class Lexical:
+            def search(self, query, k=5, candidates=None):
+                return [(0, 1.0)]
+
+        class Metadata:
+            def candidates(self, filters):
+                store.filters.append(filters)
+                return np.asarray([0])
+
+        self.lexical_index = Lexical()
+        self.metadata_index = Metadata()
+
+    def get_document(self, position):
+        return Document(page_content="코넥스 상장 요건 표", metadata={"id": "konex-table", "file": "코넥스.pdf"})
+
+    def batch_similarity_search_with_score(self, queries, k=5, candidates=None):
+        self.vector_calls += 1
+        return [[] for _ in queries]
+
+
+def test_lexical_mode_never_calls_query_embedder(fake_llm, fake_embeddings, offline_search, monkeypatch):
+    import retrieval.index_holder as index_holder
+
+    store = LexicalOnlyStore()
+    monkeypatch.setattr(index_holder, "get_vectorstore", lambda: store)
+    monkeypatch.setattr(settings, "RETRIEVAL_MODE", "lexical")
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", False)
+
+    filters = {"file": "코넥스", "source": "table"}
+    events = stream(topic="코넥스 상장 요건", rag_mode="local", stream_tokens=False, filters=filters)
+
+    # lexical 방식은 벡터 검색 분기가 없으므로 질의 임베딩과 벡터 검색을 호출하지 않는다
+    assert fake_embeddings.calls == 0
+    assert store.vector_calls == 0
+    # 요청의 메타데이터 필터는 실행 설정으로 로컬 검색 분기까지 전달된다
+    assert store.filters == [filters]
+    update = next(event["data"] for event in events if event["type"] == "update")
+    assert update["docs"]["IPO_AGENT"] == ["코넥스 상장 요건 표"]
+
+
+def test_empty_retrieval_falls_back_to_default_documents(fake_llm, offline_search, no_response_cache):
+    from retrieval.search_service import get_default_documents
+
+    events = stream(topic="채권 상장 요건", rag_mode="local+external", stream_tokens=False)
+
+    # 모든 검색에서 결과가 없으면 기본 정보 문서로 응답을 생성한다
+    update = next(event["data"] for event in events if event["type"] == "update")
+    assert update["docs"]["IPO_AGENT"] == [doc.page_content for doc in get_default_documents()]
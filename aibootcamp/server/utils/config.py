@@ -1,13 +1,37 @@
 import os
+import asyncio
 import glob
+import shutil
+import threading
+import time
+import httpx
+from dataclasses import dataclass, field
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
 from langchain.schema import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyMuPDFLoader
 from langchain_community.vectorstores import FAISS
-import pdfplumber
+
+from indexing.manifest import (
+    MANIFEST_FILE,
+    build_params,
+    content_version,
+    diff_sources,
+    file_sha256,
+    load_manifest,
+    new_manifest,
+    save_manifest,
+)
+from indexing.pdf_pipeline import ingest_pdfs, iter_pdf_chunks
+from indexing.embedding_cache import CachedEmbeddings, EmbeddingCache
+from retrieval.query_cache import CachedQueryEmbeddings, QueryEmbeddingCache
+from retrieval.lexical_index import LexicalIndex, build_lexical_index, load_lexical_meta
+from retrieval.metadata_index import MetadataIndex, build_metadata_index, load_metadata_meta
+from retrieval.search_cache import ExternalSearchCache
+from indexing.dedup import NearDuplicateIndex, deduplicate
+from indexing.mmap_store import MmapVectorStore, export_mmap_store, load_mmap_meta
+from workflow.answer_cache import SemanticAnswerCache
+from utils.governor import ConcurrencyGovernor, GovernedEmbeddings
 
 # .env 파일에서 환경 변수 로드
 load_dotenv()
@@ -39,8 +63,100 @@ class Settings(BaseSettings):
 
     SERVER_PORT: int = 8081
 
-    def get_llm(self):
-        """Azure OpenAI LLM 인스턴스를 반환합니다."""
+    # 벡터 인덱스 설정
+    PDF_DATA_DIR: str = "./data"  # 원본 PDF 디렉토리
+    VECTOR_INDEX_PATH: str = "./vector_index"  # 벡터 인덱스 저장 경로
+    CHUNK_SIZE: int = 500  # 텍스트 분할 크기
+    CHUNK_OVERLAP: int = 100  # 텍스트 분할 중첩 크기
+    VECTOR_INDEX_FORCE_REBUILD: bool = False  # True면 매니페스트를 무시하고 전체 재생성
+    VECTOR_INDEX_RELOAD_INTERVAL: float = 5.0  # 디스크 인덱스 버전 확인 주기 (초)
+    VECTOR_INDEX_FORMAT: str = "mmap"  # 검색용 인덱스 포맷 (mmap: pickle 없는 메모리 맵, faiss: FAISS + index.pkl)
+
+    # 검색 모드 설정
+    RETRIEVAL_MODE: str = "vector"  # vector(임베딩), lexical(BM25, 네트워크 없음), hybrid(RRF 결합)
+    HYBRID_RRF_K: int = 60  # hybrid 모드 RRF 상수
+    RAG_MODE: str = "local"  # 상담 자료 검색 범위: none(검색 없음), local(PDF), local+external(PDF 부족 시 외부), parallel(PDF + 외부 동시)
+    RETRIEVAL_QUERY_REWRITE: bool = True  # parallel 범위에서 LLM 검색어 재작성 분기를 함께 실행할지 여부
+
+    # 검색 백엔드 설정 (mmap 포맷에서 사용)
+    VECTOR_INDEX_BACKEND: str = "flat"  # flat, fp16(소규모), hnsw(저지연), ivfpq/sq8(대규모)
+    HNSW_M: int = 32  # HNSW 노드당 연결 수
+    HNSW_EF_CONSTRUCTION: int = 200  # HNSW 생성 시 탐색 폭
+    HNSW_EF_SEARCH: int = 64  # HNSW 검색 시 탐색 폭
+    IVF_NLIST: int = 256  # IVF 클러스터 수 (벡터 수에 따라 자동 축소)
+    IVF_NPROBE: int = 16  # IVF 검색 시 탐색할 클러스터 수
+    PQ_M: int = 32  # PQ 부분 벡터 수 (임베딩 차원의 약수)
+
+    # PDF 수집 설정
+    INGEST_WORKERS: int = 0  # PDF 파싱 프로세스 수 (0이면 CPU 코어 수)
+    INGEST_PAGES_PER_TASK: int = 16  # 프로세스 작업 하나가 처리할 페이지 수
+    INGEST_MAX_INFLIGHT: int = 0  # 동시에 처리 중인 최대 페이지 범위 작업 수 (0이면 프로세스 수 * 2)
+    INGEST_EMBED_BATCH_SIZE: int = 256  # 한 번에 임베딩하여 인덱스에 추가할 청크 수
+
+    # 청크 중복 제거 설정
+    DEDUP_NEAR_THRESHOLD: float = 0.85  # 유사 중복 판단 Jaccard 유사도 (0이면 동일 텍스트만 제거)
+    DEDUP_NUM_PERM: int = 64  # MinHash 순열 수
+    DEDUP_SHINGLE_SIZE: int = 5  # 문자 n-gram 크기
+
+    # 질의 임베딩 캐시 설정
+    QUERY_CACHE_MAX_ENTRIES: int = 1024  # 메모리 캐시 최대 질의 수
+    QUERY_CACHE_TTL_SECONDS: int = 86400  # 메모리 캐시 유지 시간 (초)
+    QUERY_CACHE_DISK_PATH: str = ""  # 디스크 캐시 SQLite 파일 (빈 값이면 사용 안 함)
+
+    # 임베딩 캐시 설정
+    EMBEDDING_CACHE_ENABLED: bool = True  # 인덱스 빌드 시 임베딩 캐시 사용 여부
+    EMBEDDING_CACHE_PATH: str = "./embedding_cache.db"  # 임베딩 캐시 SQLite 파일
+    EMBEDDING_CACHE_MAX_MB: int = 512  # 임베딩 캐시 최대 크기 (MB)
+
+    # 응답 캐시 설정
+    PROMPT_VERSION: str = "ipo-v1"  # 프롬프트 외 응답 생성 방식을 바꾸면 올려서 이전 응답 캐시를 무효화 (프롬프트 텍스트는 해시로 자동 반영)
+    RESPONSE_CACHE_ENABLED: bool = True  # 정확히 같은 요청의 응답을 SQLite에 저장하여 재사용
+    ANSWER_CACHE_ENABLED: bool = True  # 의미 기반 응답 캐시 사용 여부
+    ANSWER_CACHE_THRESHOLD: float = 0.95  # 캐시 응답을 사용할 최소 코사인 유사도
+    ANSWER_CACHE_MAX_ENTRIES: int = 512  # 캐시 최대 응답 수
+    ANSWER_CACHE_TTL_SECONDS: int = 3600  # 캐시 응답 유지 시간 (초)
+
+    # Azure OpenAI 연결 풀 설정
+    AOAI_MAX_CONNECTIONS: int = 50  # 최대 동시 연결 수
+    AOAI_MAX_KEEPALIVE_CONNECTIONS: int = 20  # 유지할 유휴 연결 수
+    AOAI_KEEPALIVE_EXPIRY: float = 60.0  # 유휴 연결 유지 시간 (초)
+    AOAI_TIMEOUT: float = 120.0  # 요청 타임아웃 (초)
+    AOAI_CONNECT_TIMEOUT: float = 10.0  # 연결 타임아웃 (초)
+    AOAI_WARMUP: bool = True  # 서버 시작 시 연결을 미리 열어둘지 여부
+    AOAI_WARMUP_CONNECTIONS: int = 4  # 미리 열어둘 비동기 연결 수
+
+    # 동시 실행 제한 설정 (Azure 레이트 리밋에 맞게 조정)
+    LLM_MAX_CONCURRENCY: int = 8  # 동시에 실행할 최대 GPT-4o 호출 수
+    LLM_MAX_QUEUE: int = 32  # GPT-4o 호출 대기열 크기 (가득 차면 server busy)
+    LLM_QUEUE_TIMEOUT: float = 30.0  # GPT-4o 호출 최대 대기 시간 (초)
+    EMBEDDING_MAX_CONCURRENCY: int = 16  # 동시에 실행할 최대 질의 임베딩 호출 수
+    EMBEDDING_MAX_QUEUE: int = 64  # 질의 임베딩 호출 대기열 크기
+    EMBEDDING_QUEUE_TIMEOUT: float = 10.0  # 질의 임베딩 호출 최대 대기 시간 (초)
+
+    # 요청 시간 예산 설정 (예산이 부족하면 단계별로 품질을 낮춰 응답)
+    REQUEST_DEADLINE_SECONDS: float = 60.0  # 상담 요청 하나의 기본 시간 예산 (초, 요청의 deadline_seconds로 변경 가능)
+    RETRIEVAL_BUDGET_SHARE: float = 0.3  # 남은 예산 중 자료 검색에 사용할 비율
+    EXTERNAL_SEARCH_MIN_SECONDS: float = 2.0  # 검색 예산이 이보다 적으면 외부 검색 생략
+    QUERY_REWRITE_MIN_SECONDS: float = 3.0  # 검색 예산이 이보다 적으면 검색어 재작성 분기 생략
+    REDUCED_K_SECONDS: float = 20.0  # 남은 예산이 이보다 적으면 검색 문서 수를 1개로 줄임
+    SHORT_ANSWER_SECONDS: float = 15.0  # 응답 생성 시 남은 예산이 이보다 적으면 짧은 응답 요청
+
+    # 외부 검색 설정 (토큰 버킷은 프로세스 내 모든 요청이 공유)
+    EXTERNAL_SEARCH_TIMEOUT: float = 8.0  # 공급자별 최대 대기 시간 (초), 이후 도착한 결과는 버림
+    DDG_RATE_PER_SECOND: float = 0.5  # DuckDuckGo 초당 요청 수
+    DDG_BURST: int = 3  # DuckDuckGo 순간 최대 요청 수
+    DDG_RATELIMIT_PAUSE: float = 30.0  # DuckDuckGo 레이트 리밋 응답 시 요청 중단 시간 (초)
+    WIKIPEDIA_RATE_PER_SECOND: float = 5.0  # Wikipedia 초당 요청 수
+    WIKIPEDIA_BURST: int = 10  # Wikipedia 순간 최대 요청 수
+    EXTERNAL_SEARCH_CACHE_ENABLED: bool = True  # 외부 검색 결과 디스크 캐시 사용 여부
+    EXTERNAL_SEARCH_CACHE_PATH: str = "./external_search_cache.db"  # 외부 검색 캐시 SQLite 파일
+    EXTERNAL_SEARCH_CACHE_MAX_ENTRIES: int = 50000  # 외부 검색 캐시 최대 항목 수
+    DDG_CACHE_TTL_SECONDS: int = 21600  # DuckDuckGo 결과 유지 시간 (초)
+    WIKIPEDIA_CACHE_TTL_SECONDS: int = 604800  # Wikipedia 요약 유지 시간 (초)
+    EXTERNAL_SEARCH_NEGATIVE_TTL_SECONDS: int = 1800  # 결과 없음 유지 시간 (초)
+
+    def get_llm(self, http_client=None, http_async_client=None):
+        """Azure OpenAI LLM 인스턴스를 반환합니다. HTTP 클라이언트를 주면 연결 풀을 공유합니다."""
         return AzureChatOpenAI(
             openai_api_key=self.AOAI_API_KEY,
             azure_endpoint=self.AOAI_ENDPOINT,
@@ -48,16 +164,31 @@ class Settings(BaseSettings):
             api_version=self.AOAI_API_VERSION,
             temperature=0.7,
             streaming=True,  # 스트리밍 활성화
+            http_client=http_client,
+            http_async_client=http_async_client,
         )
     
 
-    def get_embeddings(self):
-        """Azure OpenAI Embeddings 인스턴스를 반환합니다."""
+    def get_backend_options(self) -> dict:
+        """검색 백엔드 파라미터를 반환합니다."""
+        return {
+            "hnsw_m": self.HNSW_M,
+            "hnsw_ef_construction": self.HNSW_EF_CONSTRUCTION,
+            "hnsw_ef_search": self.HNSW_EF_SEARCH,
+            "ivf_nlist": self.IVF_NLIST,
+            "ivf_nprobe": self.IVF_NPROBE,
+            "pq_m": self.PQ_M,
+        }
+
+    def get_embeddings(self, http_client=None, http_async_client=None):
+        """Azure OpenAI Embeddings 인스턴스를 반환합니다. HTTP 클라이언트를 주면 연결 풀을 공유합니다."""
         return AzureOpenAIEmbeddings(
             model=self.AOAI_EMBEDDING_DEPLOYMENT,
             openai_api_version=self.AOAI_API_VERSION,
             api_key=self.AOAI_API_KEY,
             azure_endpoint=self.AOAI_ENDPOINT,
+            http_client=http_client,
+            http_async_client=http_async_client,
         )
 
 
@@ -65,171 +196,618 @@ class Settings(BaseSettings):
 settings = Settings()
 
 
+# 프로세스 전역 Azure OpenAI 클라이언트
+# 요청마다 클라이언트를 만들면 TLS 핸드셰이크와 연결 설정을 매번 반복하므로,
+# keep-alive 연결 풀을 가진 HTTP 클라이언트 한 쌍(동기/비동기)을 LLM과 임베딩이 공유한다
+_clients_lock = threading.RLock()
+_http_client = None
+_http_async_client = None
+_llm = None
+_embeddings = None
+
+
+def get_http_clients():
+    """Azure OpenAI 호출에 공유하는 (동기, 비동기) HTTP 클라이언트를 반환합니다."""
+    global _http_client, _http_async_client
+    if _http_client is None:
+        with _clients_lock:
+            if _http_client is None:
+                limits = httpx.Limits(
+                    max_connections=settings.AOAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.AOAI_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.AOAI_KEEPALIVE_EXPIRY,
+                )
+                timeout = httpx.Timeout(settings.AOAI_TIMEOUT, connect=settings.AOAI_CONNECT_TIMEOUT)
+                _http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+                _http_client = httpx.Client(limits=limits, timeout=timeout)
+    return _http_client, _http_async_client
+
+
 # 편의를 위한 함수들, 하위 호환성을 위해 유지
 def get_llm():
-    return settings.get_llm()
+    """프로세스 전역 LLM 클라이언트를 반환합니다."""
+    global _llm
+    if _llm is None:
+        with _clients_lock:
+            if _llm is None:
+                _llm = settings.get_llm(*get_http_clients())
+    return _llm
 
 
 def get_embeddings():
-    return settings.get_embeddings()
+    """프로세스 전역 임베딩 클라이언트를 반환합니다."""
+    global _embeddings
+    if _embeddings is None:
+        with _clients_lock:
+            if _embeddings is None:
+                _embeddings = settings.get_embeddings(*get_http_clients())
+    return _embeddings
+
+
+_llm_governor = None
+_embedding_governor = None
+
+
+def get_llm_governor() -> ConcurrencyGovernor:
+    """GPT-4o 호출 동시 실행 제한기를 반환합니다."""
+    global _llm_governor
+    if _llm_governor is None:
+        with _clients_lock:
+            if _llm_governor is None:
+                _llm_governor = ConcurrencyGovernor(
+                    "llm", settings.LLM_MAX_CONCURRENCY, settings.LLM_MAX_QUEUE, settings.LLM_QUEUE_TIMEOUT
+                )
+    return _llm_governor
+
+
+def get_embedding_governor() -> ConcurrencyGovernor:
+    """질의 임베딩 호출 동시 실행 제한기를 반환합니다."""
+    global _embedding_governor
+    if _embedding_governor is None:
+        with _clients_lock:
+            if _embedding_governor is None:
+                _embedding_governor = ConcurrencyGovernor(
+                    "embedding",
+                    settings.EMBEDDING_MAX_CONCURRENCY,
+                    settings.EMBEDDING_MAX_QUEUE,
+                    settings.EMBEDDING_QUEUE_TIMEOUT,
+                )
+    return _embedding_governor
+
+
+async def warmup_clients() -> None:
+    """
+    트래픽이 오기 전에 Azure OpenAI 엔드포인트로 연결을 미리 열어 연결 풀에 넣어둡니다.
+
+    응답 코드와 관계없이 TLS 연결이 풀에 남으므로 API 호출(토큰 사용) 없이 엔드포인트만 요청합니다.
+    """
+    print(f"[START]config.warmup_clients({settings.AOAI_WARMUP_CONNECTIONS})")
+    get_llm()
+    get_embeddings()
+    http_client, http_async_client = get_http_clients()
+
+    async def touch():
+        try:
+            await http_async_client.get(settings.AOAI_ENDPOINT)
+            return True
+        except Exception as e:
+            print(f"Azure OpenAI 연결 워밍업 실패: {str(e)}")
+            return False
+
+    def touch_sync():
+        try:
+            http_client.get(settings.AOAI_ENDPOINT)
+            return True
+        except Exception as e:
+            print(f"Azure OpenAI 연결 워밍업 실패: {str(e)}")
+            return False
 
+    results = await asyncio.gather(
+        *(touch() for _ in range(settings.AOAI_WARMUP_CONNECTIONS)),
+        asyncio.to_thread(touch_sync),
+    )
+    print(f"Azure OpenAI 연결 워밍업 완료: {sum(results)}/{len(results)}개 연결")
 
 
+async def close_clients() -> None:
+    """공유 HTTP 클라이언트의 연결을 닫습니다. (서버 종료 시)"""
+    global _http_client, _http_async_client, _llm, _embeddings
+    with _clients_lock:
+        http_client, http_async_client = _http_client, _http_async_client
+        _http_client = _http_async_client = _llm = _embeddings = None
+    if http_async_client is not None:
+        await http_async_client.aclose()
+    if http_client is not None:
+        http_client.close()
 
 
+_embedding_cache = None
 
 
-#------------------------------------------------------------
-# pdf파일 -> vectorstore
+def get_index_embeddings():
+    """인덱스 빌드용 임베딩을 반환합니다. 캐시가 활성화되어 있으면 디스크 캐시를 거칩니다."""
+    global _embedding_cache
+    embeddings = get_embeddings()
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return embeddings
+
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(
+            settings.EMBEDDING_CACHE_PATH,
+            deployment=settings.AOAI_EMBEDDING_DEPLOYMENT,
+            max_bytes=settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+        )
+    return CachedEmbeddings(embeddings, _embedding_cache)
+
+
+_query_embedding_cache = None
+
+
+def get_query_embedding_cache():
+    """프로세스 전역 질의 임베딩 캐시를 반환합니다."""
+    global _query_embedding_cache
+    if _query_embedding_cache is None:
+        disk_cache = None
+        if settings.QUERY_CACHE_DISK_PATH:
+            disk_cache = EmbeddingCache(
+                settings.QUERY_CACHE_DISK_PATH,
+                deployment=settings.AOAI_EMBEDDING_DEPLOYMENT,
+                max_bytes=settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+            )
+        _query_embedding_cache = QueryEmbeddingCache(
+            max_entries=settings.QUERY_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.QUERY_CACHE_TTL_SECONDS,
+            disk_cache=disk_cache,
+        )
+    return _query_embedding_cache
+
+
+def get_query_embeddings():
+    """
+    검색 질의용 임베딩을 반환합니다. 반복되는 질의는 임베딩 API를 호출하지 않고,
+    캐시에 없는 질의만 동시 실행 제한기를 거쳐 호출합니다.
+    """
+    return CachedQueryEmbeddings(
+        GovernedEmbeddings(get_embeddings(), get_embedding_governor()), get_query_embedding_cache()
+    )
+
+
+_answer_cache = None
+
+
+def get_answer_cache():
+    """프로세스 전역 의미 기반 응답 캐시를 반환합니다."""
+    global _answer_cache
+    if _answer_cache is None:
+        _answer_cache = SemanticAnswerCache(
+            threshold=settings.ANSWER_CACHE_THRESHOLD,
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+        )
+    return _answer_cache
+
+
+_external_search_cache = None
+_external_search_cache_lock = threading.Lock()
+
+
+def get_external_search_cache():
+    """프로세스 전역 외부 검색 결과 캐시를 반환합니다. 비활성화되어 있으면 None을 반환합니다."""
+    global _external_search_cache
+    if not settings.EXTERNAL_SEARCH_CACHE_ENABLED:
+        return None
+    if _external_search_cache is None:
+        with _external_search_cache_lock:
+            if _external_search_cache is None:
+                _external_search_cache = ExternalSearchCache(
+                    settings.EXTERNAL_SEARCH_CACHE_PATH,
+                    ttl_seconds={
+                        "duckduckgo": settings.DDG_CACHE_TTL_SECONDS,
+                        "wikipedia": settings.WIKIPEDIA_CACHE_TTL_SECONDS,
+                    },
+                    negative_ttl_seconds=settings.EXTERNAL_SEARCH_NEGATIVE_TTL_SECONDS,
+                    max_entries=settings.EXTERNAL_SEARCH_CACHE_MAX_ENTRIES,
+                )
+    return _external_search_cache
+
 
-# PDF파일을 읽는다
-def extract_tables_from_pdf(file_path):
-    table_texts = []
-    with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            tables = page.extract_tables()
-            for table in tables:
-                formatted_table = "\n".join([
-                    "\t".join([
-                        str(cell).replace("\n", " ").strip() if cell is not None else ""
-                        for cell in row
-                    ]) for row in table
-                ])
-                table_texts.append(formatted_table)
-    return table_texts
+def _print_embedding_cache_stats():
+    if _embedding_cache is not None:
+        print(f"임베딩 캐시: {_embedding_cache.stats()}")
 
 
+
+
+
+
+
+#------------------------------------------------------------
+# pdf파일 -> vectorstore
+
 #pdf_file_path 파일을 vectorsote에 저장한다
 def save_vectorstore(pdf_file_path):
-    loader = PyMuPDFLoader(pdf_file_path)
-    docs = loader.load()
+    parsed = ingest_pdfs(
+        [pdf_file_path],
+        chunk_size=settings.CHUNK_SIZE,
+        chunk_overlap=settings.CHUNK_OVERLAP,
+        max_workers=settings.INGEST_WORKERS,
+        pages_per_task=settings.INGEST_PAGES_PER_TASK,
+    )
+    split_documents = parsed.get(os.path.basename(pdf_file_path), [])
 
-    table_texts = extract_tables_from_pdf(pdf_file_path)
-    table_docs = [Document(page_content=t, metadata={"source": "table"}) for t in table_texts]
+    dedup = deduplicate(split_documents, os.path.basename(pdf_file_path), {}, new_near_duplicate_index())
+    unique_documents = dedup.documents
+    print(f"원본 문서: {len(split_documents)}개, 중복 제거 후: {len(unique_documents)}개 (동일: {dedup.exact_removed}개, 유사: {dedup.near_removed}개)")
+    
+    embeddings = get_index_embeddings()
+    vectorstore = FAISS.from_documents(
+        documents=unique_documents,
+        embedding=embeddings,
+        ids=[doc.metadata["id"] for doc in unique_documents],
+    )
+    save_index_files(vectorstore, settings.VECTOR_INDEX_PATH)
+    export_serving_files(vectorstore, settings.VECTOR_INDEX_PATH)
+    _print_embedding_cache_stats()
 
-    all_docs = docs + table_docs
+    # 단일 PDF 인덱스는 매니페스트와 맞지 않으므로 제거 (다음 증분 빌드는 전체 재생성)
+    manifest_path = os.path.join(settings.VECTOR_INDEX_PATH, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-    split_documents = text_splitter.split_documents(all_docs)
-    
-    # 중복 제거 및 고유 ID 부여
-    unique_documents = []
-    seen_contents = set()
-    
-    for i, doc in enumerate(split_documents):
-        # 내용의 해시값으로 중복 체크
-        content_hash = hash(doc.page_content[:200])  # 첫 200자로 중복 체크
-        
-        if content_hash not in seen_contents:
-            # 고유한 ID 부여
-            doc.metadata["id"] = f"doc_{i}_{content_hash}"
-            unique_documents.append(doc)
-            seen_contents.add(content_hash)
-    
-    print(f"원본 문서: {len(split_documents)}개, 중복 제거 후: {len(unique_documents)}개")
-    
-    embeddings = settings.get_embeddings()
-    vectorstore = FAISS.from_documents(documents=unique_documents, embedding=embeddings)
-    vectorstore.save_local("./vector_index")
+    return vectorstore
+
+
+def new_near_duplicate_index():
+    """설정에 따른 유사 중복 인덱스를 생성합니다. 비활성화되어 있으면 None을 반환합니다."""
+    if settings.DEDUP_NEAR_THRESHOLD <= 0:
+        return None
+    return NearDuplicateIndex(
+        threshold=settings.DEDUP_NEAR_THRESHOLD,
+        num_perm=settings.DEDUP_NUM_PERM,
+        shingle_size=settings.DEDUP_SHINGLE_SIZE,
+    )
+
+
+def save_index_files(vectorstore, index_path: str) -> None:
+    """
+    인덱스를 임시 디렉토리에 저장한 뒤 파일 단위로 교체합니다.
+
+    읽는 쪽은 파일이 쓰이는 도중의 내용을 보지 않으며, 교체 사이의 불일치는
+    마지막에 갱신되는 매니페스트 버전으로 검출합니다.
+    """
+    os.makedirs(index_path, exist_ok=True)
+    tmp_path = os.path.join(index_path, f".tmp-{os.getpid()}")
+    try:
+        vectorstore.save_local(tmp_path)
+        for file_name in os.listdir(tmp_path):
+            os.replace(os.path.join(tmp_path, file_name), os.path.join(index_path, file_name))
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def export_serving_files(vectorstore, index_path: str, source_version: str = None) -> None:
+    """FAISS 인덱스로부터 검색용 파일(메타데이터/어휘 인덱스, 메모리 맵 포맷)을 내보냅니다."""
+    # 메타데이터/어휘 인덱스의 문서 위치는 벡터 위치(index_to_docstore_id 순서)와 같다
+    documents = [
+        vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+        for i in range(vectorstore.index.ntotal)
+    ]
+    build_metadata_index((doc.metadata for doc in documents), index_path, source_version)
+    build_lexical_index((doc.page_content for doc in documents), index_path, source_version)
+
+    if settings.VECTOR_INDEX_FORMAT == "mmap":
+        export_mmap_store(
+            vectorstore,
+            index_path,
+            source_version,
+            backend=settings.VECTOR_INDEX_BACKEND,
+            backend_options=settings.get_backend_options(),
+        )
+
+
+def serving_files_stale(index_path: str, source_version: str) -> bool:
+    """검색용 파일이 없거나 현재 인덱스/설정과 맞지 않으면 True를 반환합니다."""
+    for meta in (load_metadata_meta(index_path), load_lexical_meta(index_path)):
+        if meta is None or meta.get("source_version") != source_version:
+            return True
+
+    if settings.VECTOR_INDEX_FORMAT != "mmap":
+        return False
+
+    mmap_meta = load_mmap_meta(index_path)
+    return (
+        mmap_meta is None
+        or mmap_meta.get("source_version") != source_version
+        or mmap_meta.get("requested_backend") != settings.VECTOR_INDEX_BACKEND
+    )
+
+
+def _load_reusable_vectorstore(index_path: str, manifest: dict):
+    """매니페스트와 일치하는 기존 인덱스를 로드합니다. 재사용할 수 없으면 None을 반환합니다."""
+    if not os.path.exists(os.path.join(index_path, "index.faiss")):
+        return None
+
+    try:
+        # 증분 추가도 임베딩 캐시를 거치도록 빌드용 임베딩으로 로드
+        vectorstore = load_faiss_vectorstore(index_path, get_index_embeddings())
+    except Exception as e:
+        print(f"기존 벡터 인덱스 로드 실패: {str(e)}")
+        return None
+
+    # 인덱스 저장 도중 중단된 경우 매니페스트와 벡터 수가 어긋난다
+    if vectorstore.index.ntotal != manifest.get("ntotal"):
+        print(f"매니페스트 불일치 (인덱스: {vectorstore.index.ntotal}개, 매니페스트: {manifest.get('ntotal')}개), 전체 재생성")
+        return None
 
     return vectorstore
 
 
-def save_multiple_pdfs_vectorstore(pdf_directory: str = "./data"):
-    """여러 PDF 파일을 처리하여 벡터 스토어 생성"""
-    print(f"[START]save_multiple_pdfs_vectorstore({pdf_directory})")
-    
+@dataclass
+class _FileState:
+    """인덱스 빌드 중인 PDF 파일 하나의 상태"""
+    name: str
+    ids: list = field(default_factory=list)  # 인덱스에 추가된 청크 ID
+    batch: list = field(default_factory=list)  # 임베딩 대기 중인 청크
+    exact_removed: int = 0
+    near_removed: int = 0
+    sources: set = field(default_factory=set)
+    failed: bool = False
+
+
+def save_multiple_pdfs_vectorstore(pdf_directory: str = None, force_rebuild: bool = None, progress=None):
+    """
+    여러 PDF 파일을 처리하여 벡터 스토어를 생성하거나 증분 갱신합니다.
+
+    manifest.json에 기록된 PDF 내용 해시와 청킹 파라미터를 현재 디렉토리와 비교하여
+    추가/변경된 PDF만 다시 파싱/임베딩하고, 삭제된 PDF의 청크는 인덱스에서 제거합니다.
+    청킹 파라미터나 임베딩 배포가 바뀌었거나 매니페스트가 없으면 전체를 재생성합니다.
+    청크에는 텍스트 해시 기반 고정 ID를 부여하고, 동일/유사(MinHash) 중복 청크는 파일별로 제거합니다.
+
+    PDF는 페이지 범위 단위로 스트리밍하여 INGEST_EMBED_BATCH_SIZE개씩 임베딩/추가하므로
+    메모리 사용량은 PDF 수와 무관하게 일정합니다. 파일 하나를 마칠 때마다 인덱스와 매니페스트를
+    체크포인트로 저장하므로, 중단된 빌드는 다음 실행에서 완료되지 않은 파일만 다시 처리합니다.
+
+    Args:
+        pdf_directory: PDF 디렉토리 (기본값: settings.PDF_DATA_DIR)
+        force_rebuild: True면 매니페스트를 무시하고 전체 재생성 (기본값: settings.VECTOR_INDEX_FORCE_REBUILD)
+        progress: 진행 상황 콜백 progress(stage, **info)
+
+    Returns:
+        FAISS: 벡터 스토어, 처리할 문서가 없으면 None
+    """
+    pdf_directory = pdf_directory or settings.PDF_DATA_DIR
+    if force_rebuild is None:
+        force_rebuild = settings.VECTOR_INDEX_FORCE_REBUILD
+    index_path = settings.VECTOR_INDEX_PATH
+    print(f"[START]save_multiple_pdfs_vectorstore({pdf_directory},{force_rebuild})")
+    report = progress or (lambda stage, **info: None)
 
-    
     # PDF 파일 목록 가져오기
-    pdf_files = glob.glob(os.path.join(pdf_directory, "*.pdf"))
-    
+    pdf_files = sorted(glob.glob(os.path.join(pdf_directory, "*.pdf")))
+
     if not pdf_files:
         print(f"PDF 파일을 찾을 수 없습니다: {pdf_directory}")
         return None
-    
+
     print(f"처리할 PDF 파일 {len(pdf_files)}개 발견:")
     for pdf_file in pdf_files:
         print(f"  - {os.path.basename(pdf_file)}")
-    
-    all_documents = []
-    total_original = 0
-    
-    # 각 PDF 파일 처리
-    for pdf_file in pdf_files:
+
+    report("scan", files=len(pdf_files))
+    pdf_paths = {os.path.basename(pdf_file): pdf_file for pdf_file in pdf_files}
+    current_hashes = {name: file_sha256(path) for name, path in pdf_paths.items()}
+
+    # 기존 인덱스 재사용 여부 판단
+    params = build_params(
+        settings.CHUNK_SIZE,
+        settings.CHUNK_OVERLAP,
+        settings.AOAI_EMBEDDING_DEPLOYMENT,
+        dedup_near_threshold=settings.DEDUP_NEAR_THRESHOLD,
+        dedup_num_perm=settings.DEDUP_NUM_PERM,
+        dedup_shingle_size=settings.DEDUP_SHINGLE_SIZE,
+    )
+    manifest = None if force_rebuild else load_manifest(index_path)
+    vectorstore = None
+
+    if manifest and manifest.get("params") == params:
+        vectorstore = _load_reusable_vectorstore(index_path, manifest)
+    elif manifest:
+        print("빌드 파라미터(청킹/임베딩 배포/중복 제거)가 변경되어 전체 재생성")
+
+    if vectorstore is None:
+        manifest = new_manifest(params)
+
+    diff = diff_sources(manifest, current_hashes)
+    print(f"추가: {len(diff.added)}개, 변경: {len(diff.changed)}개, 삭제: {len(diff.removed)}개, 유지: {len(diff.unchanged)}개")
+
+    if vectorstore is not None and not diff.has_changes and manifest.get("complete", True):
+        print(f"변경된 PDF 없음, 기존 벡터 인덱스 재사용: {vectorstore.index.ntotal}개 문서")
+
+        # 이전 버전에서 만든 인덱스이거나 백엔드 설정이 바뀌었으면 검색용 파일만 다시 내보낸다 (임베딩 없음)
+        if serving_files_stale(index_path, manifest.get("version")):
+            export_serving_files(vectorstore, index_path, manifest.get("version"))
+        return vectorstore
+
+    # 삭제/변경된 PDF의 청크 제거
+    stale_ids = []
+    for name in diff.removed + diff.changed:
+        stale_ids.extend(manifest["files"].pop(name).get("ids", []))
+
+    if vectorstore is not None and stale_ids:
+        vectorstore.delete(stale_ids)
+        print(f"  - 삭제/변경된 PDF의 청크 {len(stale_ids)}개 제거")
+
+    embeddings = get_index_embeddings()
+
+    # 유지되는 파일의 청크로 중복 검사 기준을 구성 (ID는 청크 텍스트 해시)
+    seen_ids = {}
+    near_index = new_near_duplicate_index()
+    if vectorstore is not None:
+        for name in diff.unchanged:
+            for doc_id in manifest["files"][name].get("ids", []):
+                seen_ids[doc_id] = name
+                doc = vectorstore.docstore.search(doc_id) if near_index is not None else None
+                if isinstance(doc, Document):
+                    near_index.add(doc.page_content, name)
+
+    def add_batch(state: _FileState) -> None:
+        """대기 중인 청크를 임베딩하여 인덱스에 추가합니다."""
+        nonlocal vectorstore
+        if not state.batch:
+            return
+        ids = [doc.metadata["id"] for doc in state.batch]
+        if vectorstore is None:
+            vectorstore = FAISS.from_documents(documents=state.batch, embedding=embeddings, ids=ids)
+        else:
+            vectorstore.add_documents(state.batch, ids=ids)
+        state.ids.extend(ids)
+        state.batch = []
+
+    def fail_file(state: _FileState, error: Exception) -> None:
+        """파일 처리 실패 시 이미 추가한 청크를 되돌립니다. 매니페스트에 기록하지 않으므로 다음 빌드에서 다시 시도됩니다."""
+        print(f"  - {state.name} 처리 실패, 건너뜀: {str(error)}")
+        state.failed = True
+        if vectorstore is not None and state.ids:
+            vectorstore.delete(state.ids)
+        # 이 파일의 청크를 기준으로 다른 파일의 청크가 제거되지 않도록 동일/유사 중복 기준에서 모두 뺀다
+        # (남겨 두면 이후 파일의 청크가 인덱스에 없는 청크의 중복으로 제거되어 체크포인트에도 기록된다)
+        for doc_id in [doc_id for doc_id, owner in seen_ids.items() if owner == state.name]:
+            del seen_ids[doc_id]
+        if near_index is not None:
+            near_index.remove_owner(state.name)
+        state.ids, state.batch = [], []
+
+    def finish_file(state: _FileState, checkpoint: bool) -> None:
+        """파일의 남은 청크를 추가하고 매니페스트에 기록한 뒤, 필요하면 체크포인트를 저장합니다."""
+        if not state.failed:
+            try:
+                add_batch(state)
+            except Exception as e:
+                fail_file(state, e)
+        if state.failed:
+            return
+
+        print(f"  - {state.name}: {len(state.ids)}개 청크 (동일: {state.exact_removed}개, 유사: {state.near_removed}개 제거)")
+        manifest["files"][state.name] = {
+            "sha256": current_hashes[state.name],
+            "ids": state.ids,
+            "dedup_removed": state.exact_removed + state.near_removed,
+            "dedup_sources": sorted(state.sources),  # 이 파일들이 바뀌면 다시 처리
+        }
+
+        # 완료된 파일까지 저장해 두면, 중단된 빌드는 다음 실행에서 남은 파일만 처리한다
+        if checkpoint and vectorstore is not None:
+            save_index_files(vectorstore, index_path)
+            manifest["ntotal"] = vectorstore.index.ntotal
+            manifest["complete"] = False
+            save_manifest(index_path, manifest)
+            print(f"  - 체크포인트 저장: {vectorstore.index.ntotal}개 문서")
+
+    # 추가/변경된 PDF를 페이지 범위 단위로 스트리밍 처리 (파싱 -> 분할 -> 중복 제거 -> 배치 임베딩 -> 인덱스 추가)
+    targets = diff.added + diff.changed
+    report("parse", files=len(targets))
+    state = None
+    finished = 0
+
+    for name, chunks, error in iter_pdf_chunks(
+        [pdf_paths[name] for name in targets],
+        chunk_size=settings.CHUNK_SIZE,
+        chunk_overlap=settings.CHUNK_OVERLAP,
+        max_workers=settings.INGEST_WORKERS,
+        pages_per_task=settings.INGEST_PAGES_PER_TASK,
+        max_inflight=settings.INGEST_MAX_INFLIGHT,
+    ):
+        if state is None or state.name != name:
+            if state is not None:
+                finished += 1
+                finish_file(state, checkpoint=True)
+            print(f"\n처리 중: {name}")
+            report("embed", file=name, done=finished, total=len(targets))
+            state = _FileState(name)
+
+        if state.failed:
+            continue
+        if error:
+            fail_file(state, error)
+            continue
+
         try:
-            print(f"\n처리 중: {os.path.basename(pdf_file)}")
-            
-            # PDF 로드
-            loader = PyMuPDFLoader(pdf_file)
-            docs = loader.load()
-            
-            # 테이블 추출
-            table_texts = extract_tables_from_pdf(pdf_file)
-            table_docs = [Document(page_content=t, metadata={"source": "table", "file": os.path.basename(pdf_file)}) for t in table_texts]
-            
-            # 문서 메타데이터에 파일명 추가
-            for doc in docs:
-                doc.metadata["file"] = os.path.basename(pdf_file)
-            
-            file_docs = docs + table_docs
-            total_original += len(file_docs)
-            
-            # 텍스트 분할
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-            split_documents = text_splitter.split_documents(file_docs)
-            
-            all_documents.extend(split_documents)
-            
-            print(f"  - 원본: {len(file_docs)}개, 분할 후: {len(split_documents)}개")
-            
+            dedup = deduplicate(chunks, name, seen_ids, near_index)
+            state.exact_removed += dedup.exact_removed
+            state.near_removed += dedup.near_removed
+            state.sources.update(dedup.sources)
+            state.batch.extend(dedup.documents)
+
+            if len(state.batch) >= settings.INGEST_EMBED_BATCH_SIZE:
+                add_batch(state)
+
         except Exception as e:
-            print(f"  - 오류 발생: {str(e)}")
-            continue
-    
-    if not all_documents:
+            fail_file(state, e)
+
+    if state is not None:
+        finish_file(state, checkpoint=False)
+
+    _print_embedding_cache_stats()
+
+    if vectorstore is None:
         print("처리할 문서가 없습니다.")
         return None
-    
-    print(f"\n전체 문서 처리 완료:")
-    print(f"  - 총 원본 문서: {total_original}개")
-    print(f"  - 분할 후 문서: {len(all_documents)}개")
-    
-    # 중복 제거 및 고유 ID 부여
-    unique_documents = []
-    seen_contents = set()
-    
-    for i, doc in enumerate(all_documents):
-        # 내용의 해시값으로 중복 체크
-        content_hash = hash(doc.page_content[:200])
-        
-        if content_hash not in seen_contents:
-            # 고유한 ID 부여
-            doc.metadata["id"] = f"doc_{i}_{content_hash}"
-            unique_documents.append(doc)
-            seen_contents.add(content_hash)
-    
-    print(f"  - 중복 제거 후: {len(unique_documents)}개")
-    
-    # 벡터 스토어 생성
+
+    # 인덱스를 먼저 저장한 뒤 매니페스트를 갱신
+    report("save", chunks=vectorstore.index.ntotal)
     try:
-        embeddings = settings.get_embeddings()
-        vectorstore = FAISS.from_documents(documents=unique_documents, embedding=embeddings)
-        vectorstore.save_local("./vector_index")
-        
-        print(f"벡터 스토어 생성 완료: {len(unique_documents)}개 문서")
+        save_index_files(vectorstore, index_path)
+        manifest["ntotal"] = vectorstore.index.ntotal
+        manifest["complete"] = True
+        manifest["version"] = str(time.time_ns())
+        manifest["content_version"] = content_version(manifest)  # 응답 캐시 키 (내용이 같으면 그대로)
+        export_serving_files(vectorstore, index_path, manifest["version"])
+        save_manifest(index_path, manifest)
+
+        print(f"벡터 스토어 갱신 완료: {vectorstore.index.ntotal}개 문서")
         return vectorstore
-        
+
     except Exception as e:
         print(f"벡터 스토어 생성 실패: {str(e)}")
         return None
 
 
 # vectorstore정보를 로딩한다
-def load_vectorstore():
-    embeddings = settings.get_embeddings()
+# 요청 경로에서는 retrieval.index_holder.get_vectorstore()로 공유 인스턴스를 사용한다
+def load_vectorstore(index_path: str = None):
+    """
+    검색용 벡터 스토어를 로드합니다. 메모리 맵 포맷이 있으면 pickle 없이 엽니다.
+
+    메타데이터 인덱스와 어휘(BM25) 인덱스가 있으면 metadata_index, lexical_index 속성으로
+    함께 로드하여, 벡터 스토어와 같은 버전으로 교체되도록 합니다.
+    """
+    index_path = index_path or settings.VECTOR_INDEX_PATH
+    if settings.VECTOR_INDEX_FORMAT == "mmap" and load_mmap_meta(index_path) is not None:
+        vectorstore = MmapVectorStore(index_path, get_query_embeddings(), settings.get_backend_options())
+    else:
+        vectorstore = load_faiss_vectorstore(index_path, get_query_embeddings())
+
+    vectorstore.metadata_index = None
+    if load_metadata_meta(index_path) is not None:
+        try:
+            vectorstore.metadata_index = MetadataIndex(index_path)
+        except Exception as e:
+            print(f"메타데이터 인덱스 로드 실패: {str(e)}")
+
+    vectorstore.lexical_index = None
+    if load_lexical_meta(index_path) is not None:
+        try:
+            vectorstore.lexical_index = LexicalIndex(index_path)
+        except Exception as e:
+            print(f"어휘 인덱스 로드 실패: {str(e)}")
+    return vectorstore
+
+
+# FAISS 인덱스와 index.pkl을 로드한다 (증분 빌드용)
+def load_faiss_vectorstore(index_path: str = None, embeddings=None):
+    embeddings = embeddings or get_embeddings()
     vectorstore = FAISS.load_local(
-        "./vector_index",
+        index_path or settings.VECTOR_INDEX_PATH,
         embeddings,
         allow_dangerous_deserialization=True
     )
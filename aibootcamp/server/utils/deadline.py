@@ -0,0 +1,66 @@
+"""
+요청 시간 예산 (Deadline)
+
+이 모듈은 상담 요청 하나에 주어진 전체 시간 예산을 표현하는 Deadline을 제공합니다.
+Deadline은 실행 설정(configurable["deadline"])으로 외부 그래프, 에이전트 내부 그래프,
+검색 함수, LLM 호출까지 전달되며, 각 단계는 남은 예산의 일부만 사용합니다.
+
+예산이 부족하면 단계는 실패하는 대신 품질을 낮춰 계속 진행하고(degrade),
+어떤 단계가 줄어들었는지 기록하여 SSE 이벤트로 클라이언트에 알립니다.
+- 외부 검색 생략, 검색 문서 수(k) 축소, 검색 타임아웃
+- 짧은 응답 요청, 응답 생성 중단 (이미 생성된 부분까지 전송)
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+class DeadlineExceeded(Exception):
+    """시간 예산을 모두 사용하여 단계를 진행할 수 없음"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"{stage} 단계 시간 예산 초과")
+        self.stage = stage
+
+
+class Deadline:
+    """요청 하나의 시간 예산과 줄어든 단계 기록"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self.expires_at = self.started + seconds
+        self._degraded: List[Dict[str, str]] = []
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        """남은 시간(초)을 반환합니다."""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def budget(self, share: float, cap: Optional[float] = None) -> float:
+        """남은 시간 중 share 비율을 단계 예산으로 반환합니다. cap이 있으면 그 이하로 제한합니다."""
+        budget = self.remaining() * share
+        return min(budget, cap) if cap is not None else budget
+
+    def degrade(self, stage: str, reason: str) -> None:
+        """예산 부족으로 품질을 낮춘 단계를 기록합니다."""
+        print(f"시간 예산 부족 ({self.remaining():.1f}초 남음): {stage} {reason}")
+        with self._lock:
+            self._degraded.append({"stage": stage, "reason": reason})
+
+    @property
+    def degraded(self) -> List[Dict[str, str]]:
+        with self._lock:
+            return list(self._degraded)
+
+
+def get_deadline(config: Any) -> Optional[Deadline]:
+    """실행 설정(RunnableConfig)에서 Deadline을 꺼냅니다. 없으면 None을 반환합니다."""
+    return ((config or {}).get("configurable") or {}).get("deadline")
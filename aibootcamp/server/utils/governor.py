@@ -0,0 +1,218 @@
+"""
+동시 실행 제한 (Admission Control)
+
+이 모듈은 GPT-4o와 임베딩 호출의 동시 실행 수를 제한하는 ConcurrencyGovernor를 제공합니다.
+요청이 몰리면 Azure 레이트 리밋에 걸려 진행 중인 모든 요청이 함께 느려지므로,
+허용 수를 넘는 호출은 대기열에서 기다리게 하고 대기열이 가득 차면 즉시 거절합니다.
+
+- 동기(스레드)와 비동기(이벤트 루프) 호출 모두 같은 대기열을 사용
+- 세션(session_id)별 라운드 로빈으로 슬롯을 배정하여 한 세션이 대기열을 독점하지 않음
+- 대기 시간이 queue_timeout을 넘으면 ServerBusyError
+- 동시 실행 수, 대기열 길이, 대기 시간(p50/p95) 통계 제공
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+# 현재 요청의 세션 ID (asyncio 태스크와 asyncio.to_thread로 전파된다)
+current_session_id: ContextVar[Optional[str]] = ContextVar("current_session_id", default=None)
+
+
+class ServerBusyError(Exception):
+    """대기열이 가득 찼거나 대기 시간이 초과되어 호출을 수행할 수 없음"""
+
+    def __init__(self, name: str, reason: str):
+        super().__init__(f"{name} 호출 대기열 {reason}")
+        self.name = name
+        self.reason = reason
+
+
+class _Waiter:
+    """대기 중인 호출 (스레드는 Event, 코루틴은 Future로 깨운다)"""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+        self.granted = False
+
+    def grant(self) -> None:
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self) -> None:
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class ConcurrencyGovernor:
+    """세션별 공정 대기열을 가진 동시 실행 제한기"""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._queues: "OrderedDict[Any, deque]" = OrderedDict()  # 세션 -> 대기 호출
+        self._queued = 0
+        self._waits = deque(maxlen=1000)  # 최근 대기 시간 (초)
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def saturated(self) -> bool:
+        """대기열이 가득 차서 새 호출을 받을 수 없으면 True를 반환합니다."""
+        with self._lock:
+            return self.in_flight >= self.max_concurrency and self._queued >= self.max_queue
+
+    def _try_enter(self, waiter: _Waiter, session) -> bool:
+        """즉시 실행할 수 있으면 True, 대기열에 넣었으면 False를 반환합니다."""
+        with self._lock:
+            if self.in_flight < self.max_concurrency and self._queued == 0:
+                self.in_flight += 1
+                self.admitted += 1
+                self._waits.append(0.0)
+                return True
+            if self._queued >= self.max_queue:
+                self.rejected += 1
+                raise ServerBusyError(self.name, "가득 참")
+            self._queues.setdefault(session, deque()).append(waiter)
+            self._queued += 1
+            return False
+
+    def _cancel(self, waiter: _Waiter, session) -> bool:
+        """대기를 포기합니다. 이미 슬롯을 배정받았으면 False를 반환합니다."""
+        with self._lock:
+            if waiter.granted:
+                return False
+            queue = self._queues.get(session)
+            if queue is not None and waiter in queue:
+                queue.remove(waiter)
+                self._queued -= 1
+                if not queue:
+                    del self._queues[session]
+            self.timeouts += 1
+            return True
+
+    def _release(self) -> None:
+        with self._lock:
+            if not self._queues:
+                self.in_flight -= 1
+                return
+
+            # 라운드 로빈: 가장 오래 차례를 기다린 세션의 첫 호출에 슬롯을 넘긴다
+            session, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            self._queued -= 1
+            del self._queues[session]
+            if queue:
+                self._queues[session] = queue
+            self.admitted += 1
+            waiter.grant()
+
+    def _record_wait(self, started: float) -> None:
+        with self._lock:
+            self._waits.append(time.monotonic() - started)
+
+    @contextmanager
+    def slot(self, session=None):
+        """동기 호출용 슬롯. 대기열이 가득 찼거나 대기 시간이 초과되면 ServerBusyError"""
+        session = session or current_session_id.get()
+        waiter = _Waiter()
+        started = time.monotonic()
+        if not self._try_enter(waiter, session):
+            if not waiter.event.wait(self.queue_timeout) and self._cancel(waiter, session):
+                raise ServerBusyError(self.name, "대기 시간 초과")
+            self._record_wait(started)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self, session=None):
+        """비동기 호출용 슬롯. 대기 중에도 이벤트 루프를 막지 않는다"""
+        session = session or current_session_id.get()
+        waiter = _Waiter(asyncio.get_running_loop())
+        started = time.monotonic()
+        if not self._try_enter(waiter, session):
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if self._cancel(waiter, session):
+                    if isinstance(e, asyncio.CancelledError):
+                        raise
+                    raise ServerBusyError(self.name, "대기 시간 초과")
+                # 취소와 동시에 슬롯을 배정받았으면 반납한다
+                if isinstance(e, asyncio.CancelledError):
+                    self._release()
+                    raise
+            self._record_wait(started)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        """동시 실행 수, 대기열 길이, 대기 시간 통계를 반환합니다."""
+        with self._lock:
+            waits: List[float] = sorted(self._waits)
+            sessions = len(self._queues)
+            snapshot = {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "queued": self._queued,
+                "queued_sessions": sessions,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+        def percentile(p):
+            return waits[min(int(len(waits) * p), len(waits) - 1)] * 1000 if waits else None
+
+        snapshot["wait_ms_p50"] = percentile(0.5)
+        snapshot["wait_ms_p95"] = percentile(0.95)
+        return snapshot
+
+
+class GovernedEmbeddings(Embeddings):
+    """임베딩 API 호출을 ConcurrencyGovernor 슬롯 안에서 실행하는 Embeddings 래퍼"""
+
+    def __init__(self, embeddings: Embeddings, governor: ConcurrencyGovernor):
+        self.embeddings = embeddings
+        self.governor = governor
+
+    def embed_query(self, text: str) -> List[float]:
+        with self.governor.slot():
+            return self.embeddings.embed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self.governor.slot():
+            return self.embeddings.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        async with self.governor.aslot():
+            return await self.embeddings.aembed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        async with self.governor.aslot():
+            return await self.embeddings.aembed_documents(texts)
@@ -1,18 +1,39 @@
-from langchain.schema import HumanMessage, SystemMessage, AIMessage
-from retrieval.vector_store import search_topic
-from utils.config import get_llm
+import asyncio
+import operator
+import time
+
+from langchain.schema import HumanMessage, SystemMessage, AIMessage, Document
+from retrieval.search_service import (
+    MIN_LOCAL_RESULTS,
+    aexternal_search_branch,
+    arewrite_search_branch,
+    asearch_local_branch,
+    get_default_documents,
+)
+from retrieval.vector_store import fuse_documents
+from utils.config import get_llm, get_llm_governor, settings
+from utils.deadline import Deadline, DeadlineExceeded, get_deadline
+from workflow.latency import mode_latency
 from workflow.state import AdviceState, AgentType
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, TypedDict
+from typing import Annotated, List, Dict, Any, TypedDict
 from langchain_core.messages import BaseMessage
-from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langgraph.graph import StateGraph, START, END
 from langfuse.callback import CallbackHandler
 
 
+# 시간 예산이 부족할 때 응답 생성 프롬프트 뒤에 붙이는 지시
+SHORT_ANSWER_PROMPT = "시간이 부족하니 핵심만 1문단, 150자 이내로 짧게 답변해주세요."
+
+
 # 에이전트 내부 상태 타입 정의
 class AgentState(TypedDict):
 
     advice_state: Dict[str, Any]  # 전체 상담 상태
+    k: int  # 검색 분기별 문서 수 (시간 예산에 따라 줄어들 수 있음)
+    started: float  # 에이전트 실행 시작 시각 (검색 지연시간 측정)
+    branch_docs: Annotated[Dict[str, List[Document]], operator.or_]  # 검색 분기별 결과 (병렬 분기가 각자 기록)
     context: str  # 검색된 컨텍스트
     messages: List[BaseMessage]  # LLM에 전달할 메시지
     response: str  # LLM 응답
@@ -23,13 +44,21 @@ class Agent(ABC):
 
     #
     def __init__(
-        self, system_prompt: str, role: str, k: int = 2, session_id: str = None
+        self,
+        system_prompt: str,
+        role: str,
+        k: int = 2,
+        session_id: str = None,
+        rag_mode: str = "local",
+        retrieval_mode: str = None,
     ):
         self.system_prompt = system_prompt
         self.role = role
         self.k = k  # 검색할 문서 개수
+        self.rag_mode = rag_mode if k > 0 else "none"  # 자료 검색 범위 (none, local, local+external, parallel)
+        self.retrieval_mode = retrieval_mode or settings.RETRIEVAL_MODE  # 로컬 검색 방식 (vector, lexical, hybrid)
         self._setup_graph()  # 그래프 설정
-        self.session_id = session_id  # langfuse 세션 ID
+        self.session_id = session_id  # 기본 langfuse 세션 ID (요청별 값은 실행 설정의 session_id)
 
     def _setup_graph(self):
         print(f"[START]agent._setup_graph({self})")
@@ -37,42 +66,165 @@ class Agent(ABC):
         # 그래프 생성
         workflow = StateGraph(AgentState)
 
-        # 노드 추가
-        workflow.add_node("retrieve_context", self._retrieve_context)  # 자료 검색
+        # 노드 추가 - 검색 분기와 응답 생성은 동기(invoke)/비동기(ainvoke) 실행을 모두 지원
+        # 검색 분기는 동시에 실행되고 merge_context에서 순위 결합(RRF) 후 중복 제거된다
+        # 검색 범위가 none이면 검색 노드 없이 바로 메시지를 준비한다 (임베딩/FAISS 호출 없음)
+        branches = self._retrieval_branches()
+        for branch in branches:
+            workflow.add_node(branch, self._branch_node(branch))  # 자료 검색 분기
+        if self.rag_mode == "local+external":
+            workflow.add_node(
+                "external_fallback",
+                RunnableLambda(self._external_fallback, afunc=self._aexternal_fallback),
+            )  # 로컬 결과가 부족할 때만 외부 검색
+        if branches:
+            workflow.add_node("merge_context", self._merge_context)  # 검색 결과 결합
         workflow.add_node("prepare_messages", self._prepare_messages)  # 메시지 준비
-        workflow.add_node("generate_response", self._generate_response)  # 응답 생성
+        workflow.add_node(
+            "generate_response",
+            RunnableLambda(self._generate_response, afunc=self._agenerate_response),
+        )  # 응답 생성
         workflow.add_node("update_state", self._update_state)  # 상태 업데이트
 
-        # 엣지 추가 - 순차 실행 흐름
-        workflow.add_edge("retrieve_context", "prepare_messages")
+        # 엣지 추가 - 검색 분기는 병렬(fan-out), 이후 순차 실행 흐름
+        if branches:
+            for branch in branches:
+                workflow.add_edge(START, branch)
+            if self.rag_mode == "local+external":
+                workflow.add_edge(branches, "external_fallback")  # 모든 분기가 끝나면 실행
+                workflow.add_edge("external_fallback", "merge_context")
+            else:
+                workflow.add_edge(branches, "merge_context")  # 모든 분기가 끝나면 실행
+            workflow.add_edge("merge_context", "prepare_messages")
+        else:
+            workflow.set_entry_point("prepare_messages")
         workflow.add_edge("prepare_messages", "generate_response")
         workflow.add_edge("generate_response", "update_state")
 
-        workflow.set_entry_point("retrieve_context")
         workflow.add_edge("update_state", END)
 
         # 그래프 컴파일
         self.graph = workflow.compile()
 
-
-    # 자료 검색
-    def _retrieve_context(self, state: AgentState) -> AgentState:
-        print(f"[START]agent._retrieve_context({self},{state})")
-        # k=0이면 검색 비활성화
-        if self.k <= 0:
-            return {**state, "context": ""}
-
-        advice_state = state["advice_state"]
-        topic = advice_state["topic"]
-
-        # 검색 쿼리 생성
+    # 검색 범위별 병렬 검색 분기 - 로컬 검색 분기는 검색 방식(RETRIEVAL_MODE)을 따른다
+    # (lexical이면 벡터 분기가 없으므로 질의 임베딩을 호출하지 않고, hybrid일 때만 두 분기를 모두 실행)
+    def _retrieval_branches(self) -> List[str]:
+        if self.rag_mode == "none":
+            return []
+        branches = []
+        if self.retrieval_mode in ("vector", "hybrid"):
+            branches.append("vector_search")
+        if self.retrieval_mode in ("lexical", "hybrid"):
+            branches.append("lexical_search")
+        if self.rag_mode == "parallel":
+            if settings.RETRIEVAL_QUERY_REWRITE:
+                branches.append("query_rewrite")
+            branches.append("external_search")
+        return branches
+
+    # 검색 분기 노드 - 동기 실행(invoke)에서는 분기마다 워커 스레드에서 이벤트 루프를 따로 돌린다
+    def _branch_node(self, branch: str) -> RunnableLambda:
+        def search(state: AgentState, config: RunnableConfig = None) -> AgentState:
+            return asyncio.run(self._asearch_branch(branch, state, config))
+
+        async def asearch(state: AgentState, config: RunnableConfig = None) -> AgentState:
+            return await self._asearch_branch(branch, state, config)
+
+        return RunnableLambda(search, afunc=asearch, name=branch)
+
+    # 자료 검색 분기 실행 - 각 분기는 남은 시간 예산의 RETRIEVAL_BUDGET_SHARE 비율 안에서 검색한다
+    # 요청의 메타데이터 필터(configurable["filters"])는 로컬 검색 분기에만 적용한다
+    async def _asearch_branch(
+        self, branch: str, state: AgentState, config: RunnableConfig = None, budget: float = None
+    ) -> AgentState:
+        print(f"[START]agent._asearch_branch({self},{branch},{budget})")
+        topic = state["advice_state"]["topic"]
+        k = state["k"]
+        deadline = get_deadline(config)
+        if budget is None and deadline is not None:
+            budget = deadline.budget(settings.RETRIEVAL_BUDGET_SHARE)
+        filters = ((config or {}).get("configurable") or {}).get("filters")
+
+        started = time.perf_counter()
+        if branch == "vector_search":
+            docs = await asearch_local_branch(self._search_query(topic), k, "vector", budget, deadline, filters)
+        elif branch == "lexical_search":
+            docs = await asearch_local_branch(self._search_query(topic), k, "lexical", budget, deadline, filters)
+        elif branch == "query_rewrite":
+            docs = await arewrite_search_branch(topic, k, budget, deadline, filters, self.retrieval_mode)
+        else:
+            docs = await aexternal_search_branch(topic, k, budget, deadline)
+        mode_latency.record(self.rag_mode, branch, time.perf_counter() - started)
+
+        # 병렬 분기는 자신의 결과만 기록한다 (branch_docs는 분기 결과를 합치는 리듀서)
+        return {"branch_docs": {branch: docs}}
+
+    # 외부 검색 (local+external) - 로컬 분기 결과가 부족할 때만 실행
+    def _external_fallback(self, state: AgentState, config: RunnableConfig = None) -> AgentState:
+        return asyncio.run(self._aexternal_fallback(state, config))
+
+    async def _aexternal_fallback(self, state: AgentState, config: RunnableConfig = None) -> AgentState:
+        print(f"[START]agent._aexternal_fallback({self})")
+        local_docs = self._fuse(state)
+        if len(local_docs) >= MIN_LOCAL_RESULTS:
+            return {"branch_docs": {}}
+
+        print(f"로컬 PDF에서 {len(local_docs)}개 문서 발견, 외부 검색 시도...")
+        budget = self._remaining_retrieval_budget(state, get_deadline(config))
+        return await self._asearch_branch("external_search", state, config, budget)
+
+    # 남은 자료 검색 예산 - 에이전트 시작 시점 남은 시간의 RETRIEVAL_BUDGET_SHARE에서 이미 사용한 검색 시간을 뺀다
+    # (로컬 분기 뒤에 이어지는 외부 검색이 응답 생성 몫의 예산을 쓰지 않도록 한다)
+    def _remaining_retrieval_budget(self, state: AgentState, deadline: Deadline = None) -> float:
+        if deadline is None:
+            return None
+        used = time.perf_counter() - state["started"]
+        return max((deadline.remaining() + used) * settings.RETRIEVAL_BUDGET_SHARE - used, 0.0)
+
+    # 분기별 검색 결과를 분기 순서대로 RRF 결합하고 중복을 제거한다
+    def _fuse(self, state: AgentState) -> List[Document]:
+        branch_docs = state.get("branch_docs") or {}
+        branches = self._retrieval_branches()
+        if "external_search" not in branches:
+            branches.append("external_search")
+        rankings = [branch_docs[branch] for branch in branches if branch_docs.get(branch)]
+
+        # 외부 검색 결과가 있으면 로컬 문서 자리를 빼앗지 않도록 결합 문서 수를 늘린다
+        limit = state["k"] * 2 if branch_docs.get("external_search") else state["k"]
+        return fuse_documents(rankings, limit, settings.HYBRID_RRF_K)
+
+    # 검색 결과 결합 - 검색 지연시간은 가장 느린 분기의 시간이 된다
+    def _merge_context(self, state: AgentState) -> AgentState:
+        print(f"[START]agent._merge_context({self},{list((state.get('branch_docs') or {}).keys())})")
+        docs = self._fuse(state)
+        mode_latency.record(self.rag_mode, "retrieval", time.perf_counter() - state["started"])
+        if not docs:
+            print("모든 검색에서 결과 없음, 기본 정보 제공")
+            docs = get_default_documents()
+        return self._with_docs(state, docs)
+
+    # 시간 예산에 맞춘 검색 문서 수 - 남은 예산이 적으면 1개만 검색하여 프롬프트와 응답 생성 시간을 줄인다
+    def _budget_k(self, deadline: Deadline = None) -> int:
+        if (
+            deadline is not None
+            and self.rag_mode != "none"
+            and self.k > 1
+            and deadline.remaining() < settings.REDUCED_K_SECONDS
+        ):
+            deadline.degrade("retrieval", f"k {self.k}->1")
+            return 1
+        return self.k
+
+    # 검색 쿼리 생성
+    def _search_query(self, topic: str) -> str:
         query = topic
         if self.role == AgentType.IPO:
             query += "객관적 사실"
+        return query
 
-        # RAG 서비스를 통해 검색 실행
-        docs = search_topic(topic, self.role, query, k=self.k)  # noqa: F821
-
+    # 검색 결과를 상담 상태와 컨텍스트에 반영
+    def _with_docs(self, state: AgentState, docs: list) -> AgentState:
+        advice_state = state["advice_state"]
         advice_state["docs"][self.role] = (
             [doc.page_content for doc in docs] if docs else []
         )
@@ -129,13 +281,81 @@ class Agent(ABC):
     def _create_prompt(self, state: Dict[str, Any]) -> str:
         pass
 
-    # LLM 호출
-    def _generate_response(self, state: AgentState) -> AgentState:
+    # 시간 예산에 맞춘 LLM 메시지 - 남은 예산이 적으면 짧은 응답을 요청하고, 예산이 없으면 DeadlineExceeded
+    def _budget_messages(self, messages: List[BaseMessage], deadline: Deadline = None) -> List[BaseMessage]:
+        if deadline is None:
+            return messages
+        if deadline.expired():
+            raise DeadlineExceeded("generate_response")
+        if deadline.remaining() < settings.SHORT_ANSWER_SECONDS:
+            deadline.degrade("generate_response", "short_answer")
+            return messages + [HumanMessage(content=SHORT_ANSWER_PROMPT)]
+        return messages
+
+    # LLM 호출 - 동시 실행 제한기 슬롯 안에서 실행 (대기열이 가득 차면 ServerBusyError)
+    def _generate_response(self, state: AgentState, config: RunnableConfig = None) -> AgentState:
         print(f"[START]agent._generate_response({self},{state})")
-        messages = state["messages"]
-        response = get_llm().invoke(messages)
-
-        return {**state, "response": response.content}
+        deadline = get_deadline(config)
+
+        # 토큰 콜백이 있으면 생성되는 토큰을 바로 전달한다 (SSE delta 이벤트)
+        on_token = ((config or {}).get("configurable") or {}).get("on_token")
+        with get_llm_governor().slot():
+            messages = self._budget_messages(state["messages"], deadline)
+            if on_token is None:
+                response = get_llm().invoke(messages)
+                return {**state, "response": response.content}
+
+            content = ""
+            for chunk in get_llm().stream(messages):
+                if chunk.content:
+                    content += chunk.content
+                    on_token(self.role, chunk.content)
+                # 예산을 다 쓰면 생성된 부분까지만 응답한다
+                if deadline is not None and deadline.expired():
+                    deadline.degrade("generate_response", "truncated")
+                    break
+
+        return {**state, "response": content}
+
+    # LLM 호출 (비동기) - 비동기 Azure OpenAI 클라이언트로 이벤트 루프를 막지 않는다
+    async def _agenerate_response(self, state: AgentState, config: RunnableConfig = None) -> AgentState:
+        print(f"[START]agent._agenerate_response({self},{state})")
+        deadline = get_deadline(config)
+
+        on_token = ((config or {}).get("configurable") or {}).get("on_token")
+        async with get_llm_governor().aslot():
+            messages = self._budget_messages(state["messages"], deadline)
+            timeout = deadline.remaining() if deadline is not None else None
+            if on_token is None:
+                try:
+                    response = await asyncio.wait_for(get_llm().ainvoke(messages), timeout)
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded("generate_response")
+                return {**state, "response": response.content}
+
+            content = ""
+            stream = get_llm().astream(messages).__aiter__()
+            try:
+                while True:
+                    # 다음 토큰을 남은 예산만큼만 기다린다
+                    timeout = deadline.remaining() if deadline is not None else None
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), timeout)
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        # 생성된 토큰이 있으면 거기까지 응답하고, 없으면 시간 예산 초과
+                        if not content:
+                            raise DeadlineExceeded("generate_response")
+                        deadline.degrade("generate_response", "truncated")
+                        break
+                    if chunk.content:
+                        content += chunk.content
+                        on_token(self.role, chunk.content)
+            finally:
+                await stream.aclose()
+
+        return {**state, "response": content}
 
     # 상태 업데이트
     def _update_state(self, state: AgentState) -> AgentState:
@@ -157,19 +377,51 @@ class Agent(ABC):
         # 상태 업데이트
         return {**state, "advice_state": new_advice_state}
 
+    # 내부 그래프 실행 설정
+    # 컴파일된 그래프는 요청 간에 공유되므로 요청별 값(session_id, on_token, deadline)은 실행 설정으로 전달받는다
+    # 외부 그래프의 configurable에는 서브그래프 스트리밍/네임스페이스 키가 들어 있으므로 새로 만들지 않고 합친다
+    # (새 configurable로 바꾸면 내부 update_state 청크가 외부 astream(subgraphs=True)에 전달되지 않는다)
+    def _run_config(self, config: RunnableConfig = None) -> RunnableConfig:
+        config = config or {}
+        configurable = config.get("configurable") or {}
+        session_id = configurable.get("session_id") or self.session_id
+        langfuse_handler = CallbackHandler(session_id=session_id)
+        return {
+            **config,
+            "callbacks": [langfuse_handler],
+            "configurable": {**configurable, "session_id": session_id},
+        }
+
+    # 초기 에이전트 상태 - 검색 문서 수는 요청 시작 시점의 시간 예산으로 한 번만 정한다
+    def _initial_state(self, state: AdviceState, config: RunnableConfig = None) -> AgentState:
+        return AgentState(
+            advice_state=state,
+            k=self._budget_k(get_deadline(config)),
+            started=time.perf_counter(),
+            branch_docs={},
+            context="",
+            messages=[],
+            response="",
+        )
+
     # 상담 실행
-    def run(self, state: AdviceState) -> AdviceState:
+    def run(self, state: AdviceState, config: RunnableConfig = None) -> AdviceState:
         print(f"[START]agent.run({self},{state})")
         # 초기 에이전트 상태 구성
-        agent_state = AgentState(
-            advice_state=state, context="", messages=[], response=""
-        )
+        agent_state = self._initial_state(state, config)
 
         # 내부 그래프 실행
-        langfuse_handler = CallbackHandler(session_id=self.session_id)
-        result = self.graph.invoke(
-            agent_state, config={"callbacks": [langfuse_handler]}
-        )
+        result = self.graph.invoke(agent_state, config=self._run_config(config))
 
         # 최종 상담 상태 반환
         return result["advice_state"]
+
+    # 상담 실행 (비동기)
+    async def arun(self, state: AdviceState, config: RunnableConfig = None) -> AdviceState:
+        print(f"[START]agent.arun({self},{state})")
+        agent_state = self._initial_state(state, config)
+
+        # 내부 그래프 비동기 실행
+        result = await self.graph.ainvoke(agent_state, config=self._run_config(config))
+
+        return result["advice_state"]
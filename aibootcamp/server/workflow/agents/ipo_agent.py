@@ -1,22 +1,37 @@
+import hashlib
+
 from workflow.agents.agent import Agent
 from workflow.state import AgentType
 from typing import Dict, Any
 
 
+# 프롬프트를 바꾸면 prompt_hash()가 바뀌어 응답 캐시가 자동으로 무효화된다
+SYSTEM_PROMPT = "당신은 KRX에 상장심사 담당자입니다. KRX의 각종 시장에 상장하려고 하는 사람들에게 적극적으로 가이드를 해주어야 합니다."
+
+PROMPT_TEMPLATE = """
+            당신은 '{topic}'에 대해 KRX시장에 상장하는 방법을 가이드해주세요.
+            2 ~ 3문단, 각 문단은 100자내로 작성해주세요.
+            응답내용에 절차가 있다면, 도식화해서 제시하면 더 좋을 듯합니다.
+            """
+
+
+def prompt_hash() -> str:
+    """시스템 프롬프트와 프롬프트 템플릿의 해시를 반환합니다."""
+    return hashlib.sha256(f"{SYSTEM_PROMPT}\n{PROMPT_TEMPLATE}".encode("utf-8")).hexdigest()[:16]
+
+
 class IPOAgent(Agent):
 
-    def __init__(self, k: int = 2, session_id: str = None):
+    def __init__(self, k: int = 2, session_id: str = None, rag_mode: str = "local", retrieval_mode: str = None):
         super().__init__(
-            system_prompt="당신은 KRX에 상장심사 담당자입니다. KRX의 각종 시장에 상장하려고 하는 사람들에게 적극적으로 가이드를 해주어야 합니다.",
+            system_prompt=SYSTEM_PROMPT,
             role=AgentType.IPO,
             k=k,
             session_id=session_id,
+            rag_mode=rag_mode,
+            retrieval_mode=retrieval_mode,
         )
 
     def _create_prompt(self, state: Dict[str, Any]) -> str:
         print(f"[START]ipo_agent._create_prompt({self},{state})")
-        return f"""
-            당신은 '{state['topic']}'에 대해 KRX시장에 상장하는 방법을 가이드해주세요.
-            2 ~ 3문단, 각 문단은 100자내로 작성해주세요.
-            응답내용에 절차가 있다면, 도식화해서 제시하면 더 좋을 듯합니다.
-            """
+        return PROMPT_TEMPLATE.format(topic=state['topic'])
@@ -0,0 +1,113 @@
+"""
+의미 기반 응답 캐시
+
+이 모듈은 상담 주제의 임베딩으로 이전 응답을 찾아, 표현만 다른 같은 질문
+(예: "채권상장 절차", "채권 상장 절차는?")에 LangGraph 워크플로우와 GPT-4o 호출 없이
+저장된 SSE 업데이트 이벤트를 그대로 돌려줍니다.
+
+- 같은 범위(enable_rag, 프롬프트 버전)의 항목 중 코사인 유사도가 임계값 이상인 것만 사용
+- LRU + TTL로 항목 수와 유지 시간을 제한
+- 벡터 인덱스 버전이 바뀌면 (재빌드, 핫 리로드) 모든 항목을 폐기
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """코사인 유사도 기반 LRU + TTL 응답 캐시"""
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 512, ttl_seconds: float = 3600):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_id = 0
+        self._index_version = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def _sync_index_version(self, index_version: Hashable) -> None:
+        # 호출자가 잠금을 잡은 상태에서 호출한다
+        if index_version != self._index_version:
+            if self._entries:
+                self.invalidations += 1
+                print(f"벡터 인덱스 버전 변경, 응답 캐시 {len(self._entries)}개 폐기")
+            self._entries.clear()
+            self._index_version = index_version
+
+    def get(self, vector, scope: Hashable, index_version: Hashable = None) -> Optional[Dict[str, Any]]:
+        """
+        범위가 같고 유사도가 가장 높은 항목이 임계값 이상이면
+        {"topic", "events", "similarity"}를 반환합니다.
+        """
+        query = self._unit(vector)
+        now = time.monotonic()
+        with self._lock:
+            self._sync_index_version(index_version)
+
+            best_id, best_score = None, -1.0
+            for entry_id, entry in list(self._entries.items()):
+                if entry["expires_at"] <= now:
+                    del self._entries[entry_id]
+                    continue
+                if entry["scope"] != scope:
+                    continue
+                score = float(np.dot(query, entry["vector"]))
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            entry = self._entries[best_id]
+            return {"topic": entry["topic"], "events": entry["events"], "similarity": best_score}
+
+    def put(self, topic: str, vector, scope: Hashable, events: List[Dict[str, Any]], index_version: Hashable = None) -> None:
+        """워크플로우가 만든 SSE 업데이트 이벤트 목록을 저장합니다."""
+        if not events:
+            return
+        with self._lock:
+            self._sync_index_version(index_version)
+            self._entries[self._next_id] = {
+                "topic": topic,
+                "vector": self._unit(vector),
+                "scope": scope,
+                "events": events,
+                "expires_at": time.monotonic() + self.ttl_seconds,
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """캐시 적중률 통계를 반환합니다."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "invalidations": self.invalidations,
+                "threshold": self.threshold,
+            }
@@ -1,24 +1,39 @@
 import sys
 import os
+import threading
 
 # 현재 디렉토리를 Python 경로에 추가
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from workflow.agents.ipo_agent import IPOAgent
+from workflow.agents.ipo_agent import IPOAgent, prompt_hash
+from retrieval.search_service import RAG_MODES
 from workflow.state import AdviceState, AgentType
 from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableLambda
+from utils.config import settings
 
 
-def create_advice_graph(enable_rag: bool = True, session_id: str = ""):
+def prompt_version() -> str:
+    """응답 캐시 키에 사용하는 프롬프트 버전 (설정 버전 + 에이전트 프롬프트 해시)"""
+    return f"{settings.PROMPT_VERSION}:{prompt_hash()}"
+
+
+def create_advice_graph(rag_mode: str = "local", session_id: str = "", retrieval_mode: str = None):
+    """
+    검색 범위(rag_mode)와 로컬 검색 방식(retrieval_mode, 없으면 settings.RETRIEVAL_MODE)에 맞는 상담 그래프를 생성하고 컴파일합니다.
+
+    요청 경로에서는 컴파일된 그래프를 재사용하는 get_advice_graph()를 사용하고,
+    session_id와 콜백은 실행 설정(config)으로 전달합니다.
+    """
 
     # 그래프 생성
     workflow = StateGraph(AdviceState)
 
-    # 에이전트 인스턴스 생성 - enable_rag에 따라 검색 문서 수 결정
-    ipo_agent = IPOAgent(session_id=session_id)
+    # 에이전트 인스턴스 생성 - 검색 범위가 none이면 검색 노드 없는 내부 그래프를 만든다
+    ipo_agent = IPOAgent(session_id=session_id, rag_mode=rag_mode, retrieval_mode=retrieval_mode)
 
     # 노드 추가
-    workflow.add_node(AgentType.IPO, ipo_agent.run)
+    workflow.add_node(AgentType.IPO, RunnableLambda(ipo_agent.run, afunc=ipo_agent.arun))  # invoke/ainvoke 모두 지원
     workflow.set_entry_point(AgentType.IPO)
     workflow.add_edge(AgentType.IPO, END)
 
@@ -26,10 +41,28 @@ def create_advice_graph(enable_rag: bool = True, session_id: str = ""):
     return workflow.compile()
 
 
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+
+def get_advice_graph(rag_mode: str = "local"):
+    """검색 범위와 로컬 검색 방식별로 한 번만 컴파일한 상담 그래프를 반환합니다."""
+    if rag_mode not in RAG_MODES:
+        raise ValueError(f"지원하지 않는 검색 범위: {rag_mode} (지원: {', '.join(RAG_MODES)})")
+    key = (rag_mode, settings.RETRIEVAL_MODE)
+    graph = _graphs.get(key)
+    if graph is None:
+        with _graphs_lock:
+            graph = _graphs.get(key)
+            if graph is None:
+                graph = _graphs[key] = create_advice_graph(rag_mode, retrieval_mode=settings.RETRIEVAL_MODE)
+    return graph
+
+
 if __name__ == "__main__":
 
     # 그래프생성
-    graph = create_advice_graph(True)
+    graph = create_advice_graph("local")
 
     # 그래프 이미지 생성    
     graph_image = graph.get_graph().draw_mermaid_png()
@@ -0,0 +1,52 @@
+"""
+검색 범위별 지연시간 통계
+
+이 모듈은 상담 요청의 검색 범위(none, local, local+external, parallel)별로
+자료 검색 시간, 첫 토큰까지의 시간, 전체 응답 시간을 집계합니다.
+인용이 필요 없는 사용자에게 제공할 빠른 경로(none)와 다른 범위의 차이를 비교할 때 사용합니다.
+"""
+
+import threading
+from collections import deque
+from typing import Any, Dict
+
+
+class ModeLatency:
+    """검색 범위와 단계(retrieval, first_token, total)별 최근 지연시간 통계"""
+
+    def __init__(self, max_samples: int = 1000):
+        self.max_samples = max_samples
+        self._samples: Dict[str, Dict[str, deque]] = {}  # 검색 범위 -> 단계 -> 지연시간 (초)
+        self._lock = threading.Lock()
+
+    def record(self, mode: str, stage: str, seconds: float) -> None:
+        with self._lock:
+            stages = self._samples.setdefault(mode, {})
+            stages.setdefault(stage, deque(maxlen=self.max_samples)).append(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """검색 범위별, 단계별 요청 수와 지연시간(p50/p95)을 반환합니다."""
+        with self._lock:
+            snapshot = {
+                mode: {stage: sorted(samples) for stage, samples in stages.items()}
+                for mode, stages in self._samples.items()
+            }
+
+        def percentile(samples, p):
+            return samples[min(int(len(samples) * p), len(samples) - 1)] * 1000 if samples else None
+
+        return {
+            mode: {
+                stage: {
+                    "count": len(samples),
+                    "latency_ms_p50": percentile(samples, 0.5),
+                    "latency_ms_p95": percentile(samples, 0.95),
+                }
+                for stage, samples in stages.items()
+            }
+            for mode, stages in snapshot.items()
+        }
+
+
+# 프로세스 전역 검색 범위별 지연시간 통계
+mode_latency = ModeLatency()